@@ -0,0 +1,229 @@
+"""
+プランの集計（業態・エリアごとの平均・標準偏差・パーセンタイル）
+
+plan_stats に業態・エリア・指標ごとの件数・合計・二乗和・最小値・最大値を、
+plan_stat_buckets に対数スケールのヒストグラム（DDSketch方式、相対誤差 RELATIVE_ACCURACY）を保持する。
+どちらも加算だけで更新・合成できるため、プランの保存時（flush）に同じトランザクションで増分を反映し、
+集計APIはプランの件数ではなくグループ数・バケット数に比例した時間で応答する。
+
+プランの削除・指標の更新は反映しないため、直接DBを変更した場合やバックフィルには再構築する:
+    python manage.py rebuild-analytics
+"""
+import math
+
+from sqlalchemy import delete, event, func, select, update
+from sqlalchemy.orm import Session
+
+import models
+
+METRICS = ('monthly_sales', 'op_income', 'payback_months')
+GROUP_COLUMNS = ('type', 'area')
+PERCENTILES = (50, 90, 95, 99)
+
+# バケットの幅（推定値の相対誤差の上限）。変更した場合は再構築が必要
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(GAMMA)
+
+_stats = models.PlanStat.__table__
+_buckets = models.PlanStatBucket.__table__
+
+
+def bucket_index(value: float) -> int:
+    """値のバケット番号（0は絶対値1未満、負の値は負の番号。番号の順序は値の順序と一致する）"""
+    magnitude = abs(value)
+    if magnitude < 1:
+        return 0
+    index = math.ceil(math.log(magnitude) / _LOG_GAMMA) + 1
+    return index if value > 0 else -index
+
+
+def bucket_value(index: int) -> float:
+    """バケットの代表値（バケット内のどの値に対しても相対誤差 RELATIVE_ACCURACY 以内）"""
+    if index == 0:
+        return 0.0
+    value = 2 * GAMMA ** (abs(index) - 1) / (GAMMA + 1)
+    return value if index > 0 else -value
+
+
+class StatsDelta:
+    """plan_stats / plan_stat_buckets に加算する増分"""
+
+    def __init__(self):
+        self.stats = {}  # (type, area, metric) -> [件数, 合計, 二乗和, 最小値, 最大値]
+        self.buckets = {}  # (type, area, metric, bucket) -> 件数
+
+    def __bool__(self):
+        return bool(self.stats)
+
+    def add(self, type: str, area: str, values: dict):
+        for metric in METRICS:
+            value = values[metric]
+            if value is None:
+                continue
+            value = float(value)
+            key = (type, area, metric)
+            entry = self.stats.get(key)
+            if entry is None:
+                self.stats[key] = [1, value, value * value, value, value]
+            else:
+                entry[0] += 1
+                entry[1] += value
+                entry[2] += value * value
+                entry[3] = min(entry[3], value)
+                entry[4] = max(entry[4], value)
+            bucket_key = key + (bucket_index(value),)
+            self.buckets[bucket_key] = self.buckets.get(bucket_key, 0) + 1
+
+    def apply(self, connection):
+        """増分をテーブルに加算する（キーの順に更新し、同時に保存したトランザクション間のデッドロックを避ける）"""
+        stats = [
+            {'type': t, 'area': a, 'metric': m, 'value_count': n, 'value_sum': s,
+             'value_sum_sq': sq, 'value_min': lo, 'value_max': hi}
+            for (t, a, m), (n, s, sq, lo, hi) in sorted(self.stats.items())
+        ]
+        buckets = [
+            {'type': t, 'area': a, 'metric': m, 'bucket': b, 'value_count': n}
+            for (t, a, m, b), n in sorted(self.buckets.items())
+        ]
+        if stats:
+            _upsert(connection, _stats, stats, added=('value_count', 'value_sum', 'value_sum_sq'),
+                    lowest=('value_min',), highest=('value_max',))
+        if buckets:
+            _upsert(connection, _buckets, buckets, added=('value_count',))
+
+
+def _upsert(connection, table, rows: list, added: tuple, lowest: tuple = (), highest: tuple = ()):
+    """主キーが重複する行は added の列を加算、lowest / highest の列を小さい方 / 大きい方で更新する"""
+    dialect = connection.dialect.name
+    keys = [column.name for column in table.primary_key]
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+            least, greatest = func.min, func.max  # SQLiteでは引数が2つのmin/maxがスカラー関数になる
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+            least, greatest = func.least, func.greatest
+        stmt = insert(table)
+        new = stmt.excluded
+        stmt = stmt.on_conflict_do_update(index_elements=keys, set_=_merged(table, new, added, lowest, highest, least, greatest))
+        connection.execute(stmt, rows)
+    elif dialect in ('mysql', 'mariadb'):
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table)
+        new = stmt.inserted
+        stmt = stmt.on_duplicate_key_update(_merged(table, new, added, lowest, highest, func.least, func.greatest))
+        connection.execute(stmt, rows)
+    else:
+        # UPSERTがないDBでは、UPDATEして該当行がなければINSERTする
+        for row in rows:
+            values = {name: table.c[name] + row[name] for name in added}
+            values.update({name: func.least(table.c[name], row[name]) for name in lowest})
+            values.update({name: func.greatest(table.c[name], row[name]) for name in highest})
+            where = [table.c[name] == row[name] for name in keys]
+            if connection.execute(update(table).where(*where).values(values)).rowcount == 0:
+                connection.execute(table.insert().values(row))
+
+
+def _merged(table, new, added, lowest, highest, least, greatest) -> dict:
+    values = {name: table.c[name] + new[name] for name in added}
+    values.update({name: least(table.c[name], new[name]) for name in lowest})
+    values.update({name: greatest(table.c[name], new[name]) for name in highest})
+    return values
+
+
+@event.listens_for(Session, "after_flush")
+def _record_new_plans(session, flush_context):
+    # 新しく保存したプランの指標を、同じトランザクションで集計テーブルに加算する
+    delta = StatsDelta()
+    for obj in session.new:
+        if isinstance(obj, models.BusinessPlan):
+            delta.add(obj.type, obj.area, obj.__dict__)
+    if delta:
+        delta.apply(session.connection())
+
+
+def rebuild(connection, chunk_size: int = 1000) -> int:
+    """business_plans 全体から集計テーブルを作り直し、集計したプラン数を返す"""
+    connection.execute(delete(_buckets))
+    connection.execute(delete(_stats))
+    plans = models.BusinessPlan.__table__
+    columns = [plans.c[name] for name in GROUP_COLUMNS + METRICS]
+    delta = StatsDelta()
+    count = 0
+    result = connection.execution_options(stream_results=True, yield_per=chunk_size).execute(select(*columns))
+    for row in result:
+        delta.add(row.type, row.area, row._mapping)
+        count += 1
+    delta.apply(connection)
+    return count
+
+
+def _quantile(buckets: list, total: int, q: float) -> float:
+    """ソート済みの (バケット番号, 件数) から最近傍順位法でパーセンタイルを推定"""
+    rank = max(1, math.ceil(q * total))
+    cumulative = 0
+    for index, count in buckets:
+        cumulative += count
+        if cumulative >= rank:
+            return bucket_value(index)
+    return bucket_value(buckets[-1][0])
+
+
+def summarize(db, group_by: tuple = GROUP_COLUMNS, type: str = None, area: str = None,
+              percentiles: tuple = PERCENTILES) -> list:
+    """集計テーブルを group_by の列ごとに合成し、指標ごとの平均・標準偏差・最小値・最大値・パーセンタイルを返す"""
+    def where(table):
+        filters = []
+        if type is not None:
+            filters.append(table.c.type == type)
+        if area is not None:
+            filters.append(table.c.area == area)
+        return select(table).where(*filters)
+
+    groups = {}
+    for row in db.execute(where(_stats)).mappings():
+        key = tuple(row[name] for name in group_by)
+        group = groups.setdefault(key, {})
+        entry = group.get(row['metric'])
+        if entry is None:
+            group[row['metric']] = {
+                'count': row['value_count'], 'sum': row['value_sum'], 'sum_sq': row['value_sum_sq'],
+                'min': row['value_min'], 'max': row['value_max'], 'buckets': {}
+            }
+        else:
+            entry['count'] += row['value_count']
+            entry['sum'] += row['value_sum']
+            entry['sum_sq'] += row['value_sum_sq']
+            entry['min'] = min(entry['min'], row['value_min'])
+            entry['max'] = max(entry['max'], row['value_max'])
+    for row in db.execute(where(_buckets)).mappings():
+        key = tuple(row[name] for name in group_by)
+        buckets = groups[key][row['metric']]['buckets']
+        buckets[row['bucket']] = buckets.get(row['bucket'], 0) + row['value_count']
+
+    summaries = []
+    for key in sorted(groups):
+        metrics = {}
+        for metric in METRICS:
+            entry = groups[key].get(metric)
+            if entry is None:
+                continue
+            n = entry['count']
+            mean = entry['sum'] / n
+            variance = max(0.0, entry['sum_sq'] / n - mean * mean)
+            buckets = sorted(entry['buckets'].items())
+            summary = {
+                'mean': round(mean, 2),
+                'stddev': round(math.sqrt(variance), 2),
+                'min': entry['min'],
+                'max': entry['max']
+            }
+            for p in percentiles:
+                # 推定値は実際の最小値・最大値の範囲に収める
+                value = min(max(_quantile(buckets, n, p / 100), entry['min']), entry['max'])
+                summary[f'p{p}'] = round(value, 2)
+            metrics[metric] = summary
+        count = max(entry['count'] for entry in groups[key].values())
+        summaries.append({**dict(zip(group_by, key)), 'count': count, 'metrics': metrics})
+    return summaries
@@ -1,51 +1,103 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-import sys
-from pathlib import Path
-
-# backendディレクトリをパスに追加
-backend_dir = Path(__file__).parent.parent
-if str(backend_dir) not in sys.path:
-    sys.path.insert(0, str(backend_dir))
+import secrets
 
 from auth.jwt import verify_token
-from database import get_db
+from config import settings
+from database import get_db, get_async_db
 import crud
+import crud_async
 import models
 
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ):
     """JWTトークンから現在のユーザーを取得"""
-    token = credentials.credentials
+    return get_user_from_token(credentials.credentials, db)
+
+def get_current_user_optional(
+    credentials: HTTPAuthorizationCredentials = Depends(optional_security),
+    db: Session = Depends(get_db)
+):
+    """トークンがあれば現在のユーザーを取得（未ログインの場合はNone）"""
+    if credentials is None:
+        return None
+    return get_user_from_token(credentials.credentials, db)
+
+def get_user_from_token(token: str, db: Session):
+    """トークンを検証してユーザーを取得（無効な場合は401）"""
+    user = crud.get_user_by_id_cached(db, user_id_from_token(token))
+    return ensure_user_found(user)
+
+def user_id_from_token(token: str) -> int:
+    """トークンを検証してユーザーIDを取得（無効な場合、subがないか整数でない場合は401）"""
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="認証トークンが無効です",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
     payload = verify_token(token)
-    
     if payload is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="認証トークンが無効です",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    user_id: int = int(payload.get("sub"))
-    if user_id is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="認証トークンが無効です",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        raise credentials_exception
     
-    user = crud.get_user_by_id(db, user_id)
+    sub = payload.get("sub")
+    if sub is None:
+        raise credentials_exception
+    try:
+        return int(sub)
+    except (TypeError, ValueError):
+        raise credentials_exception
+
+def ensure_user_found(user):
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="ユーザーが見つかりません",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
     return user
 
+async def get_current_user_async(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """JWTトークンから現在のユーザーを取得（非同期DB版）"""
+    user = await crud_async.get_user_by_id_cached(db, user_id_from_token(credentials.credentials))
+    return ensure_user_found(user)
+
+async def get_current_user_optional_async(
+    credentials: HTTPAuthorizationCredentials = Depends(optional_security),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """トークンがあれば現在のユーザーを取得（未ログインの場合はNone、非同期DB版）"""
+    if credentials is None:
+        return None
+    user = await crud_async.get_user_by_id_cached(db, user_id_from_token(credentials.credentials))
+    return ensure_user_found(user)
+
+
+def admin_token_valid(token: str) -> bool:
+    """管理用トークンが正しいか（管理用APIが無効の場合は常にFalse）"""
+    if not settings.admin_token:
+        return False
+    return secrets.compare_digest(token.encode("utf-8"), settings.admin_token.encode("utf-8"))
+
+
+def require_admin(x_admin_token: str = Header(default="")):
+    """管理用APIのトークンを検証"""
+    if not settings.admin_token:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="管理用APIは無効です",
+        )
+    if not admin_token_valid(x_admin_token):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="管理用トークンが正しくありません",
+        )
@@ -1,15 +1,19 @@
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-import sys
-from pathlib import Path
-
-# backendディレクトリをパスに追加（authモジュールからconfigをインポートするため）
-backend_dir = Path(__file__).parent.parent
-if str(backend_dir) not in sys.path:
-    sys.path.insert(0, str(backend_dir))
+import hashlib
+import time
 
+from cache import TTLCache
 from config import settings
 
+# 検証済みトークンのクレーム（キーは署名鍵・アルゴリズムとトークンのSHA-256、有効期限はトークンのexpまで）
+token_cache = TTLCache(settings.token_cache_size)
+
+def token_cache_key(token: str) -> bytes:
+    # 署名鍵を変更（設定の再読み込み）した後は、古い鍵で検証した結果を使わないようキーに含める
+    raw = "\0".join((settings.jwt_algorithm, settings.jwt_secret, token))
+    return hashlib.sha256(raw.encode("utf-8")).digest()
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     """JWTトークンを作成"""
     to_encode = data.copy()
@@ -23,10 +27,22 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     return encoded_jwt
 
 def verify_token(token: str):
-    """JWTトークンを検証"""
+    """JWTトークンを検証（検証済みのトークンはexpまでキャッシュから返す）"""
+    key = token_cache_key(token)
+    payload = token_cache.get(key)
+    if payload is not None:
+        return dict(payload)
+    
     try:
         payload = jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
-        return payload
     except JWTError:
         return None
+    
+    # expのないトークンは期限を判断できないためキャッシュしない
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        remaining = exp - time.time()
+        if remaining > 0:
+            token_cache.set(key, dict(payload), ttl=remaining)
+    return payload
 
@@ -1,8 +1,61 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import bcrypt
 
+import metrics
+from config import settings
+
 # bcryptの72バイト制限
 BCRYPT_MAX_BYTES = 72
 
+# bcryptのコスト（2^rounds回のストレッチング）。calibrate_roundsで起動時に調整できる
+_rounds = settings.bcrypt_rounds
+
+
+def current_rounds() -> int:
+    return _rounds
+
+
+def configure_rounds(rounds: int):
+    """新しく作成するハッシュのコストを変更"""
+    global _rounds
+    _rounds = rounds
+
+
+def calibrate_rounds(target_ms: float, min_rounds: int = None, max_rounds: int = 16) -> int:
+    """1回のハッシュ化が target_ms 以内に収まる最大のコストを計測して返す
+
+    min_rounds（省略時は設定の bcrypt_rounds）未満にはしない。設定より弱いコストで新しいハッシュを作らないため。
+    """
+    if min_rounds is None:
+        min_rounds = settings.bcrypt_rounds
+    max_rounds = max(max_rounds, min_rounds)
+    start = time.perf_counter()
+    bcrypt.hashpw(b"calibration", bcrypt.gensalt(rounds=min_rounds))
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    rounds = min_rounds
+    # コストを1上げるごとに計算時間はほぼ2倍になる
+    while rounds < max_rounds and elapsed_ms * 2 <= target_ms:
+        rounds += 1
+        elapsed_ms *= 2
+    return rounds
+
+
+def hash_rounds(hashed_password: str) -> int:
+    """ハッシュ文字列（$2b$12$...）からコストを取得"""
+    try:
+        return int(hashed_password.split("$")[2])
+    except (IndexError, ValueError):
+        return 0
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """現在の設定より弱いコストで作成されたハッシュかどうか（強いハッシュを弱いコストで作り直さない）"""
+    return hash_rounds(hashed_password) < _rounds
+
 def hash_password(password: str) -> str:
     """パスワードをハッシュ化（bcryptを直接使用）"""
     # パスワードのバイト長をチェック
@@ -15,8 +68,9 @@ def hash_password(password: str) -> str:
     
     try:
         # bcryptを直接使用（passlibを使わない）
-        salt = bcrypt.gensalt()
-        hashed = bcrypt.hashpw(password_bytes, salt)
+        salt = bcrypt.gensalt(rounds=_rounds)
+        with metrics.stage("bcrypt"):
+            hashed = bcrypt.hashpw(password_bytes, salt)
         return hashed.decode("utf-8")
     except Exception as e:
         # 予期しないエラーを捕捉
@@ -35,7 +89,8 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         # bcryptを直接使用（passlibを使わない）
         plain_bytes = plain_password.encode("utf-8")
         hashed_bytes = hashed_password.encode("utf-8")
-        return bcrypt.checkpw(plain_bytes, hashed_bytes)
+        with metrics.stage("bcrypt"):
+            return bcrypt.checkpw(plain_bytes, hashed_bytes)
     except Exception as e:
         # 検証時のエラーも捕捉（通常は発生しないが、念のため）
         error_msg = str(e)
@@ -43,3 +98,63 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
             raise ValueError("パスワードが長すぎます。72バイト以内で入力してください。")
         return False
 
+
+
+class PasswordPoolBusy(Exception):
+    """パスワード処理の待ち行列が上限に達している"""
+
+
+class PasswordHasherPool:
+    """bcryptの処理を専用のスレッドプールで実行する
+
+    実行中＋待機中の件数が workers + queue_limit を超える場合は、
+    待たずに PasswordPoolBusy を送出する（ログイン集中時に他のリクエストを巻き込まないため）。
+    bcryptは計算中にGILを解放するため、スレッドでも並列に処理できる。
+    """
+    
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password")
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+    
+    def submit(self, fn, *args):
+        """処理を投入してFutureを返す（満杯の場合はPasswordPoolBusy）"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordPoolBusy("パスワード処理が混み合っています")
+        with self._lock:
+            self.in_flight += 1
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        return future
+    
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+    
+    async def run(self, fn, *args):
+        """処理を投入し、イベントループを止めずに完了を待つ"""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "in_flight": self.in_flight,
+                "rejected": self.rejected,
+                "rounds": _rounds
+            }
+
+
+password_pool = PasswordHasherPool(settings.password_workers, settings.password_queue_limit)
@@ -0,0 +1,95 @@
+"""
+プラン一覧レスポンスのシリアライズ処理のマイクロベンチマーク
+
+response_model（pydanticでの検証＋jsonable→json.dumps）を通す従来の方法と、
+serialization.py の高速パス（dictへの詰め替え＋orjson）で、1行あたりの処理時間を比較する。
+
+実行方法（backendディレクトリで）:
+    python -m benchmarks.bench_serialization --rows 1000 --repeat 20
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+from typing import List
+
+# DBには接続しないが、設定の読み込みで本番のDATABASE_URLを参照しないよう一時ファイルを指定する
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from pydantic import TypeAdapter
+
+import crud, models, schemas, serialization
+
+TYPES = ["カフェ", "焼鳥", "ラーメン", "居酒屋", "イタリアン"]
+AREAS = ["駅近", "住宅街", "観光地", "オフィス街"]
+COLUMNS = {c.name for c in models.BusinessPlan.__table__.columns}
+
+
+def build_rows(count: int) -> list:
+    """一覧取得で返すのと同じ状態のBusinessPlan（拡張フィールド保存済み）を作成"""
+    rows = []
+    for i in range(count):
+        plan = schemas.BusinessPlanInput(
+            type=TYPES[i % len(TYPES)],
+            seats=10 + i % 40,
+            atv=800 + (i % 25) * 100,
+            hours="11:00-22:00",
+            area=AREAS[i % len(AREAS)]
+        )
+        calc = crud.calculate_business_plan(plan)
+        rows.append(models.BusinessPlan(
+            id=i + 1,
+            created_at=datetime(2024, 1, 1, 12, 0, 0, i),
+            extended=crud.extended_fields(calc),
+            **plan.model_dump(),
+            **{k: v for k, v in calc.items() if k in COLUMNS and k not in plan.model_fields}
+        ))
+    return rows
+
+
+def response_model_path(adapter: TypeAdapter, rows: list) -> bytes:
+    """FastAPIがresponse_model付きのエンドポイントで行う処理（検証→JSON互換化→json.dumps）"""
+    value = adapter.validate_python(rows, from_attributes=True)
+    content = adapter.dump_python(value, mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def fast_path(rows: list) -> bytes:
+    return serialization.dumps([serialization.plan_dict(row) for row in rows])
+
+
+def measure(func, repeat: int) -> float:
+    """repeat回実行したうちの最短時間（秒）"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = build_rows(args.rows)
+    adapter = TypeAdapter(List[schemas.BusinessPlanOutput])
+
+    # 両方の方法で同じJSONになることを確認してから計測する
+    if json.loads(response_model_path(adapter, rows)) != json.loads(fast_path(rows)):
+        raise SystemExit("出力が一致しません")
+
+    baseline = measure(lambda: response_model_path(adapter, rows), args.repeat)
+    fast = measure(lambda: fast_path(rows), args.repeat)
+    print(f"rows: {args.rows}, repeat: {args.repeat}")
+    print(f"response_model: {baseline * 1e6 / args.rows:8.2f} us/row ({baseline * 1e3:.2f} ms)")
+    print(f"fast path:      {fast * 1e6 / args.rows:8.2f} us/row ({fast * 1e3:.2f} ms)")
+    print(f"speedup:        {baseline / fast:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
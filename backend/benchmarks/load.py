@@ -0,0 +1,208 @@
+"""
+APIの全エンドポイントの負荷テスト
+
+main.app をASGIクライアント（httpx.ASGITransport）でプロセス内から呼び出し、
+シード済みの一時SQLite DBに対してエンドポイントごとのスループットとp50/p95/p99レイテンシを計測する。
+main.py のルートのうち、SCENARIOS にないものがあればエラーにする（新しいルートの追加漏れ防止）。
+
+実行方法（backendディレクトリで）:
+    # 計測してベースラインを保存
+    python -m benchmarks.load --concurrency 8 --requests 200 --output benchmarks/baseline.json
+    # ベースラインと比較（p95などが20%を超えて悪化したルートがあれば終了コード1）
+    python -m benchmarks.load --compare benchmarks/baseline.json --threshold 0.2
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+ADMIN_TOKEN = "benchmark-admin-token"
+
+# アプリの読み込み前に、計測用の一時DB（起動時にスキーマを作成）と管理用トークンを設定する
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/benchmark.db"
+os.environ["ADMIN_TOKEN"] = ADMIN_TOKEN
+os.environ["AUTO_MIGRATE"] = "true"
+
+import httpx
+from fastapi.routing import APIRoute
+
+from benchmarks import report
+
+PLAN = {"type": "カフェ", "seats": 20, "atv": 1200, "hours": "10:00-20:00", "area": "駅近"}
+TYPES = ["カフェ", "焼鳥", "ラーメン", "居酒屋", "イタリアン"]
+AREAS = ["駅近", "住宅街", "観光地", "オフィス街"]
+PASSWORD = "benchmark-password"
+
+
+class Context:
+    """シード時に作成したデータ（シナリオのリクエスト作成に使う）"""
+    token = None
+    email = None
+    plan_ids = []
+    counter = 0
+
+    def next(self) -> int:
+        self.counter += 1
+        return self.counter
+
+
+def auth(ctx: Context) -> dict:
+    return {"Authorization": f"Bearer {ctx.token}"}
+
+
+ADMIN = {"X-Admin-Token": ADMIN_TOKEN}
+
+# (メソッド, ルートのテンプレート) -> リクエストを作る関数（戻り値は (path, kwargs)）
+SCENARIOS = {
+    ("GET", "/"): lambda ctx: ("/", {}),
+    ("GET", "/health"): lambda ctx: ("/health", {}),
+    ("GET", "/metrics"): lambda ctx: ("/metrics", {}),
+    ("POST", "/api/plans"): lambda ctx: ("/api/plans", {
+        "json": dict(PLAN, seats=10 + ctx.next() % 50), "headers": auth(ctx)
+    }),
+    ("POST", "/api/plans/batch"): lambda ctx: ("/api/plans/batch", {
+        "json": {"plans": [
+            dict(PLAN, type=TYPES[i % 5], area=AREAS[i % 4], seats=10 + i) for i in range(100)
+        ]}
+    }),
+    ("POST", "/api/plans/sweep"): lambda ctx: ("/api/plans/sweep", {
+        "json": {"type": "カフェ", "area": "駅近", "seats": {"start": 10, "stop": 60}, "atv": {"start": 500, "stop": 3000, "step": 50}}
+    }),
+    ("POST", "/api/plans/solve"): lambda ctx: ("/api/plans/solve", {
+        "json": {"type": "カフェ", "area": "駅近", "solve_for": "seats", "atv": 1200,
+                 "target_op_income": list(range(0, 1000000, 10000)), "target_payback_months": [12, 24, 36]}
+    }),
+    ("POST", "/api/plans/montecarlo"): lambda ctx: ("/api/plans/montecarlo", {
+        "json": {"type": "カフェ", "area": "駅近", "seats": 20, "atv": 1200, "draws": 20000, "seed": 1}
+    }),
+    ("GET", "/api/plans"): lambda ctx: ("/api/plans", {"params": {"limit": 20}}),
+    ("GET", "/api/plans/my"): lambda ctx: ("/api/plans/my", {"params": {"limit": 20}, "headers": auth(ctx)}),
+    ("GET", "/api/plans/my/export"): lambda ctx: ("/api/plans/my/export", {"params": {"format": "ndjson"}, "headers": auth(ctx)}),
+    ("GET", "/api/plans/{plan_id}"): lambda ctx: (f"/api/plans/{ctx.plan_ids[ctx.next() % len(ctx.plan_ids)]}", {"headers": auth(ctx)}),
+    ("GET", "/api/menus/{type}/{concept}"): lambda ctx: ("/api/menus/カフェ/ヘルシー", {}),
+    ("GET", "/api/menus/search"): lambda ctx: ("/api/menus/search", {"params": {"tags": "ヘルシー,低糖質", "max_price": 1000}}),
+    ("GET", "/api/subsidies/{area}"): lambda ctx: (f"/api/subsidies/{AREAS[ctx.next() % 4]}", {}),
+    ("POST", "/api/auth/register"): lambda ctx: ("/api/auth/register", {
+        "json": {"email": f"bench-{os.getpid()}-{ctx.next()}@example.com", "password": PASSWORD}
+    }),
+    ("POST", "/api/auth/login"): lambda ctx: ("/api/auth/login", {"json": {"email": ctx.email, "password": PASSWORD}}),
+    ("GET", "/api/auth/me"): lambda ctx: ("/api/auth/me", {"headers": auth(ctx)}),
+    ("GET", "/api/admin/cache/stats"): lambda ctx: ("/api/admin/cache/stats", {"headers": ADMIN}),
+    ("GET", "/api/admin/db/pool"): lambda ctx: ("/api/admin/db/pool", {"headers": ADMIN}),
+    ("GET", "/api/admin/db/writer"): lambda ctx: ("/api/admin/db/writer", {"headers": ADMIN}),
+    ("GET", "/api/admin/analytics/plans"): lambda ctx: ("/api/admin/analytics/plans", {"headers": ADMIN}),
+    ("GET", "/api/admin/plans/search"): lambda ctx: ("/api/admin/plans/search", {"params": {"q": "カフェ"}, "headers": ADMIN}),
+    ("GET", "/api/admin/profiles"): lambda ctx: ("/api/admin/profiles", {"headers": ADMIN}),
+    # 保存済みのプロファイルがない状態での404応答を計測する
+    ("GET", "/api/admin/profiles/{name}"): lambda ctx: ("/api/admin/profiles/none.speedscope.json", {"headers": ADMIN}),
+    ("GET", "/api/admin/catalog"): lambda ctx: ("/api/admin/catalog", {"headers": ADMIN}),
+    ("POST", "/api/admin/catalog/reload"): lambda ctx: ("/api/admin/catalog/reload", {"headers": ADMIN}),
+}
+# 正常系として期待するステータス（既定は200）
+EXPECTED_STATUS = {
+    ("GET", "/api/admin/profiles/{name}"): 404,
+}
+
+
+def app_routes(app) -> set:
+    return {(method, route.path) for route in app.routes if isinstance(route, APIRoute) for method in route.methods}
+
+
+async def seed(client: httpx.AsyncClient, ctx: Context, plans: int):
+    """計測用のユーザーとプランを作成"""
+    ctx.email = f"bench-owner-{os.getpid()}@example.com"
+    response = await client.post("/api/auth/register", json={"email": ctx.email, "password": PASSWORD})
+    response.raise_for_status()
+    ctx.token = response.json()["access_token"]
+    response = await client.post("/api/plans/batch", headers=auth(ctx), json={
+        "persist": True,
+        "plans": [dict(PLAN, type=TYPES[i % 5], area=AREAS[i % 4], seats=10 + i % 50) for i in range(plans)]
+    })
+    response.raise_for_status()
+    ctx.plan_ids = [item["result"]["id"] for item in response.json()["items"]]
+
+
+async def run_scenario(client: httpx.AsyncClient, ctx: Context, key: tuple, requests: int, concurrency: int) -> dict:
+    """1つのルートに対してconcurrency並列でrequests回リクエストし、集計値を返す"""
+    build = SCENARIOS[key]
+    expected = EXPECTED_STATUS.get(key, 200)
+    latencies = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            path, kwargs = build(ctx)
+            started = time.perf_counter()
+            response = await client.request(key[0], path, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != expected:
+                errors += 1
+
+    # ウォームアップ（初回のみのキャッシュ作成やコネクション確立を計測に含めない）
+    path, kwargs = build(ctx)
+    await client.request(key[0], path, **kwargs)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    summary = report.latency_summary(latencies, time.perf_counter() - started)
+    summary["errors"] = errors
+    return summary
+
+
+async def run(args) -> dict:
+    from main import app
+
+    missing = app_routes(app) - SCENARIOS.keys()
+    if missing:
+        raise SystemExit(f"負荷テストのシナリオがないルートがあります: {sorted(missing)}")
+
+    ctx = Context()
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    # startup / shutdown イベントも実際の起動時と同じように実行する
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            await seed(client, ctx, args.seed_plans)
+            for key in SCENARIOS:
+                name = f"{key[0]} {key[1]}"
+                if args.only and not any(part in name for part in args.only):
+                    continue
+                requests = args.requests
+                if key[1].startswith("/api/auth/") and key[1] != "/api/auth/me":
+                    # bcryptを使うルートは1回が重いため回数を減らす
+                    requests = max(args.concurrency, requests // 10)
+                results[name] = await run_scenario(client, ctx, key, requests, args.concurrency)
+                print(f"{name}: {results[name]['throughput_rps']} req/s, p95 {results[name]['p95_ms']} ms", file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=8, help="同時リクエスト数")
+    parser.add_argument("--requests", type=int, default=200, help="ルートごとのリクエスト数")
+    parser.add_argument("--seed-plans", type=int, default=500, help="事前に作成するプラン数")
+    parser.add_argument("--only", nargs="*", help="名前に指定した文字列を含むルートだけを計測")
+    parser.add_argument("--output", help="結果を保存するJSONファイル")
+    parser.add_argument("--compare", help="比較するベースラインのJSONファイル")
+    parser.add_argument("--threshold", type=float, default=0.2, help="悪化とみなす割合（0.2 = 20%%）")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    report.print_table(results, ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "errors"))
+    if args.output:
+        report.write_results(args.output, results, concurrency=args.concurrency, requests=args.requests)
+    if any(r["errors"] for r in results.values()):
+        print("\n想定外のステータスを返したリクエストがあります", file=sys.stderr)
+        sys.exit(1)
+    if args.compare:
+        regressions = report.compare_results(report.load_results(args.compare), results, args.threshold)
+        sys.exit(report.report_regressions(regressions, args.threshold))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+収支計算・パスワードハッシュ・JWT・メニュー検索のマイクロベンチマーク
+
+実行方法（backendディレクトリで）:
+    python -m benchmarks.micro --output benchmarks/micro_baseline.json
+    python -m benchmarks.micro --compare benchmarks/micro_baseline.json --threshold 0.2
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+# DBには接続しないが、設定の読み込みで本番のDATABASE_URLを参照しないよう一時ファイルを指定する
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/micro.db")
+
+import crud, menu_engine, schemas
+from auth import password
+from auth.jwt import create_access_token, token_cache, verify_token
+from benchmarks import report
+
+PLAN = schemas.BusinessPlanInput(type="カフェ", seats=20, atv=1200, hours="10:00-20:00", area="駅近")
+
+
+def bench(func, min_time: float, repeat: int = 3) -> dict:
+    """1回の計測がmin_time秒以上になる回数を求め、repeat回計測した最短の平均時間を返す"""
+    func()
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        loops *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed) + 1))
+    best = elapsed
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        best = min(best, time.perf_counter() - started)
+    per_call = best / loops
+    return {'loops': loops, 'mean_us': round(per_call * 1e6, 3), 'ops_per_sec': round(1 / per_call, 1)}
+
+
+def cold_verify(token: str):
+    # キャッシュなしでの検証時間（毎回デコード・署名検証を行う）
+    token_cache.clear()
+    verify_token(token)
+
+
+def synthetic_menu_engine(count: int = 30000, seed: int = 0) -> tuple:
+    """タグ40種類・業態30種類の架空のメニューcount件で検索エンジンを組み立てる"""
+    rng = random.Random(seed)
+    tags = [f"タグ{i}" for i in range(40)]
+    categories = [f"業態{i}" for i in range(30)]
+    items = [
+        {"category": rng.choice(categories), "name": f"メニュー{i}", "price": rng.randrange(100, 5000),
+         "description": "", "tags": rng.sample(tags, rng.randint(1, 4))}
+        for i in range(count)
+    ]
+    return menu_engine.MenuEngine({"items": items}), tags, categories
+
+
+def benchmarks() -> dict:
+    engine, tags, categories = synthetic_menu_engine()
+    hashed = password.hash_password("benchmark-password")
+    token = create_access_token({"sub": "1"})
+    return {
+        'calculate_business_plan': lambda: crud.calculate_business_plan(PLAN),
+        'calculate_business_plan_cached': lambda: crud.calculate_business_plan_cached(PLAN),
+        f'hash_password (rounds={password.current_rounds()})': lambda: password.hash_password("benchmark-password"),
+        f'verify_password (rounds={password.hash_rounds(hashed)})': lambda: password.verify_password("benchmark-password", hashed),
+        'create_access_token': lambda: create_access_token({"sub": "1"}),
+        'verify_token (uncached)': lambda: cold_verify(token),
+        'verify_token (cached)': lambda: verify_token(token),
+        'menu_search (30000 items, 1 tag)': lambda: engine.search(tags=[(tags[0], 1.0)], k=10),
+        'menu_search (30000 items, 3 tags)': lambda: engine.search(tags=[(tag, 1.0) for tag in tags[:3]], k=10),
+        'menu_search (30000 items, category + price)': lambda: engine.search(categories[0], max_price=3000, k=10),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--min-time", type=float, default=0.5, help="1回の計測の最低時間（秒）")
+    parser.add_argument("--repeat", type=int, default=3, help="計測の繰り返し回数（最短の結果を使う）")
+    parser.add_argument("--output", help="結果を保存するJSONファイル")
+    parser.add_argument("--compare", help="比較するベースラインのJSONファイル")
+    parser.add_argument("--threshold", type=float, default=0.2, help="悪化とみなす割合（0.2 = 20%%）")
+    args = parser.parse_args()
+
+    results = {name: bench(func, args.min_time, args.repeat) for name, func in benchmarks().items()}
+    report.print_table(results, ("loops", "mean_us", "ops_per_sec"))
+    if args.output:
+        report.write_results(args.output, results, min_time=args.min_time, repeat=args.repeat)
+    if args.compare:
+        regressions = report.compare_results(report.load_results(args.compare), results, args.threshold)
+        sys.exit(report.report_regressions(regressions, args.threshold))
+
+
+if __name__ == "__main__":
+    main()
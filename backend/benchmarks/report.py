@@ -0,0 +1,90 @@
+"""
+ベンチマーク結果の集計・保存・比較
+
+結果はJSON（{"meta": {...}, "results": {名前: {指標: 値}}}）で保存し、
+--compare で指定したベースラインと比べて、しきい値を超えて悪化した項目を返す。
+"""
+import json
+import math
+import platform
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# 比較する指標と、値が大きいほど良いか（スループット）小さいほど良いか（レイテンシ）
+HIGHER_IS_BETTER = {'throughput_rps', 'ops_per_sec'}
+LOWER_IS_BETTER = {'p50_ms', 'p95_ms', 'p99_ms', 'mean_us'}
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    """ソート済みの値の最近傍順位法によるパーセンタイル"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def latency_summary(latencies: list, elapsed: float) -> dict:
+    """レイテンシ（秒）のリストと全体の所要時間から集計値を作成"""
+    values = sorted(latencies)
+    return {
+        'requests': len(values),
+        'throughput_rps': round(len(values) / elapsed, 2) if elapsed > 0 else 0.0,
+        'p50_ms': round(percentile(values, 50) * 1000, 3),
+        'p95_ms': round(percentile(values, 95) * 1000, 3),
+        'p99_ms': round(percentile(values, 99) * 1000, 3),
+        'max_ms': round(values[-1] * 1000, 3) if values else 0.0
+    }
+
+
+def write_results(path: str, results: dict, **meta):
+    data = {
+        'meta': {
+            'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            **meta
+        },
+        'results': results
+    }
+    Path(path).write_text(json.dumps(data, ensure_ascii=False, indent=2) + '\n', encoding='utf-8')
+
+
+def load_results(path: str) -> dict:
+    return json.loads(Path(path).read_text(encoding='utf-8'))['results']
+
+
+def compare_results(baseline: dict, current: dict, threshold: float) -> list:
+    """ベースラインから threshold（0.2 = 20%）を超えて悪化した項目を (名前, 指標, 基準値, 今回の値) のリストで返す"""
+    regressions = []
+    for name, metrics in current.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric, value in metrics.items():
+            before = base.get(metric)
+            if not before:
+                continue
+            if metric in LOWER_IS_BETTER and value > before * (1 + threshold):
+                regressions.append((name, metric, before, value))
+            elif metric in HIGHER_IS_BETTER and value < before * (1 - threshold):
+                regressions.append((name, metric, before, value))
+    return regressions
+
+
+def print_table(results: dict, columns: tuple):
+    width = max([len(name) for name in results] + [5])
+    print(f"{'name':<{width}}  " + "  ".join(f"{c:>14}" for c in columns))
+    for name, metrics in results.items():
+        print(f"{name:<{width}}  " + "  ".join(f"{metrics.get(c, ''):>14}" for c in columns))
+
+
+def report_regressions(regressions: list, threshold: float) -> int:
+    """悪化した項目を表示し、終了コード（悪化があれば1）を返す"""
+    if not regressions:
+        print(f"\nベースラインからの悪化はありません（しきい値 {threshold:.0%}）")
+        return 0
+    print(f"\nベースラインから {threshold:.0%} を超えて悪化した項目:")
+    for name, metric, before, value in regressions:
+        print(f"  {name} {metric}: {before} -> {value}")
+    return 1
@@ -0,0 +1,161 @@
+"""
+業態別の文章・係数カタログ
+
+data/catalog.json を読み込み、(メインカテゴリ, 立地) をキーとする
+読み取り専用のインデックスに展開する。各エントリには文章項目を
+レンダリング済みの状態で保持するため、参照は1回の辞書検索で済む。
+
+カタログファイルが更新されると（catalog_reload_interval秒ごとに更新日時を確認）、
+新しいインデックスを組み立ててから参照を差し替える。差し替えは参照の代入1回なので、
+読み込み中のリクエストが中途半端な状態のカタログを見ることはない。
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+
+from config import settings
+
+DEFAULT_CATALOG_PATH = Path(__file__).parent / "data" / "catalog.json"
+
+# 立地ごとに異なる文章項目
+AREA_FIELDS = ('concept', 'catch_copy', 'target_audience')
+
+
+@dataclass(frozen=True)
+class CatalogEntry:
+    concept: str
+    catch_copy: str
+    target_audience: str
+    action: str
+    sns_strategy: str
+    menu_examples: tuple
+    cogs_rate: float
+    investment_multiplier: float
+
+
+_PLACEHOLDER = re.compile(r'\{(area|main_type)\}')
+
+
+def _render(template: str, main_type: str, area: str) -> str:
+    # 利用者の入力値に波括弧が含まれても壊れないよう、format ではなくテンプレートを1回だけ走査して埋め込む
+    # （埋め込んだ値の中の {main_type} などは置き換えない）
+    values = {'area': area, 'main_type': main_type}
+    return _PLACEHOLDER.sub(lambda m: values[m.group(1)], template)
+
+
+class Catalog:
+    def __init__(self, data: dict, version: str):
+        self.version = version
+        self.loaded_at = time.time()
+        self._defaults = data['defaults']
+        self._categories = data.get('categories', {})
+
+        index = {}
+        for main_type, category in self._categories.items():
+            for area in category.get('areas', {}):
+                index[(main_type, area)] = self._build_entry(main_type, area)
+            # 立地に依存しない項目だけを参照する場合のエントリ
+            index[(main_type, None)] = self._build_entry(main_type, None)
+        self._index = MappingProxyType(index)
+        self._default_entry = self._build_entry(None, None)
+
+    def _build_entry(self, main_type: str, area: str) -> CatalogEntry:
+        category = self._categories.get(main_type, {})
+        area_texts = category.get('areas', {}).get(area, {})
+        fields = {}
+        for name in AREA_FIELDS:
+            if name in area_texts:
+                fields[name] = area_texts[name]
+            elif area is not None and main_type is not None:
+                fields[name] = _render(self._defaults[name], main_type, area)
+            else:
+                fields[name] = None
+        sns_strategy = None
+        if area is not None and main_type is not None:
+            sns_strategy = _render(category.get('sns_strategy', self._defaults['sns_strategy']), main_type, area)
+        menu_examples = category.get('menu_examples', self._defaults['menu_examples'])
+        return CatalogEntry(
+            sns_strategy=sns_strategy,
+            action=category.get('action', self._defaults['action']),
+            menu_examples=tuple(MappingProxyType(dict(m)) for m in menu_examples),
+            cogs_rate=float(category.get('cogs_rate', self._defaults['cogs_rate'])),
+            investment_multiplier=float(
+                category.get('investment_multiplier', self._defaults['investment_multiplier'])
+            ),
+            **fields
+        )
+
+    def lookup(self, main_type: str, area: str = None) -> CatalogEntry:
+        """(メインカテゴリ, 立地) のエントリを取得（areaを省略すると立地に依存しない項目のみ）"""
+        entry = self._index.get((main_type, area))
+        if entry is not None:
+            return entry
+        if area is None:
+            return self._default_entry
+        # カタログにない組み合わせは既定のテンプレートから組み立てる
+        return self._build_entry(main_type, area)
+
+    @property
+    def categories(self) -> list:
+        return list(self._categories)
+
+    def info(self) -> dict:
+        return {
+            'version': self.version,
+            'loaded_at': self.loaded_at,
+            'categories': len(self._categories),
+            'entries': len(self._index)
+        }
+
+
+def catalog_path() -> Path:
+    return Path(settings.catalog_path) if settings.catalog_path else DEFAULT_CATALOG_PATH
+
+
+def load_catalog(path: Path = None) -> Catalog:
+    """カタログファイルを読み込んでインデックスを組み立てる"""
+    raw = (path or catalog_path()).read_bytes()
+    data = json.loads(raw.decode('utf-8'))
+    if 'defaults' not in data:
+        raise ValueError('カタログにdefaultsがありません')
+    return Catalog(data, hashlib.sha256(raw).hexdigest()[:12])
+
+
+_catalog = None
+_catalog_mtime = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def reload_catalog() -> Catalog:
+    """カタログを読み直して差し替える（読み込みに失敗した場合は現在のカタログを維持して例外を送出）"""
+    global _catalog, _catalog_mtime, _checked_at
+    with _lock:
+        path = catalog_path()
+        mtime = path.stat().st_mtime
+        new_catalog = load_catalog(path)
+        _catalog, _catalog_mtime, _checked_at = new_catalog, mtime, time.monotonic()
+        return new_catalog
+
+
+def get_catalog() -> Catalog:
+    """現在のカタログを取得（ファイルが更新されていれば読み直す）"""
+    global _checked_at
+    catalog = _catalog
+    if catalog is None:
+        return reload_catalog()
+    interval = settings.catalog_reload_interval
+    if interval > 0 and time.monotonic() - _checked_at >= interval:
+        _checked_at = time.monotonic()
+        try:
+            if catalog_path().stat().st_mtime != _catalog_mtime:
+                return reload_catalog()
+        except Exception as e:
+            # 自動再読み込みに失敗しても、直前のカタログで処理を続ける
+            print(f"Warning: Failed to reload catalog: {e}")
+    return catalog
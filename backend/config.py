@@ -6,10 +6,50 @@ env_path = Path(__file__).parent / ".env"
 
 class Settings(BaseSettings):
     database_url: str = "sqlite:///./omise_ai.db"
+    database_async: bool = False  # Trueでプランの取得系エンドポイントを非同期DB（aiosqlite / aiomysql）で処理
+    db_echo: bool = False  # TrueでSQLをログ出力（デバッグ用）
+    db_pool_size: int = 5  # 常時保持するコネクション数
+    db_max_overflow: int = 10  # pool_sizeを超えて一時的に作成できるコネクション数
+    db_pool_timeout: float = 30  # コネクション取得の待ち時間の上限（秒）
+    db_pool_recycle: int = 1800  # この秒数を超えたコネクションは作り直す（MySQLのwait_timeout対策）
+    db_pool_pre_ping: bool = True  # 払い出し前に接続の生存確認を行う
+    auto_migrate: bool = False  # Trueで起動時に未適用のマイグレーションを実行（通常はデプロイ時に manage.py migrate を実行）
     frontend_url: str = "http://localhost:3000"
     jwt_secret: str = "your-secret-key-change-in-production"
     jwt_algorithm: str = "HS256"
     jwt_expires_in: int = 86400  # 24時間（秒）
+    bcrypt_rounds: int = 12  # パスワードハッシュのコスト
+    bcrypt_target_ms: float = 0  # 0より大きい場合、起動時に1回のハッシュ化がこの時間に収まるコストへ調整
+    password_workers: int = 2  # パスワード処理の専用スレッド数
+    password_queue_limit: int = 16  # パスワード処理の待機数の上限（超えた場合は503を返す）
+    plan_write_durability: str = "sync"  # プランの保存方法（sync: リクエストごとにコミット、group_commit: まとめてコミット）
+    plan_write_batch_size: int = 100  # group_commit で1回のコミットにまとめる最大件数
+    plan_write_max_delay_ms: float = 5  # group_commit で最初の1件からコミットまで待つ最大時間（ミリ秒）
+    plan_write_queue_limit: int = 1000  # group_commit の保存待ちの上限（超えた場合は503を返す）
+    plan_export_chunk_size: int = 1000  # エクスポートで1回にDBから読み込み・出力する件数
+    plan_dedup_window: float = 0  # 同じユーザーの同じ入力を保存済みのプランとして返す期間（秒、既定の0で無効＝オプトイン）
+    plan_batch_max_items: int = 1000  # 一括シミュレーションの最大件数
+    plan_solve_max_targets: int = 1000  # 逆算で一度に指定できる目標の数
+    plan_sweep_max_cells: int = 1000000  # 感度分析グリッドの最大セル数
+    montecarlo_max_draws: int = 5000000  # モンテカルロ分析の最大試行回数
+    plan_cache_size: int = 1024  # 計算結果キャッシュの最大件数（0で無効）
+    plan_cache_ttl: float = 3600  # 計算結果キャッシュの有効期限（秒）
+    token_cache_size: int = 4096  # 検証済みトークンのキャッシュ件数（0で無効）
+    user_cache_size: int = 1024  # 認証ユーザーのキャッシュ件数（0で無効）
+    user_cache_ttl: float = 30  # 認証ユーザーのキャッシュ有効期限（秒）
+    http_cache_max_age: int = 3600  # 参照系レスポンスのCache-Control max-age（秒）
+    http_body_cache_size: int = 512  # 事前シリアライズしたレスポンス本文のキャッシュ件数
+    http_compress_min_size: int = 1024  # この大きさ（バイト）以上の本文を圧縮する
+    catalog_path: str = ""  # 業態カタログのパス（空の場合は data/catalog.json）
+    menu_catalog_path: str = ""  # メニューのパス（空の場合は data/menus.json）
+    catalog_reload_interval: float = 5  # カタログファイルの更新確認間隔（秒、0で自動再読み込みしない）
+    metrics_enabled: bool = True  # /metrics でPrometheus形式のメトリクスを公開する
+    profile_sample_rate: float = 0.0  # プロファイルを記録するリクエストの割合（0〜1、0の場合はX-Profileヘッダー指定時のみ）
+    profile_interval_ms: float = 1  # プロファイラのサンプリング間隔（ミリ秒）
+    profile_dir: str = ""  # プロファイルの保存先（空の場合は一時ディレクトリ）
+    profile_max_files: int = 50  # 保存するプロファイルの最大件数（古いものから削除）
+    admin_token: str = ""  # 管理用APIのトークン（X-Admin-Tokenヘッダー、空の場合は管理用APIを無効化）
+    montecarlo_workers: int = 4  # モンテカルロ分析のプロセス数（1以下でプロセスプールを使わない）
     
     model_config = SettingsConfigDict(
         env_file=str(env_path),
@@ -0,0 +1,29 @@
+"""
+pytest共通設定
+
+テストは一時ディレクトリのSQLiteデータベースを使う（開発用DBを汚さないため）。
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# backendディレクトリをパスに追加
+backend_dir = Path(__file__).parent
+if str(backend_dir) not in sys.path:
+    sys.path.insert(0, str(backend_dir))
+
+_test_db_dir = tempfile.mkdtemp(prefix="omise_ai_test_")
+os.environ["DATABASE_URL"] = f"sqlite:///{Path(_test_db_dir) / 'test.db'}"
+# テストではハッシュ化を速くするため、bcryptのコストを最小にする
+os.environ["BCRYPT_ROUNDS"] = "4"
+
+import pytest
+
+
+@pytest.fixture(scope="session", autouse=True)
+def migrated_database():
+    """テスト用DBのスキーマを作成（アプリの起動時には作成しないため）"""
+    import database
+    import migrations
+    migrations.migrate(database.engine, log=None)
@@ -1,7 +1,34 @@
+from sqlalchemy import select, and_, or_, event
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-import models, schemas
+from pydantic import ValidationError
+from datetime import datetime, timedelta
+import base64
+import hashlib
+import json
+import metrics, models, schemas
+# プランの保存時に集計テーブル（plan_stats）を更新するイベントを登録する
+import analytics  # noqa: F401
 from auth.password import hash_password, verify_password
+from cache import TTLCache
+from catalog import get_catalog
+from menu_engine import get_menu_engine
+from config import settings
+
+# 収支モデルの前提値（simulation.pyのベクトル計算と共有する）
+# 業態ごとの原価率・投資係数と文章項目は data/catalog.json で管理する
+BASE_TURNOVER = 2.0  # 回転数
+GUEST_RATE = 0.9  # 満席率を考慮した来店係数
+BUSINESS_DAYS = 30  # 月間営業日数
+LABOR_RATE = 0.28  # 人件費率
+FIXED_COST = 540000  # 月間固定費
+PAYBACK_MONTHS_PROFIT = 18
+PAYBACK_MONTHS_LOSS = 24
+INVESTMENT_BASE_COST = 5000000  # 基本設備費
+INVESTMENT_SEAT_COST = 50000  # 1席あたりの設備費
+WORKING_CAPITAL = 2000000  # 運転資金
+# 収支モデルの式を変えたら上げる（同じ入力でも再計算したプランとして保存し直す）
+PLAN_MODEL_VERSION = 1
 
 def extract_main_category(type: str) -> str:
     """「和食 - 寿司」のような形式からメインカテゴリを抽出"""
@@ -10,194 +37,23 @@ def extract_main_category(type: str) -> str:
     return type
 
 def generate_concept(type: str, area: str) -> str:
-    main_type = extract_main_category(type)
-    concepts = {
-        'カフェ': {
-            '駅近': '通勤客が立ち寄りたくなる、香り高いコーヒーと焼き立てペストリーの朝カフェ',
-            '住宅街': '地域のリビングルームとして、親子が集う居心地の良いコミュニティカフェ',
-            'オフィス街': 'ランチ需要を捉える、本格コーヒーと軽食が充実したワークカフェ',
-            '観光地': '旅の思い出になる、地元食材を使った特別なスイーツが人気のカフェ'
-        },
-        '焼鳥': {
-            '駅近': 'サラリーマンが仕事帰りにサクッと一杯、気軽に立ち寄れる立ち飲み焼鳥',
-            '住宅街': '家族連れも安心、座敷完備で地元に愛される炭火焼鳥専門店',
-            'オフィス街': 'ランチは丼もの、夜は焼鳥で二毛作、効率重視の焼鳥ダイニング',
-            '観光地': '地鶏にこだわった、観光客が行列する名物焼鳥店'
-        },
-        'ラーメン': {
-            '駅近': '駅前立地を活かした、回転率重視の王道醤油ラーメン',
-            '住宅街': 'ファミリー層も来店しやすい、優しい味わいの地域密着型ラーメン店',
-            'オフィス街': 'ランチタイム一本勝負、濃厚スープで満足度の高い二郎系ラーメン',
-            '観光地': 'ご当地食材を使った、SNS映えする創作ラーメンが人気の店'
-        },
-        '和食': {
-            '駅近': '駅前立地を活かした、手軽に楽しめる本格和食',
-            '住宅街': '家族で楽しめる、地域に愛される和食店',
-            'オフィス街': 'ランチ需要を捉える、定食や丼ものが充実した和食店',
-            '観光地': '地元の食材を活かした、観光客に人気の和食店'
-        },
-        '洋食': {
-            '駅近': '駅前立地を活かした、気軽に楽しめる洋食店',
-            '住宅街': '家族で楽しめる、本格的な洋食店',
-            'オフィス街': 'ランチ需要を捉える、ビジネスパーソン向けの洋食店',
-            '観光地': '観光客に人気の、特別感のある洋食店'
-        },
-        '中華': {
-            '駅近': '駅前立地を活かした、手軽に楽しめる中華料理店',
-            '住宅街': '家族で楽しめる、地域に愛される中華料理店',
-            'オフィス街': 'ランチ需要を捉える、定食やランチメニューが充実した中華料理店',
-            '観光地': '本格的な中華料理が楽しめる、観光客に人気の店'
-        }
-    }
-    return concepts.get(main_type, {}).get(area, f'{area}の{main_type}として、地域に愛される、こだわりの味と心地よい空間を提供するお店')
+    return get_catalog().lookup(extract_main_category(type), area).concept
 
 def generate_action(type: str) -> str:
-    main_type = extract_main_category(type)
-    actions = {
-        'カフェ': '看板メニュー1品を試作し、友人3人に味見してもらう',
-        '焼鳥': '仕入れ候補の鶏肉卸3社に連絡し、見積もりを取る',
-        'ラーメン': 'スープレシピを1つ完成させ、Instagramに投稿する',
-        '和食': '看板メニュー1品を試作し、友人3人に味見してもらう',
-        '洋食': '看板メニュー1品を試作し、友人3人に味見してもらう',
-        '中華': '看板メニュー1品を試作し、友人3人に味見してもらう'
-    }
-    return actions.get(main_type, '看板商品1つを試作し、SNSで反応をチェックする')
+    return get_catalog().lookup(extract_main_category(type)).action
 
 def generate_catch_copy(type: str, area: str) -> str:
-    main_type = extract_main_category(type)
-    catch_copies = {
-        'カフェ': {
-            '駅近': '朝の一杯で、今日もいい1日を',
-            '住宅街': '地域のリビングルーム、いつでもあなたの居場所',
-            'オフィス街': '仕事の合間に、本格コーヒーでリフレッシュ',
-            '観光地': '旅の思い出に、地元の味を'
-        },
-        '焼鳥': {
-            '駅近': '仕事帰りに、サクッと一杯',
-            '住宅街': '家族で楽しむ、本格炭火焼鳥',
-            'オフィス街': 'ランチも夜も、焼鳥で二毛作',
-            '観光地': '地鶏にこだわる、名物焼鳥店'
-        },
-        'ラーメン': {
-            '駅近': '駅前の名物、濃厚スープの一杯',
-            '住宅街': '地域に愛される、優しい味わい',
-            'オフィス街': 'ランチタイム、満足の一杯',
-            '観光地': 'ご当地食材で、SNS映えする一杯'
-        },
-        '和食': {
-            '駅近': '駅前で、本格和食を',
-            '住宅街': '家族で楽しむ、心温まる和食',
-            'オフィス街': 'ランチタイム、満足の和食',
-            '観光地': '地元の味、本格和食'
-        },
-        '洋食': {
-            '駅近': '駅前で、本格洋食を',
-            '住宅街': '家族で楽しむ、心温まる洋食',
-            'オフィス街': 'ランチタイム、満足の洋食',
-            '観光地': '特別な日、本格洋食'
-        },
-        '中華': {
-            '駅近': '駅前で、本格中華を',
-            '住宅街': '家族で楽しむ、心温まる中華',
-            'オフィス街': 'ランチタイム、満足の中華',
-            '観光地': '本格中華、観光客に人気'
-        }
-    }
-    return catch_copies.get(main_type, {}).get(area, f'{area}で、{main_type}の新しいスタイルを')
+    return get_catalog().lookup(extract_main_category(type), area).catch_copy
 
 def generate_target_audience(type: str, area: str) -> str:
-    main_type = extract_main_category(type)
-    audiences = {
-        'カフェ': {
-            '駅近': '通勤・通学客（20-40代）、朝のコーヒー需要',
-            '住宅街': '主婦層、子育て世代、シニア層',
-            'オフィス街': 'ビジネスパーソン、ランチ需要',
-            '観光地': '観光客、地元住民、SNSユーザー'
-        },
-        '焼鳥': {
-            '駅近': 'サラリーマン（30-50代）、仕事帰りの一杯',
-            '住宅街': '家族連れ、地元住民、週末の集まり',
-            'オフィス街': 'ビジネスパーソン、ランチ・飲み会需要',
-            '観光地': '観光客、地元の常連客'
-        },
-        'ラーメン': {
-            '駅近': '通勤客、学生、ランチ需要',
-            '住宅街': '家族連れ、地元住民',
-            'オフィス街': 'ビジネスパーソン、ランチ需要',
-            '観光地': '観光客、ラーメン好き'
-        },
-        '和食': {
-            '駅近': '通勤客、学生、ランチ需要',
-            '住宅街': '家族連れ、地元住民',
-            'オフィス街': 'ビジネスパーソン、ランチ需要',
-            '観光地': '観光客、和食好き'
-        },
-        '洋食': {
-            '駅近': '通勤客、学生、ランチ需要',
-            '住宅街': '家族連れ、地元住民',
-            'オフィス街': 'ビジネスパーソン、ランチ需要',
-            '観光地': '観光客、洋食好き'
-        },
-        '中華': {
-            '駅近': '通勤客、学生、ランチ需要',
-            '住宅街': '家族連れ、地元住民',
-            'オフィス街': 'ビジネスパーソン、ランチ需要',
-            '観光地': '観光客、中華好き'
-        }
-    }
-    return audiences.get(main_type, {}).get(area, '幅広い年齢層、地域住民')
+    return get_catalog().lookup(extract_main_category(type), area).target_audience
 
 def generate_menu_examples(type: str) -> list:
-    main_type = extract_main_category(type)
-    menus = {
-        'カフェ': [
-            {'name': 'スペシャルブレンドコーヒー', 'price': 480, 'description': '自家焙煎のこだわりブレンド'},
-            {'name': '季節のフルーツタルト', 'price': 680, 'description': '旬のフルーツをたっぷり使用'},
-            {'name': 'モーニングセット', 'price': 850, 'description': 'トースト・サラダ・ドリンク付き'}
-        ],
-        '焼鳥': [
-            {'name': 'もも肉（塩）', 'price': 180, 'description': 'ジューシーなもも肉を塩でシンプルに'},
-            {'name': 'ねぎま', 'price': 200, 'description': '定番のねぎま、タレで濃厚に'},
-            {'name': 'つくね', 'price': 220, 'description': '手作りつくね、卵黄と一緒に'}
-        ],
-        'ラーメン': [
-            {'name': '醤油ラーメン', 'price': 780, 'description': 'こだわりの醤油スープ'},
-            {'name': '味玉ラーメン', 'price': 880, 'description': '味玉2個付き、ボリューム満点'},
-            {'name': 'チャーシュー麺', 'price': 980, 'description': '厚切りチャーシュー3枚'}
-        ],
-        '和食': [
-            {'name': '定食', 'price': 850, 'description': 'ご飯・味噌汁・おかず3品付き'},
-            {'name': '丼もの', 'price': 680, 'description': 'ボリューム満点の丼もの'},
-            {'name': 'お造り', 'price': 1200, 'description': '新鮮な魚介類の刺身'}
-        ],
-        '洋食': [
-            {'name': 'ハンバーグ定食', 'price': 1200, 'description': '手作りハンバーグとサラダ'},
-            {'name': 'オムライス', 'price': 980, 'description': 'ふわふわ卵のオムライス'},
-            {'name': 'パスタ', 'price': 1100, 'description': '本格的なイタリアンパスタ'}
-        ],
-        '中華': [
-            {'name': 'ラーメン', 'price': 780, 'description': 'こだわりのスープ'},
-            {'name': '餃子', 'price': 480, 'description': '手作り餃子6個'},
-            {'name': '麻婆豆腐定食', 'price': 850, 'description': '本格四川風麻婆豆腐'}
-        ]
-    }
-    return menus.get(main_type, [
-        {'name': 'おすすめメニュー1', 'price': 800, 'description': 'お店の特色を活かした一品'},
-        {'name': 'おすすめメニュー2', 'price': 900, 'description': '人気の定番メニュー'},
-        {'name': 'おすすめメニュー3', 'price': 1000, 'description': '特別な日のメニュー'}
-    ])
+    # カタログのエントリは読み取り専用のため、呼び出し側にはdictのコピーを返す
+    return [dict(m) for m in get_catalog().lookup(extract_main_category(type)).menu_examples]
 
 def generate_sns_strategy(type: str, area: str) -> str:
-    main_type = extract_main_category(type)
-    strategies = {
-        'カフェ': f'{area}でのカフェ開業では、Instagramでの写真投稿、Googleマップのレビュー獲得、地域SNSでの情報発信が効果的。特に朝のコーヒーやスイーツの写真はSNS映えしやすく、リピーター獲得に繋がります。',
-        '焼鳥': f'{area}での焼鳥店では、炭火で焼く様子の動画投稿、メニュー写真、お酒とのペアリング情報をSNSで発信。特に夜の時間帯の投稿が集客に効果的です。',
-        'ラーメン': f'{area}でのラーメン店では、スープの動画、トッピングの写真、食べ方のコツなどをSNSで発信。ランチタイムの混雑状況や待ち時間情報も共有すると良いでしょう。',
-        '和食': f'{area}での和食店では、料理の美しい盛り付け写真、季節感のあるメニュー、伝統的な調理法の動画などをSNSで発信。特にランチタイムの情報発信が集客に効果的です。',
-        '洋食': f'{area}での洋食店では、本格的な料理の写真、特別感のあるメニュー、店内の雰囲気などをSNSで発信。デートや特別な日の利用を意識した投稿が効果的です。',
-        '中華': f'{area}での中華料理店では、ボリューム満点の料理写真、本格的な調理の様子、ランチメニューの情報などをSNSで発信。特にランチタイムの情報発信が集客に効果的です。'
-    }
-    return strategies.get(main_type, f'{area}での{main_type}店では、定期的なSNS投稿、Googleマップの最適化、口コミ獲得が重要です。')
+    return get_catalog().lookup(extract_main_category(type), area).sns_strategy
 
 def calculate_staff_count(seats: int, hours: str) -> int:
     # 簡易計算：席数と営業時間から必要スタッフ数を算出
@@ -218,22 +74,14 @@ def generate_peak_operation(type: str, hours: str) -> str:
 
 def calculate_initial_investment(seats: int, type: str) -> int:
     # 席数と業態から初期投資を算出（簡易版）
-    main_type = extract_main_category(type)
-    base_cost = 5000000  # 基本設備費
-    seat_cost = seats * 50000  # 席数×5万円
-    type_multiplier = {
-        'カフェ': 1.0, 
-        '焼鳥': 1.3, 
-        'ラーメン': 1.1,
-        '和食': 1.2,
-        '洋食': 1.2,
-        '中華': 1.1
-    }.get(main_type, 1.0)
+    base_cost = INVESTMENT_BASE_COST
+    seat_cost = seats * INVESTMENT_SEAT_COST  # 席数×5万円
+    type_multiplier = get_investment_multiplier(type)
     return int((base_cost + seat_cost) * type_multiplier)
 
 def calculate_opening_cost(initial_investment: int) -> int:
     # 開業費 = 初期投資 + 運転資金
-    return initial_investment + 2000000  # 運転資金200万円
+    return initial_investment + WORKING_CAPITAL  # 運転資金200万円
 
 def get_funding_methods(area: str) -> list:
     methods = ['小規模事業者持続化補助金', 'IT導入補助金']
@@ -245,28 +93,27 @@ def get_funding_methods(area: str) -> list:
         methods.append('地方自治体の創業支援補助金')
     return methods
 
+def get_investment_multiplier(type: str) -> float:
+    """業態の初期投資の係数を取得"""
+    return get_catalog().lookup(extract_main_category(type)).investment_multiplier
+
+def get_cogs_rate(type: str) -> float:
+    """業態の原価率を取得"""
+    return get_catalog().lookup(extract_main_category(type)).cogs_rate
+
 def calculate_business_plan(input_data: schemas.BusinessPlanInput):
-    main_type = extract_main_category(input_data.type)
-    turnover = 2.0
-    daily_guests = round(input_data.seats * turnover * 0.9)
-    monthly_sales = input_data.atv * daily_guests * 30
+    turnover = BASE_TURNOVER
+    daily_guests = round(input_data.seats * turnover * GUEST_RATE)
+    monthly_sales = input_data.atv * daily_guests * BUSINESS_DAYS
     
-    cogs_rates = {
-        'カフェ': 0.28, 
-        '焼鳥': 0.32, 
-        'ラーメン': 0.30,
-        '和食': 0.30,
-        '洋食': 0.30,
-        '中華': 0.30
-    }
-    cogs_rate = cogs_rates.get(main_type, 0.30)
+    cogs_rate = get_cogs_rate(input_data.type)
     cogs = round(monthly_sales * cogs_rate)
     gross_profit = monthly_sales - cogs
     
-    labor_cost = round(monthly_sales * 0.28)
-    fixed_cost = 540000
+    labor_cost = round(monthly_sales * LABOR_RATE)
+    fixed_cost = FIXED_COST
     op_income = gross_profit - labor_cost - fixed_cost
-    payback_months = 18 if op_income > 0 else 24
+    payback_months = PAYBACK_MONTHS_PROFIT if op_income > 0 else PAYBACK_MONTHS_LOSS
     
     concept = generate_concept(input_data.type, input_data.area)
     action = generate_action(input_data.type)
@@ -308,11 +155,49 @@ def calculate_business_plan(input_data: schemas.BusinessPlanInput):
         'seat_occupancy_rate': seat_occupancy_rate
     }
 
-def create_business_plan(db: Session, input_data: schemas.BusinessPlanInput):
-    calc = calculate_business_plan(input_data)
-    
-    # データベースに保存するフィールドのみを抽出（拡張フィールドは除外）
-    db_fields = {
+# 計算結果のキャッシュ（同じ入力なら文章生成を含む計算をまるごと省略する）
+plan_cache = TTLCache(settings.plan_cache_size, settings.plan_cache_ttl)
+
+def normalize_plan_input(input_data: schemas.BusinessPlanInput) -> schemas.BusinessPlanInput:
+    """文字列項目の前後の空白を取り除いた入力を返す（キャッシュキーと保存値をそろえるため）"""
+    return input_data.model_copy(update={
+        'type': input_data.type.strip(),
+        'hours': input_data.hours.strip(),
+        'area': input_data.area.strip()
+    })
+
+def plan_cache_key(input_data: schemas.BusinessPlanInput) -> tuple:
+    # カタログを再読み込みしたら古い計算結果を使わないよう、バージョンもキーに含める
+    return (get_catalog().version, input_data.type, input_data.seats, input_data.atv, input_data.hours, input_data.area)
+
+def calculate_business_plan_cached(input_data: schemas.BusinessPlanInput) -> dict:
+    """calculate_business_plan のキャッシュ付き版（入力は normalize_plan_input 済みであること）"""
+    key = plan_cache_key(input_data)
+    calc = plan_cache.get(key)
+    if calc is None:
+        with metrics.stage("calculation"):
+            calc = calculate_business_plan(input_data)
+        plan_cache.set(key, calc)
+    # 呼び出し側での項目追加がキャッシュに混ざらないようにコピーを返す
+    return dict(calc)
+
+def extended_fields(calc: dict) -> dict:
+    """計算結果からextended列に保存する項目を抽出"""
+    return {name: calc[name] for name in models.EXTENDED_FIELDS}
+
+def plan_row(input_data: schemas.BusinessPlanInput, calc: dict, user_id: int = None,
+             input_hash: str = None, idempotency_key: str = None) -> dict:
+    """入力と計算結果から business_plans に保存する列の値を作成（拡張フィールドはextended列にまとめる）"""
+    return {
+        'user_id': user_id,
+        'input_hash': input_hash,
+        'idempotency_key': idempotency_key,
+        'anonymous_idempotency_key': idempotency_key if user_id is None else None,
+        'type': input_data.type,
+        'seats': input_data.seats,
+        'atv': input_data.atv,
+        'hours': input_data.hours,
+        'area': input_data.area,
         'turnover': calc['turnover'],
         'daily_guests': calc['daily_guests'],
         'monthly_sales': calc['monthly_sales'],
@@ -324,27 +209,195 @@ def create_business_plan(db: Session, input_data: schemas.BusinessPlanInput):
         'op_income': calc['op_income'],
         'payback_months': calc['payback_months'],
         'concept': calc['concept'],
-        'action': calc['action']
+        'action': calc['action'],
+        'extended': extended_fields(calc)
     }
+
+def create_business_plan(db: Session, input_data: schemas.BusinessPlanInput, calc: dict = None, user_id: int = None,
+                         input_hash: str = None, idempotency_key: str = None):
+    if calc is None:
+        calc = calculate_business_plan_cached(input_data)
     
-    db_plan = models.BusinessPlan(
-        type=input_data.type,
-        seats=input_data.seats,
-        atv=input_data.atv,
-        hours=input_data.hours,
-        area=input_data.area,
-        **db_fields
-    )
+    db_plan = models.BusinessPlan(**plan_row(input_data, calc, user_id, input_hash, idempotency_key))
     db.add(db_plan)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # 同じIdempotency-Keyで同時に保存された場合など（呼び出し側で既存のプランを取得し直す）
+        db.rollback()
+        raise
     db.refresh(db_plan)
     return db_plan
 
-def get_business_plan(db: Session, plan_id: int):
-    return db.query(models.BusinessPlan).filter(models.BusinessPlan.id == plan_id).first()
+def plan_input_hash(input_data: schemas.BusinessPlanInput, user_id: int = None) -> str:
+    """正規化済みの入力・ユーザー・収支モデルとカタログのバージョンから、再送信の判定に使うハッシュを作成"""
+    raw = json.dumps([
+        PLAN_MODEL_VERSION, get_catalog().version, user_id,
+        input_data.type, input_data.seats, input_data.atv, input_data.hours, input_data.area
+    ], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def find_existing_plan(db: Session, user_id: int, input_hash: str, idempotency_key: str = None,
+                       window: float = None):
+    """再送信されたプランの作成リクエストに対応する保存済みのプランを返す（なければNone）
 
-def get_business_plans(db: Session, skip: int = 0, limit: int = 10):
-    return db.query(models.BusinessPlan).order_by(models.BusinessPlan.created_at.desc()).offset(skip).limit(limit).all()
+    Idempotency-Keyを指定した場合は期間に関係なく同じキーのプランを返し、
+    キーが同じで入力が異なる場合はValueErrorを送出する。
+    キーがない場合は window 秒以内に保存した同じ入力のプランを返す。
+    """
+    plans = models.BusinessPlan
+    if idempotency_key:
+        owner = plans.user_id == user_id if user_id is not None else plans.user_id.is_(None)
+        db_plan = db.execute(
+            select(plans).where(owner, plans.idempotency_key == idempotency_key)
+        ).scalars().first()
+        if db_plan is not None and db_plan.input_hash != input_hash:
+            raise ValueError("このIdempotency-Keyは別の入力のプラン作成に使われています")
+        return db_plan
+    if window is None:
+        window = settings.plan_dedup_window
+    if window <= 0:
+        return None
+    # created_at はUTCで保存される（DB側の NOW() もMySQLのセッションをUTCにして同じ基準にしている）
+    since = datetime.utcnow() - timedelta(seconds=window)
+    return db.execute(
+        select(plans)
+        .where(plans.input_hash == input_hash, plans.created_at >= since)
+        .order_by(plans.created_at.desc())
+        .limit(1)
+    ).scalars().first()
+
+def insert_plans(db: Session, rows: list) -> list:
+    """プランの列（dict）をまとめてINSERTし、採番されたIDのリストを返す（コミットは呼び出し側で行う）"""
+    db_plans = [models.BusinessPlan(**row) for row in rows]
+    db.add_all(db_plans)
+    # コミット後の再読み込みを避けるため、flush時点で採番されたIDを取得しておく
+    db.flush()
+    return [db_plan.id for db_plan in db_plans]
+
+def create_business_plans_bulk(db: Session, rows: list, user_id: int = None) -> list:
+    """計算済みのプラン（dict、extended列の値を含む）をまとめて1トランザクションで保存し、IDのリストを返す"""
+    plan_ids = insert_plans(db, [dict(row, user_id=user_id) for row in rows])
+    db.commit()
+    return plan_ids
+
+def plan_extended(type: str, seats: int, atv: int, hours: str, area: str) -> dict:
+    """入力項目からextended列に保存する拡張フィールドを計算（既存データ用のため計算結果のキャッシュは使わない）"""
+    return extended_fields(calculate_business_plan(normalize_plan_input(schemas.BusinessPlanInput(
+        type=type, seats=seats, atv=atv, hours=hours, area=area
+    ))))
+
+def fill_missing_extended(connection, chunk_size: int = 500) -> int:
+    """拡張フィールドが未保存のプラン（extended列の追加前のデータ）に計算結果を保存し、件数を返す
+
+    読み込み時には計算・保存しないため、マイグレーション（または manage.py fill-extended）で実行する。
+    """
+    plans = models.BusinessPlan.__table__
+    columns = (plans.c.id, plans.c.type, plans.c.seats, plans.c.atv, plans.c.hours, plans.c.area)
+    count = 0
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            select(*columns)
+            .where(plans.c.extended.is_(None), plans.c.id > last_id)
+            .order_by(plans.c.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            return count
+        now = datetime.utcnow()
+        for row in rows:
+            try:
+                extended = plan_extended(row.type, row.seats, row.atv, row.hours, row.area)
+            except ValidationError:
+                # 入力項目が欠けている古いプランは計算できないため、未保存のままにする
+                continue
+            # 条件付きGETの検証子が変わるよう、更新日時も設定する
+            connection.execute(
+                plans.update().where(plans.c.id == row.id).values(extended=extended, updated_at=now)
+            )
+            count += 1
+        last_id = rows[-1].id
+
+def plan_query(plan_id: int, user_id: int = None):
+    """IDでプランを取得するSELECT文（未ログインで作成したプランと、user_id のユーザーのプランだけが対象）"""
+    owner = models.BusinessPlan.user_id.is_(None)
+    if user_id is not None:
+        owner = or_(owner, models.BusinessPlan.user_id == user_id)
+    return select(models.BusinessPlan).where(models.BusinessPlan.id == plan_id, owner)
+
+def get_business_plan(db: Session, plan_id: int, user_id: int = None):
+    return db.execute(plan_query(plan_id, user_id)).scalars().first()
+
+def encode_plan_cursor(db_plan: models.BusinessPlan) -> str:
+    """次ページの開始位置を表す不透明なカーソル文字列を作成"""
+    raw = json.dumps([db_plan.created_at.isoformat(), db_plan.id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_plan_cursor(cursor: str) -> tuple:
+    """カーソル文字列を (created_at, id) に戻す（不正な場合はValueError）"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, plan_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(created_at), int(plan_id)
+    except Exception:
+        raise ValueError("カーソルが正しくありません")
+
+def plans_page_query(limit: int, cursor: str = None, user_id: int = None, skip: int = 0, anonymous: bool = False):
+    """プラン一覧（新しい順）のSELECT文を作成
+
+    cursorを指定すると、その位置より後ろを (created_at, id) の複合インデックスで
+    直接辿るため、何ページ目でも同じコストで取得できる。
+    次ページの有無を判定するため、limit + 1 件を取得する。
+    anonymous=True の場合は未ログインで作成したプラン（user_idなし）だけを対象にする。
+    """
+    stmt = select(models.BusinessPlan)
+    if user_id is not None:
+        stmt = stmt.where(models.BusinessPlan.user_id == user_id)
+    elif anonymous:
+        stmt = stmt.where(models.BusinessPlan.user_id.is_(None))
+    if cursor:
+        created_at, plan_id = decode_plan_cursor(cursor)
+        stmt = stmt.where(or_(
+            models.BusinessPlan.created_at < created_at,
+            and_(models.BusinessPlan.created_at == created_at, models.BusinessPlan.id < plan_id)
+        ))
+    elif skip:
+        # 互換性のためのオフセット指定（深いページほど遅くなるため、cursorの利用を推奨）
+        stmt = stmt.offset(skip)
+    return stmt.order_by(
+        models.BusinessPlan.created_at.desc(), models.BusinessPlan.id.desc()
+    ).limit(limit + 1)
+
+def split_plans_page(db_plans: list, limit: int) -> tuple:
+    """limit + 1 件の取得結果を (ページの行, 次ページのカーソル) に分ける"""
+    if len(db_plans) > limit:
+        db_plans = db_plans[:limit]
+        return db_plans, encode_plan_cursor(db_plans[-1])
+    return db_plans, None
+
+def plans_export_query(user_id: int = None, type: str = None, area: str = None,
+                       created_from: datetime = None, created_to: datetime = None):
+    """エクスポートするプランのSELECT文（作成日時の古い順、created_toは含まない）"""
+    plans = models.BusinessPlan.__table__
+    stmt = select(plans)
+    if user_id is not None:
+        stmt = stmt.where(plans.c.user_id == user_id)
+    if type is not None:
+        stmt = stmt.where(plans.c.type == type)
+    if area is not None:
+        stmt = stmt.where(plans.c.area == area)
+    if created_from is not None:
+        stmt = stmt.where(plans.c.created_at >= created_from)
+    if created_to is not None:
+        stmt = stmt.where(plans.c.created_at < created_to)
+    return stmt.order_by(plans.c.created_at, plans.c.id)
+
+def get_business_plans(db: Session, skip: int = 0, limit: int = 10, cursor: str = None, user_id: int = None,
+                       anonymous: bool = False):
+    """プラン一覧を取得し、(プランのリスト, 次ページのカーソル) を返す"""
+    db_plans = db.execute(plans_page_query(limit, cursor, user_id, skip, anonymous)).scalars().all()
+    return split_plans_page(db_plans, limit)
 
 
 # ユーザー関連のCRUD関数
@@ -353,15 +406,15 @@ def get_user_by_email(db: Session, email: str):
     return db.query(models.User).filter(models.User.email == email).first()
 
 
-def create_user(db: Session, user: schemas.UserRegister):
-    """新規ユーザーを作成"""
+def create_user(db: Session, user: schemas.UserRegister, password_hash: str = None):
+    """新規ユーザーを作成（password_hashを渡した場合はハッシュ化済みの値を使う）"""
     # メールアドレスの重複チェック
     existing_user = get_user_by_email(db, user.email)
     if existing_user:
         raise ValueError("このメールアドレスは既に登録されています")
     
     # パスワードをハッシュ化
-    hashed_password = hash_password(user.password)
+    hashed_password = password_hash or hash_password(user.password)
     
     # ユーザーを作成
     db_user = models.User(
@@ -388,37 +441,114 @@ def authenticate_user(db: Session, email: str, password: str):
     return user
 
 
+def update_password_hash(db: Session, user: models.User, password_hash: str):
+    """パスワードハッシュを更新（コスト変更時の再ハッシュ用）"""
+    user.password_hash = password_hash
+    db.commit()
+    return user
+
+
 def get_user_by_id(db: Session, user_id: int):
     """IDでユーザーを取得"""
     return db.query(models.User).filter(models.User.id == user_id).first()
 
+
+# 認証済みリクエストで使うユーザーのキャッシュ（ユーザーID -> セッションから切り離したUser）
+user_cache = TTLCache(settings.user_cache_size, settings.user_cache_ttl)
+
+
+def cache_user(db, user: models.User):
+    """取得したユーザーをセッションから切り離してキャッシュに登録"""
+    # 複数のリクエストで共有するため、どのセッションにも属さない状態にしておく
+    db.expunge(user)
+    user_cache.set(user.id, user)
+    return user
+
+
+def get_user_by_id_cached(db: Session, user_id: int):
+    """IDでユーザーを取得（キャッシュにあればDBを参照しない）"""
+    user = user_cache.get(user_id)
+    if user is None:
+        user = get_user_by_id(db, user_id)
+        if user is not None:
+            cache_user(db, user)
+    return user
+
+
+def invalidate_user(user_id: int):
+    """ユーザーのキャッシュを破棄"""
+    user_cache.pop(user_id)
+
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target):
+    # ORM経由の更新・削除で自動的に破棄する（query.update()などの一括更新は対象外のため invalidate_user を呼ぶこと）
+    invalidate_user(target.id)
+
 def get_menu_suggestions(type: str, concept: str):
-    data = {
-        'カフェ': {
-            'ヘルシー': [
-                {'name': 'アサイーボウル', 'price': 880, 'description': 'スーパーフード満載、SNS映え抜群'},
-                {'name': 'グリーンスムージー', 'price': 680, 'description': '野菜と果物のバランス◎'},
-                {'name': 'キヌアサラダボウル', 'price': 950, 'description': '低GI、高タンパク質'}
-            ],
-            'SNS映え': [
-                {'name': 'レインボーラテ', 'price': 750, 'description': '7色のグラデーションラテアート'},
-                {'name': 'フルーツタワーパンケーキ', 'price': 1380, 'description': 'フォトジェニックな盛り付け'},
-                {'name': 'ユニコーンフラペチーノ', 'price': 820, 'description': 'カラフルで可愛い限定ドリンク'}
-            ]
-        },
-        '焼鳥': {
-            'ヘルシー': [
-                {'name': '野菜巻き串盛り合わせ', 'price': 980, 'description': 'アスパラ・トマト・なすの野菜串'},
-                {'name': 'むね肉の塩焼き', 'price': 380, 'description': '低脂質・高タンパク'}
-            ]
-        },
-        'ラーメン': {
-            'ヘルシー': [
-                {'name': '鶏白湯ラーメン（麺半分）', 'price': 850, 'description': 'コラーゲンたっぷり、低糖質'},
-                {'name': '野菜たっぷりタンメン', 'price': 880, 'description': 'シャキシャキ野菜山盛り'}
-            ]
-        }
-    }
-    return data.get(type, {}).get(concept, [{'name': 'おすすめメニュー1', 'price': 800, 'description': 'お店の特色を活かした一品'}])
+    """業態とコンセプトに合うメニュー提案（「カフェ - 喫茶」のような業態、「ヘルシー志向」のような表記にも対応）"""
+    return get_menu_engine().suggest(extract_main_category(type), concept)
 
+def search_menus(type: str = None, tags: str = "", min_price: int = None, max_price: int = None,
+                 k: int = 10, match_all: bool = False) -> dict:
+    """タグ（カンマ・空白区切り）・業態・価格帯でメニューを検索し、一致度の高い順に返す"""
+    engine = get_menu_engine()
+    resolved = engine.resolve_tags(tags)
+    if tags.strip() and not resolved:
+        # どのタグにも対応しない語だけの場合は、条件なしの検索にはしない
+        results = []
+    else:
+        category = extract_main_category(type) if type else None
+        results = engine.search(category, resolved, min_price=min_price, max_price=max_price, k=k, match_all=match_all)
+    return {
+        "tags": [{"tag": tag, "weight": weight} for tag, weight in resolved],
+        "items": [dict(item, score=score) for item, score in results]
+    }
 
+def get_subsidies(area: str):
+    """立地に応じた補助金の一覧"""
+    subsidies = [
+        {
+            "name": "小規模事業者持続化補助金",
+            "amount": "上限：50万円（条件により200万円）",
+            "detail": "販路開拓・生産性向上の取り組みを支援。",
+            "requirement": "従業員5人以下の小規模事業者",
+            "badge": "募集中"
+        },
+        {
+            "name": "IT導入補助金",
+            "amount": "上限：50～450万円",
+            "detail": "POSレジ、予約システム、会計ソフトなどのITツール導入費用を補助。",
+            "requirement": "中小企業・小規模事業者",
+            "badge": None
+        }
+    ]
+    
+    if area == "観光地":
+        local = {
+            "name": "観光振興・商店街活性化補助金",
+            "amount": "上限：50～300万円",
+            "detail": "観光地での新規出店を支援。",
+            "requirement": "観光地での新規創業者",
+            "badge": "地域限定"
+        }
+    elif area == "駅近":
+        local = {
+            "name": "駅前活性化・創業支援補助金",
+            "amount": "上限：50～300万円",
+            "detail": "駅前エリアの活性化を目的とした創業支援。",
+            "requirement": "駅前での新規創業者",
+            "badge": "地域限定"
+        }
+    else:
+        local = {
+            "name": "地方自治体の創業支援補助金",
+            "amount": "上限：50～300万円",
+            "detail": "開業時の設備投資、広告宣伝費などを支援。",
+            "requirement": "新規創業者",
+            "badge": "地域限定"
+        }
+    
+    subsidies.append(local)
+    return subsidies
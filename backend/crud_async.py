@@ -0,0 +1,35 @@
+"""
+非同期DB（AsyncSession）用のCRUD関数
+
+SELECT文の組み立てと計算処理は crud.py と共通のものを使い、
+DBとのやり取りだけを await で行う。
+"""
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+import crud, models
+
+
+async def get_business_plan(db: AsyncSession, plan_id: int, user_id: int = None):
+    return (await db.execute(crud.plan_query(plan_id, user_id))).scalars().first()
+
+
+async def get_business_plans(db: AsyncSession, skip: int = 0, limit: int = 10, cursor: str = None, user_id: int = None,
+                             anonymous: bool = False):
+    """プラン一覧を取得し、(プランのリスト, 次ページのカーソル) を返す"""
+    result = await db.execute(crud.plans_page_query(limit, cursor, user_id, skip, anonymous))
+    return crud.split_plans_page(result.scalars().all(), limit)
+
+
+async def get_user_by_id(db: AsyncSession, user_id: int):
+    """IDでユーザーを取得"""
+    return (await db.execute(select(models.User).where(models.User.id == user_id))).scalars().first()
+
+
+async def get_user_by_id_cached(db: AsyncSession, user_id: int):
+    """IDでユーザーを取得（キャッシュは crud.user_cache を同期版と共有）"""
+    user = crud.user_cache.get(user_id)
+    if user is None:
+        user = await get_user_by_id(db, user_id)
+        if user is not None:
+            crud.cache_user(db, user)
+    return user
@@ -1,20 +1,118 @@
-from sqlalchemy import create_engine
+import threading
+import time
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from config import settings
+import metrics
 
-# SQLite用の設定
-connect_args = {}
-if settings.database_url.startswith("sqlite"):
-    connect_args = {"check_same_thread": False}
 
-engine = create_engine(
-    settings.database_url,
-    connect_args=connect_args,
-    echo=True
-)
+class PoolMetrics:
+    """コネクションプールの取得待ち時間・タイムアウトの集計"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+    
+    def record_checkout(self, wait: float):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += wait
+            self.wait_seconds_max = max(self.wait_seconds_max, wait)
+    
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+class _MeteredPoolMixin:
+    """コネクション取得（プールからの払い出し）にかかった時間を記録する"""
+    
+    def __init__(self, *args, max_overflow: int = 10, **kwargs):
+        super().__init__(*args, max_overflow=max_overflow, **kwargs)
+        # 最初のconnectで作ると、同時に払い出す複数のスレッドで別々に作られることがあるため、ここで作る
+        self.metrics = PoolMetrics()
+        # QueuePoolには設定値を取得する公開APIがないため、作成時の値を保持する
+        self.max_overflow = max_overflow
+    
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.metrics.record_timeout()
+            raise
+        self.metrics.record_checkout(time.perf_counter() - start)
+        return connection
+
+
+class MeteredQueuePool(_MeteredPoolMixin, QueuePool):
+    pass
+
+
+class MeteredAsyncQueuePool(_MeteredPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def engine_options(url: str, poolclass) -> dict:
+    """Settingsからエンジンの接続・プール設定を組み立てる"""
+    options = {"echo": settings.db_echo}
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "mysql":
+        # created_at はアプリ側で datetime.utcnow()、DB側で NOW() を使うため、セッションのタイムゾーンもUTCにそろえる
+        options["connect_args"] = {"init_command": "SET time_zone = '+00:00'"}
+    if parsed.get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+        # インメモリDBは接続ごとに別のDBになるため、プール設定は適用しない
+        if parsed.database in (None, "", ":memory:"):
+            return options
+    options.update(
+        poolclass=poolclass,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+    )
+    return options
+
+
+def pool_status(target_engine) -> dict:
+    """エンジンのコネクションプールの状態を取得"""
+    pool = target_engine.pool
+    status = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            timeout=pool.timeout(),
+        )
+    if isinstance(pool, _MeteredPoolMixin):
+        metrics = pool.metrics
+        status.update(
+            max_overflow=pool.max_overflow,
+            checkouts=metrics.checkouts,
+            timeouts=metrics.timeouts,
+            wait_seconds_total=metrics.wait_seconds_total,
+            wait_seconds_max=metrics.wait_seconds_max,
+            wait_seconds_avg=metrics.wait_seconds_total / metrics.checkouts if metrics.checkouts else 0.0,
+        )
+    return status
+
+
+engine = create_engine(settings.database_url, **engine_options(settings.database_url, MeteredQueuePool))
+
+# コミット後に読み込み済みの属性を失効させない（一覧取得後の書き込みで行ごとの再SELECTが走らないようにする）
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+# 同期・非同期どちらのセッションのコミットも db_commit として計測する
+metrics.instrument_sessions(Session)
 Base = declarative_base()
 
 def get_db():
@@ -25,3 +123,33 @@ def get_db():
         db.close()
 
 
+# 非同期DB（DATABASE_ASYNC=true の場合のみ使用）
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+}
+
+def async_database_url(url: str) -> str:
+    """同期ドライバのURLを非同期ドライバのURLに変換"""
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+def create_async_session_factory(url: str):
+    """非同期エンジンとセッションファクトリを作成"""
+    # 非同期DBを使わない環境では aiosqlite / aiomysql を必須にしないため、ここでインポートする
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    
+    async_url = async_database_url(url)
+    async_engine = create_async_engine(async_url, **engine_options(async_url, MeteredAsyncQueuePool))
+    return async_engine, async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async_engine = None
+AsyncSessionLocal = None
+if settings.database_async:
+    async_engine, AsyncSessionLocal = create_async_session_factory(settings.database_url)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,92 @@
+"""
+プランのエクスポート（CSV / NDJSON のストリーミング出力）
+
+件数に関係なくメモリ使用量が一定になるよう、DBからは yield_per（サーバーサイドカーソル）で
+plan_export_chunk_size 件ずつ読み込み、読み込んだ分だけ変換して送信する。
+レスポンスの送信中もDBを読み続けるため、リクエストのセッションではなく専用のセッションを使う。
+"""
+import csv
+import io
+import json
+from datetime import datetime, timezone
+
+import crud, metrics, models, schemas
+from serialization import dumps
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+COLUMNS = (
+    'id', 'type', 'seats', 'atv', 'hours', 'area',
+    'turnover', 'daily_guests', 'monthly_sales', 'cogs_rate', 'cogs', 'gross_profit',
+    'labor_cost', 'fixed_cost', 'op_income', 'payback_months',
+    'concept', 'action', 'created_at',
+)
+
+
+def utc_naive(value: datetime) -> datetime:
+    """タイムゾーン付きの日時を、created_atと同じUTCのnaiveな日時にそろえる"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def columns(extended: bool) -> tuple:
+    return COLUMNS + models.EXTENDED_FIELDS if extended else COLUMNS
+
+
+def _extended(row) -> dict:
+    # 拡張フィールドが未保存の行は計算で補う（エクスポートは読み取りのみのため保存はしない）
+    if row.extended is not None:
+        return row.extended
+    calc = crud.calculate_business_plan_cached(crud.normalize_plan_input(schemas.BusinessPlanInput(
+        type=row.type, seats=row.seats, atv=row.atv, hours=row.hours, area=row.area
+    )))
+    return crud.extended_fields(calc)
+
+
+def _records(rows: list, extended: bool) -> list:
+    records = []
+    for row in rows:
+        record = {name: row._mapping[name] for name in COLUMNS}
+        if extended:
+            record.update(_extended(row))
+        records.append(record)
+    return records
+
+
+def _csv_value(value):
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _csv_chunk(records: list, names: tuple, header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    if header:
+        writer.writerow(names)
+    writer.writerows([[_csv_value(record.get(name)) for name in names] for record in records])
+    return buffer.getvalue().encode('utf-8')
+
+
+def _ndjson_chunk(records: list) -> bytes:
+    return b''.join(dumps(record) + b'\n' for record in records)
+
+
+def iter_export(session_factory, stmt, format: str, extended: bool = False, chunk_size: int = 1000):
+    """SELECT文の結果を chunk_size 件ずつCSV / NDJSONのバイト列にして返すジェネレーター"""
+    names = columns(extended)
+    if format == 'csv':
+        # 該当するプランがなくてもヘッダー行は出力する
+        yield _csv_chunk([], names, header=True)
+    with session_factory() as db:
+        result = db.execute(stmt.execution_options(yield_per=chunk_size))
+        for rows in result.partitions():
+            with metrics.stage("serialization"):
+                records = _records(rows, extended)
+                chunk = _csv_chunk(records, names) if format == 'csv' else _ndjson_chunk(records)
+            yield chunk
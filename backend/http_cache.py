@@ -0,0 +1,169 @@
+"""
+HTTPキャッシュ（ETag・条件付きGET・事前圧縮）
+
+参照系エンドポイントのレスポンスは、キーごとに1回だけJSONのバイト列へ変換し、
+ETagと圧縮済みのバイト列と合わせてプロセス内にキャッシュする。
+If-None-Matchが一致した場合は本文を送らずに304を返す。
+
+ETagは本文のSHA-256から作る強いETagで、圧縮した表現には "-gzip" / "-br" を付けて区別する。
+"""
+import gzip
+import hashlib
+import json
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response
+
+from cache import TTLCache
+from config import settings
+
+try:
+    import brotli
+except ImportError:  # brotliは任意（未インストールの場合はgzipのみ）
+    brotli = None
+
+
+@dataclass(frozen=True)
+class CachedBody:
+    body: bytes
+    etag: str
+    gzip: bytes = None
+    br: bytes = None
+
+    def variant_etag(self, encoding: str = None) -> str:
+        """圧縮方式ごとのETag（非圧縮の場合はそのまま）"""
+        return self.etag if encoding is None else f'{self.etag[:-1]}-{encoding}"'
+
+    def variant_etags(self) -> set:
+        return {self.variant_etag(e) for e in (None, 'gzip', 'br')}
+
+
+# 事前にシリアライズしたレスポンス本文（キー -> CachedBody）
+body_cache = TTLCache(settings.http_body_cache_size, settings.http_cache_max_age)
+
+
+def serialize(data) -> bytes:
+    """FastAPIのJSONResponseと同じ形式でJSONをバイト列に変換"""
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode('utf-8')
+
+
+def make_etag(*parts) -> str:
+    """値から強いETagを作成"""
+    digest = hashlib.sha256('\x1f'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def prepare(data) -> CachedBody:
+    """本文をシリアライズし、閾値以上であれば圧縮版も作成"""
+    body = serialize(data)
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    if len(body) < settings.http_compress_min_size:
+        return CachedBody(body, etag)
+    # mtime=0で圧縮結果を毎回同じバイト列にする
+    gzipped = gzip.compress(body, compresslevel=6, mtime=0)
+    br = brotli.compress(body) if brotli is not None else None
+    return CachedBody(body, etag, gzipped, br)
+
+
+def etag_matches(if_none_match: str, etags) -> bool:
+    """If-None-Matchの値がいずれかのETagに一致するか（弱い比較）"""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag == '*':
+            return True
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag in etags:
+            return True
+    return False
+
+
+def accepted_encodings(accept_encoding: str) -> set:
+    """Accept-Encodingから受け入れ可能な圧縮方式を取得（q=0は除く）"""
+    encodings = set()
+    for item in (accept_encoding or '').split(','):
+        name, _, params = item.strip().partition(';')
+        q = params.strip()
+        if q.startswith('q='):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if name:
+            encodings.add(name.strip().lower())
+    return encodings
+
+
+def not_modified(headers: dict) -> Response:
+    return Response(status_code=304, headers=headers)
+
+
+def cached_json_response(request: Request, key, build, cache_control: str = None) -> Response:
+    """キーごとに事前シリアライズした本文を返す（buildはキャッシュにない場合のみ呼ぶ）"""
+    cached = body_cache.get(key)
+    if cached is None:
+        cached = prepare(build())
+        body_cache.set(key, cached)
+
+    if cache_control is None:
+        cache_control = f"public, max-age={settings.http_cache_max_age}"
+    headers = {'Cache-Control': cache_control, 'Vary': 'Accept-Encoding'}
+
+    if etag_matches(request.headers.get('if-none-match'), cached.variant_etags()):
+        headers['ETag'] = cached.etag
+        return not_modified(headers)
+
+    body, encoding = cached.body, None
+    encodings = accepted_encodings(request.headers.get('accept-encoding'))
+    if cached.br is not None and 'br' in encodings:
+        body, encoding = cached.br, 'br'
+    elif cached.gzip is not None and 'gzip' in encodings:
+        body, encoding = cached.gzip, 'gzip'
+
+    headers['ETag'] = cached.variant_etag(encoding)
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return Response(content=body, media_type='application/json', headers=headers)
+
+
+def http_date(value: datetime) -> str:
+    """日時をHTTP-date形式に変換（タイムゾーンなしはUTCとみなす）"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def modified_since(if_modified_since: str, last_modified: datetime) -> bool:
+    """If-Modified-Since以降に更新されているか（ヘッダーが不正な場合はTrue）"""
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+        if since.tzinfo is None:
+            # 「-0000」のような数値のタイムゾーンはタイムゾーンなしとして返るため、UTCとみなす
+            since = since.replace(tzinfo=timezone.utc)
+        # HTTP-dateは秒単位のため、秒未満を切り捨てて比較する
+        return last_modified.replace(microsecond=0) > since
+    except (TypeError, ValueError):
+        return True
+
+
+def check_conditional(request: Request, etag: str, last_modified: datetime, cache_control: str = 'no-cache') -> tuple:
+    """(304レスポンス, 検証子のヘッダー) を返す（クライアントのキャッシュが無効な場合、304レスポンスはNone）"""
+    headers = {'ETag': etag, 'Cache-Control': cache_control}
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified)
+
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        fresh = etag_matches(if_none_match, {etag})
+    elif last_modified is not None and request.headers.get('if-modified-since'):
+        fresh = not modified_since(request.headers['if-modified-since'], last_modified)
+    else:
+        fresh = False
+    return (not_modified(headers) if fresh else None), headers
@@ -1,17 +1,55 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
-from datetime import timedelta
-import models, schemas, crud
-from database import engine, get_db
+from typing import List, Optional
+from datetime import datetime, timedelta
+from pydantic import ValidationError
+from contextlib import asynccontextmanager
+import asyncio
+import io
+import numpy as np
+import models, schemas, crud, crud_async, simulation, montecarlo, catalog, http_cache, serialization, metrics, profiling
+import analytics, export, menu_engine, projection, search, solver
+import migrations
+import database
+from database import engine, get_db, get_async_db
 from config import settings
-from auth.jwt import create_access_token
-from auth.dependencies import get_current_user
+from auth.jwt import create_access_token, token_cache
+from auth.password import (
+    PasswordPoolBusy, calibrate_rounds, configure_rounds, hash_password, needs_rehash, password_pool, verify_password
+)
+from plan_writer import DURABILITY_MODES, PlanWriterBusy, plan_writer
+from auth.dependencies import (
+    get_current_user, get_current_user_async, get_current_user_optional, get_current_user_optional_async, require_admin
+)
 
-models.Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 起動時の処理（importではDBに接続せず、スキーマの変更は manage.py migrate で行う）
+    if settings.plan_write_durability not in DURABILITY_MODES:
+        raise ValueError(f"PLAN_WRITE_DURABILITY は {' / '.join(DURABILITY_MODES)} のいずれかを指定してください")
+    if settings.auto_migrate:
+        await run_in_threadpool(migrations.migrate, engine)
+    # 業態カタログ・メニューの索引は最初のリクエストを待たずに読み込んでおく
+    catalog.get_catalog()
+    menu_engine.get_menu_engine()
+    if settings.bcrypt_target_ms > 0:
+        # 計測には数百ミリ秒かかるため、イベントループを止めないようスレッドで実行する
+        configure_rounds(await run_in_threadpool(calibrate_rounds, settings.bcrypt_target_ms))
+        print(f"bcrypt rounds calibrated: {password_pool.stats()['rounds']}")
+    yield
+    # 保存待ちのプランをすべてコミットしてから終了する
+    await run_in_threadpool(plan_writer.stop)
+    montecarlo.shutdown_pool()
+    if database.async_engine is not None:
+        # 非同期ドライバの接続（ワーカースレッド）を閉じる
+        await database.async_engine.dispose()
 
-app = FastAPI(title="おみせ開業AI API")
+app = FastAPI(title="おみせ開業AI API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -23,8 +61,32 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+app.add_middleware(profiling.ProfilingMiddleware)
+
+if settings.metrics_enabled:
+    # CORSの処理も含めた処理時間を計測するため、一番外側に追加する
+    app.add_middleware(metrics.MetricsMiddleware)
+
+@app.exception_handler(PasswordPoolBusy)
+def password_pool_busy_handler(request, exc: PasswordPoolBusy):
+    # スレッドを待たせずにすぐ返し、クライアントには少し待ってから再試行してもらう
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "ただいまアクセスが集中しています。しばらく待ってから再度お試しください。"},
+        headers={"Retry-After": "1"}
+    )
+
+@app.exception_handler(PlanWriterBusy)
+def plan_writer_busy_handler(request, exc: PlanWriterBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "ただいまアクセスが集中しています。しばらく待ってから再度お試しください。"},
+        headers={"Retry-After": "1"}
+    )
+
 @app.get("/")
 def read_root():
     return {"message": "おみせ開業AI API", "status": "running"}
@@ -33,64 +95,55 @@ def read_root():
 def health_check():
     return {"status": "healthy"}
 
+if settings.metrics_enabled:
+    @app.get("/metrics", include_in_schema=False)
+    def get_metrics():
+        """Prometheus形式のメトリクス"""
+        return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.post("/api/plans", response_model=schemas.BusinessPlanOutput)
-def create_plan(plan: schemas.BusinessPlanInput, db: Session = Depends(get_db)):
+async def create_plan(
+    plan: schemas.BusinessPlanInput,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user_optional),
+    idempotency_key: Optional[str] = Header(None, min_length=1, max_length=255)
+):
+    """プランを作成（Idempotency-Keyヘッダー、または同じ入力の再送信には保存済みのプランを返す）"""
     try:
-        # 入力データの検証
-        if not plan.type or not plan.area:
-            raise HTTPException(status_code=400, detail="業態と立地は必須です")
-        
-        if plan.seats <= 0 or plan.atv <= 0:
-            raise HTTPException(status_code=400, detail="席数と客単価は1以上である必要があります")
-        
-        db_plan = crud.create_business_plan(db, plan)
-        calc = crud.calculate_business_plan(plan)
+        # 入力データの検証（正規化とハッシュ計算はカタログを参照するため、スレッドで実行する）
+        user_id = current_user.id if current_user else None
+        plan, input_error, input_hash = await run_in_threadpool(_prepare_plan_input, plan, user_id)
+        if input_error:
+            raise HTTPException(status_code=400, detail=input_error)
         
-        # 拡張フィールドを追加（Noneチェック付き）
-        from datetime import datetime
+        # 再送信なら計算・保存をせずに保存済みのプランを返す
+        existing = await _find_existing_plan(db, user_id, input_hash, idempotency_key)
+        if existing is not None:
+            return serialization.plan_response(existing, headers={"Idempotent-Replayed": "true"})
         
-        # menu_examplesの処理
-        menu_examples_list = []
-        if calc.get('menu_examples'):
-            try:
-                menu_examples_list = [schemas.MenuExample(**m) for m in calc.get('menu_examples', []) if m]
-            except Exception as e:
-                print(f"Warning: Error processing menu_examples: {e}")
-                menu_examples_list = []
+        # 計算は1リクエストにつき1回（同じ入力ならキャッシュから取得）。キャッシュにない場合の計算でイベントループを止めない
+        calc = await run_in_threadpool(crud.calculate_business_plan_cached, plan)
+        try:
+            if plan_writer.enabled:
+                # 書き込みスレッドが他のリクエストの分とまとめてコミットし、採番されたIDを返す
+                row = crud.plan_row(plan, calc, user_id, input_hash, idempotency_key)
+                row['created_at'] = datetime.utcnow()
+                plan_id = await asyncio.wrap_future(plan_writer.submit(row))
+                db_plan = models.BusinessPlan(id=plan_id, **row)
+            else:
+                db_plan = await run_in_threadpool(
+                    crud.create_business_plan, db, plan, calc, user_id, input_hash, idempotency_key
+                )
+        except IntegrityError:
+            # 同じIdempotency-Keyのリクエストが同時に届き、先に保存された
+            existing = await _find_existing_plan(db, user_id, input_hash, idempotency_key) if idempotency_key else None
+            if existing is None:
+                raise
+            return serialization.plan_response(existing, headers={"Idempotent-Replayed": "true"})
         
-        result = schemas.BusinessPlanOutput(
-            id=db_plan.id,
-            type=db_plan.type,
-            seats=db_plan.seats,
-            atv=db_plan.atv,
-            hours=db_plan.hours,
-            area=db_plan.area,
-            turnover=db_plan.turnover,
-            daily_guests=db_plan.daily_guests,
-            monthly_sales=db_plan.monthly_sales,
-            cogs_rate=db_plan.cogs_rate,
-            cogs=db_plan.cogs,
-            gross_profit=db_plan.gross_profit,
-            labor_cost=db_plan.labor_cost,
-            fixed_cost=db_plan.fixed_cost,
-            op_income=db_plan.op_income,
-            payback_months=db_plan.payback_months,
-            concept=db_plan.concept or "",
-            action=db_plan.action or "",
-            catch_copy=calc.get('catch_copy'),
-            target_audience=calc.get('target_audience'),
-            menu_examples=menu_examples_list if menu_examples_list else None,
-            sns_strategy=calc.get('sns_strategy'),
-            staff_count=calc.get('staff_count'),
-            peak_operation=calc.get('peak_operation'),
-            initial_investment=calc.get('initial_investment'),
-            opening_cost=calc.get('opening_cost'),
-            funding_methods=calc.get('funding_methods'),
-            seat_occupancy_rate=calc.get('seat_occupancy_rate'),
-            created_at=db_plan.created_at if db_plan.created_at else datetime.now()
-        )
-        return result
-    except HTTPException:
+        # 自前で計算・保存したデータのため、スキーマでの再検証を省いてそのままJSONにする
+        return serialization.plan_response(db_plan, crud.extended_fields(calc))
+    except (HTTPException, PlanWriterBusy):
         raise
     except Exception as e:
         import traceback
@@ -100,77 +153,405 @@ def create_plan(plan: schemas.BusinessPlanInput, db: Session = Depends(get_db)):
         print(traceback_str)
         raise HTTPException(status_code=500, detail=f"プラン作成中にエラーが発生しました: {error_msg}")
 
-@app.get("/api/plans/{plan_id}", response_model=schemas.BusinessPlanOutput)
-def get_plan(plan_id: int, db: Session = Depends(get_db)):
-    db_plan = crud.get_business_plan(db, plan_id)
-    if not db_plan:
-        raise HTTPException(status_code=404, detail="Plan not found")
-    return db_plan
+def _prepare_plan_input(plan: schemas.BusinessPlanInput, user_id: Optional[int]):
+    """入力を正規化し、(正規化した入力, 検証エラー, 再送信の判定に使うハッシュ) を返す"""
+    plan = crud.normalize_plan_input(plan)
+    input_error = simulation.plan_input_error(plan)
+    input_hash = None if input_error else crud.plan_input_hash(plan, user_id)
+    return plan, input_error, input_hash
 
-@app.get("/api/plans", response_model=List[schemas.BusinessPlanOutput])
-def get_plans(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return crud.get_business_plans(db, skip, limit)
+async def _find_existing_plan(db: Session, user_id: Optional[int], input_hash: str, idempotency_key: Optional[str]):
+    """再送信されたリクエストの保存済みのプランを取得（キーの使い回しは422）"""
+    try:
+        return await run_in_threadpool(crud.find_existing_plan, db, user_id, input_hash, idempotency_key)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
-@app.get("/api/menus/{type}/{concept}")
-def get_menus(type: str, concept: str):
-    suggestions = crud.get_menu_suggestions(type, concept)
-    return {"suggestions": suggestions}
+@app.post("/api/plans/batch", response_model=schemas.BusinessPlanBatchOutput)
+def create_plans_batch(
+    batch: schemas.BusinessPlanBatchInput,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user_optional)
+):
+    """複数の出店候補をまとめてシミュレーション（結果は入力順、エラーは1件ごとに返す）"""
+    if len(batch.plans) > settings.plan_batch_max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"一度にシミュレーションできるのは{settings.plan_batch_max_items}件までです"
+        )
+    
+    # 1件ごとに入力を検証し、正常な入力だけを一括計算に回す
+    items = [None] * len(batch.plans)
+    valid_indexes = []
+    valid_inputs = []
+    for index, raw in enumerate(batch.plans):
+        try:
+            plan = schemas.BusinessPlanInput.model_validate(raw)
+        except ValidationError as e:
+            error = "; ".join(
+                f"{'.'.join(str(loc) for loc in err['loc']) or 'plan'}: {err['msg']}" for err in e.errors()
+            )
+            items[index] = schemas.BusinessPlanBatchItem(index=index, ok=False, error=error)
+            continue
+        input_error = simulation.plan_input_error(plan)
+        if input_error:
+            items[index] = schemas.BusinessPlanBatchItem(index=index, ok=False, error=input_error)
+            continue
+        valid_indexes.append(index)
+        valid_inputs.append(plan)
+    
+    results = simulation.calculate_business_plans(valid_inputs)
+    
+    if batch.projection:
+        projections = projection.project_plans(
+            [r['seats'] for r in results],
+            [r['type'] for r in results],
+            [r['monthly_sales'] for r in results],
+            [r['cogs_rate'] for r in results],
+            **batch.projection_options.model_dump()
+        )
+    
+    if batch.persist and results:
+        extended = simulation.calculate_extended_fields(valid_inputs)
+        plan_ids = crud.create_business_plans_bulk(
+            db,
+            [dict(result, extended=fields) for result, fields in zip(results, extended)],
+            user_id=current_user.id if current_user else None
+        )
+        for result, plan_id in zip(results, plan_ids):
+            result['id'] = plan_id
+    
+    for i, (index, result) in enumerate(zip(valid_indexes, results)):
+        if batch.projection:
+            result = dict(result, projection=projections[i])
+        items[index] = schemas.BusinessPlanBatchItem(
+            index=index,
+            ok=True,
+            result=schemas.BusinessPlanBatchResult(**result)
+        )
+    
+    return schemas.BusinessPlanBatchOutput(
+        items=items,
+        succeeded=len(results),
+        failed=len(items) - len(results)
+    )
 
-@app.get("/api/subsidies/{area}")
-def get_subsidies(area: str):
-    subsidies = [
-        {
-            "name": "小規模事業者持続化補助金",
-            "amount": "上限：50万円（条件により200万円）",
-            "detail": "販路開拓・生産性向上の取り組みを支援。",
-            "requirement": "従業員5人以下の小規模事業者",
-            "badge": "募集中"
-        },
-        {
-            "name": "IT導入補助金",
-            "amount": "上限：50～450万円",
-            "detail": "POSレジ、予約システム、会計ソフトなどのITツール導入費用を補助。",
-            "requirement": "中小企業・小規模事業者",
-            "badge": None
-        }
-    ]
+@app.post("/api/plans/solve", response_model=schemas.PlanSolveOutput)
+def solve_plans(solve: schemas.PlanSolveInput):
+    """目標の営業利益・回収月数を満たすのに必要な席数・客単価・回転数を逆算（目標は複数指定できる）"""
+    if not solve.type or not solve.area:
+        raise HTTPException(status_code=400, detail="業態と立地は必須です")
+    targets = len(solve.target_op_income) + len(solve.target_payback_months)
+    if targets == 0:
+        raise HTTPException(status_code=400, detail="target_op_income または target_payback_months を指定してください")
+    if targets > settings.plan_solve_max_targets:
+        raise HTTPException(
+            status_code=400,
+            detail=f"一度に指定できる目標は{settings.plan_solve_max_targets}件までです"
+        )
+    missing = [name for name in ("seats", "atv") if name != solve.solve_for and getattr(solve, name) is None]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"{' / '.join(missing)} を指定してください")
     
-    if area == "観光地":
-        local = {
-            "name": "観光振興・商店街活性化補助金",
-            "amount": "上限：50～300万円",
-            "detail": "観光地での新規出店を支援。",
-            "requirement": "観光地での新規創業者",
-            "badge": "地域限定"
-        }
-    elif area == "駅近":
-        local = {
-            "name": "駅前活性化・創業支援補助金",
-            "amount": "上限：50～300万円",
-            "detail": "駅前エリアの活性化を目的とした創業支援。",
-            "requirement": "駅前での新規創業者",
-            "badge": "地域限定"
-        }
-    else:
-        local = {
-            "name": "地方自治体の創業支援補助金",
-            "amount": "上限：50～300万円",
-            "detail": "開業時の設備投資、広告宣伝費などを支援。",
-            "requirement": "新規創業者",
-            "badge": "地域限定"
-        }
+    results = solver.solve(
+        solve.type,
+        solve.solve_for,
+        seats=solve.seats,
+        atv=solve.atv,
+        turnover=solve.turnover or crud.BASE_TURNOVER,
+        target_op_income=solve.target_op_income,
+        target_payback_months=solve.target_payback_months
+    )
+    return {"solve_for": solve.solve_for, "results": results}
+
+@app.post("/api/plans/sweep")
+def sweep_plans(sweep: schemas.PlanSweepInput):
+    """席数×客単価×回転数×原価率のグリッドで収支を一括計算（DBには保存しない）
+
+    json形式は軸ごとの値と、C順に平坦化した列データを返す。
+    npz形式は同じ内容をNumPyの.npz（非圧縮）で返す。
+    """
+    if not sweep.type or not sweep.area:
+        raise HTTPException(status_code=400, detail="業態と立地は必須です")
+    if sweep.seats.start <= 0 or sweep.atv.start <= 0:
+        raise HTTPException(status_code=400, detail="席数と客単価は1以上である必要があります")
+    if sweep.turnover and sweep.turnover.start <= 0:
+        raise HTTPException(status_code=400, detail="回転数は0より大きい値を指定してください")
+    if sweep.cogs_rate and (sweep.cogs_rate.start < 0 or sweep.cogs_rate.stop > 1):
+        raise HTTPException(status_code=400, detail="原価率は0〜1の範囲で指定してください")
     
-    subsidies.append(local)
-    return {"subsidies": subsidies}
+    unknown_fields = [f for f in sweep.fields if f not in simulation.SWEEP_FIELDS]
+    if unknown_fields:
+        raise HTTPException(status_code=400, detail=f"指定できない項目です: {', '.join(unknown_fields)}")
+    
+    # 配列を確保する前にグリッドの大きさを確認する
+    cells = sweep.seats.size * sweep.atv.size
+    cells *= sweep.turnover.size if sweep.turnover else 1
+    cells *= sweep.cogs_rate.size if sweep.cogs_rate else 1
+    if cells > settings.plan_sweep_max_cells:
+        raise HTTPException(
+            status_code=400,
+            detail=f"グリッドが大きすぎます（{cells}セル、上限{settings.plan_sweep_max_cells}セル）"
+        )
+    
+    max_turnover = sweep.turnover.stop if sweep.turnover else crud.BASE_TURNOVER
+    if simulation.sweep_exceeds_exact_range(sweep.seats.stop, sweep.atv.stop, max_turnover):
+        raise HTTPException(status_code=400, detail="席数または客単価が大きすぎます")
+    
+    turnover = None
+    if sweep.turnover:
+        turnover = simulation.expand_range(
+            sweep.turnover.start, sweep.turnover.stop, sweep.turnover.step, np.float64
+        )
+    cogs_rate = None
+    if sweep.cogs_rate:
+        cogs_rate = simulation.expand_range(
+            sweep.cogs_rate.start, sweep.cogs_rate.stop, sweep.cogs_rate.step, np.float64
+        )
+    axes, metrics = simulation.sweep_grid(
+        sweep.type,
+        simulation.expand_range(sweep.seats.start, sweep.seats.stop, sweep.seats.step, np.int64),
+        simulation.expand_range(sweep.atv.start, sweep.atv.stop, sweep.atv.step, np.int64),
+        turnover=turnover,
+        cogs_rate=cogs_rate
+    )
+    
+    shape = list(metrics['monthly_sales'].shape)
+    if sweep.format == 'npz':
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            **{f'axis_{name}': values for name, values in axes.items()},
+            **{name: metrics[name] for name in sweep.fields}
+        )
+        return Response(
+            content=buffer.getvalue(),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": 'attachment; filename="sweep.npz"'}
+        )
+    
+    return JSONResponse({
+        "type": sweep.type,
+        "area": sweep.area,
+        "dims": list(axes.keys()),
+        "shape": shape,
+        "axes": {name: values.tolist() for name, values in axes.items()},
+        "columns": {name: metrics[name].ravel().tolist() for name in sweep.fields}
+    })
+
+@app.post("/api/plans/montecarlo", response_model=schemas.MonteCarloOutput)
+def simulate_plan_risk(mc: schemas.MonteCarloInput):
+    """回転数・客単価・原価率・人件費率を分布から試行し、営業利益と回収月数の分布を返す"""
+    input_error = simulation.plan_input_error(mc)
+    if input_error:
+        raise HTTPException(status_code=400, detail=input_error)
+    if not 1 <= mc.draws <= settings.montecarlo_max_draws:
+        raise HTTPException(
+            status_code=400,
+            detail=f"試行回数は1〜{settings.montecarlo_max_draws}回で指定してください"
+        )
+    if mc.seed is not None and mc.seed < 0:
+        raise HTTPException(status_code=400, detail="seedは0以上の整数で指定してください")
+    if any(not 0 <= p <= 100 for p in mc.percentiles):
+        raise HTTPException(status_code=400, detail="パーセンタイルは0〜100で指定してください")
+    
+    specs = montecarlo.default_specs(mc.type, mc.atv)
+    for name, spec in mc.distributions.model_dump(exclude_none=True).items():
+        specs[name] = spec
+    if montecarlo.exceeds_exact_range(mc.seats, specs):
+        raise HTTPException(status_code=400, detail="回転数または客単価の分布の上限が大きすぎます")
+    
+    seed = mc.seed if mc.seed is not None else montecarlo.new_seed()
+    return montecarlo.run_simulation(mc.type, mc.seats, mc.draws, specs, seed, mc.percentiles)
+
+def _plan_response(request: Request, db_plan: models.BusinessPlan) -> Response:
+    """プランの更新日時（未更新の場合は作成日時）を検証子にした条件付きGETのレスポンス"""
+    last_modified = db_plan.updated_at or db_plan.created_at
+    etag = http_cache.make_etag("plan", db_plan.id, last_modified.isoformat() if last_modified else "")
+    not_modified, headers = http_cache.check_conditional(request, etag, last_modified)
+    return not_modified or serialization.plan_response(db_plan, headers=headers)
+
+def _plans_page_response(db_plans: list, next_cursor: Optional[str], with_projection: bool = False) -> Response:
+    # 一覧の形式は変えず、次ページのカーソルはヘッダーで返す
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    projections = None
+    if with_projection:
+        # 保存済みの開業費を使い、ページ内のプランをまとめて計算する
+        projections = projection.project_plans(
+            [p.seats for p in db_plans],
+            [p.type for p in db_plans],
+            [p.monthly_sales for p in db_plans],
+            [p.cogs_rate for p in db_plans],
+            opening_cost=[p.opening_cost for p in db_plans]
+        )
+    return serialization.plans_response(db_plans, headers=headers, projections=projections)
+
+# プランの取得系エンドポイント（DATABASE_ASYNC=true の場合は非同期DBで処理する）
+if settings.database_async:
+    async def _plans_page(db: AsyncSession, limit: int, cursor: Optional[str], skip: int, user_id: int = None,
+                          with_projection: bool = False, anonymous: bool = False):
+        try:
+            db_plans, next_cursor = await crud_async.get_business_plans(db, skip, limit, cursor, user_id, anonymous)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return _plans_page_response(db_plans, next_cursor, with_projection)
+    
+    @app.get("/api/plans", response_model=List[schemas.BusinessPlanOutput])
+    async def get_plans(
+        limit: int = Query(10, ge=1, le=100),
+        cursor: Optional[str] = None,
+        skip: int = Query(0, ge=0),
+        with_projection: bool = Query(False, alias="projection", description="月次キャッシュフロー予測を含める"),
+        db: AsyncSession = Depends(get_async_db)
+    ):
+        """未ログインで作成したプランの一覧を新しい順に取得（次ページはX-Next-Cursorヘッダーの値をcursorに指定）
+
+        ログインユーザーのプランは含めない（自分のプランは /api/plans/my で取得する）。
+        """
+        return await _plans_page(db, limit, cursor, skip, with_projection=with_projection, anonymous=True)
+    
+    @app.get("/api/plans/my", response_model=List[schemas.BusinessPlanOutput])
+    async def get_my_plans(
+        limit: int = Query(10, ge=1, le=100),
+        cursor: Optional[str] = None,
+        skip: int = Query(0, ge=0),
+        with_projection: bool = Query(False, alias="projection", description="月次キャッシュフロー予測を含める"),
+        current_user = Depends(get_current_user_async),
+        db: AsyncSession = Depends(get_async_db)
+    ):
+        """ログインユーザーのシミュレーション結果一覧を取得"""
+        return await _plans_page(db, limit, cursor, skip, user_id=current_user.id, with_projection=with_projection)
+    
+    @app.get("/api/plans/{plan_id}", response_model=schemas.BusinessPlanOutput)
+    async def get_plan(
+        plan_id: int,
+        request: Request,
+        current_user = Depends(get_current_user_optional_async),
+        db: AsyncSession = Depends(get_async_db)
+    ):
+        """プランを取得（他のユーザーのプランは404）"""
+        db_plan = await crud_async.get_business_plan(db, plan_id, current_user.id if current_user else None)
+        if not db_plan:
+            raise HTTPException(status_code=404, detail="Plan not found")
+        return _plan_response(request, db_plan)
+else:
+    def _plans_page(db: Session, limit: int, cursor: Optional[str], skip: int, user_id: int = None,
+                    with_projection: bool = False, anonymous: bool = False):
+        try:
+            db_plans, next_cursor = crud.get_business_plans(db, skip, limit, cursor, user_id, anonymous)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return _plans_page_response(db_plans, next_cursor, with_projection)
+    
+    @app.get("/api/plans", response_model=List[schemas.BusinessPlanOutput])
+    def get_plans(
+        limit: int = Query(10, ge=1, le=100),
+        cursor: Optional[str] = None,
+        skip: int = Query(0, ge=0),
+        with_projection: bool = Query(False, alias="projection", description="月次キャッシュフロー予測を含める"),
+        db: Session = Depends(get_db)
+    ):
+        """未ログインで作成したプランの一覧を新しい順に取得（次ページはX-Next-Cursorヘッダーの値をcursorに指定）
+
+        ログインユーザーのプランは含めない（自分のプランは /api/plans/my で取得する）。
+        """
+        return _plans_page(db, limit, cursor, skip, with_projection=with_projection, anonymous=True)
+    
+    @app.get("/api/plans/my", response_model=List[schemas.BusinessPlanOutput])
+    def get_my_plans(
+        limit: int = Query(10, ge=1, le=100),
+        cursor: Optional[str] = None,
+        skip: int = Query(0, ge=0),
+        with_projection: bool = Query(False, alias="projection", description="月次キャッシュフロー予測を含める"),
+        current_user = Depends(get_current_user),
+        db: Session = Depends(get_db)
+    ):
+        """ログインユーザーのシミュレーション結果一覧を取得"""
+        return _plans_page(db, limit, cursor, skip, user_id=current_user.id, with_projection=with_projection)
+    
+    @app.get("/api/plans/{plan_id}", response_model=schemas.BusinessPlanOutput)
+    def get_plan(
+        plan_id: int,
+        request: Request,
+        current_user = Depends(get_current_user_optional),
+        db: Session = Depends(get_db)
+    ):
+        """プランを取得（他のユーザーのプランは404）"""
+        db_plan = crud.get_business_plan(db, plan_id, current_user.id if current_user else None)
+        if not db_plan:
+            raise HTTPException(status_code=404, detail="Plan not found")
+        return _plan_response(request, db_plan)
+
+@app.get("/api/plans/my/export")
+def export_my_plans(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    type: Optional[str] = None,
+    area: Optional[str] = None,
+    created_from: Optional[datetime] = Query(None, description="この日時以降に作成したプラン"),
+    created_to: Optional[datetime] = Query(None, description="この日時より前に作成したプラン"),
+    extended: bool = Query(False, description="キャッチコピー・メニュー例などの拡張フィールドも出力する"),
+    current_user = Depends(get_current_user)
+):
+    """ログインユーザーのプランをすべてCSV / NDJSONでストリーミング出力（作成日時の古い順）"""
+    stmt = crud.plans_export_query(
+        current_user.id, type, area, export.utc_naive(created_from), export.utc_naive(created_to)
+    )
+    return StreamingResponse(
+        export.iter_export(database.SessionLocal, stmt, format, extended, settings.plan_export_chunk_size),
+        media_type=export.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="plans.{format}"'}
+    )
+
+@app.get("/api/menus/search")
+def search_menus(
+    request: Request,
+    tags: str = Query("", max_length=200, description="タグ・コンセプト（カンマ・空白区切り、表記ゆれは近いタグに対応付ける）"),
+    type: Optional[str] = Query(None, max_length=50),
+    min_price: Optional[int] = Query(None, ge=0),
+    max_price: Optional[int] = Query(None, ge=0),
+    k: int = Query(10, ge=1, le=100),
+    match: str = Query("any", pattern="^(any|all)$", description="any: いずれかのタグ、all: すべてのタグを含む")
+):
+    """タグ・業態・価格帯でメニューを検索（一致したタグの重みの合計が大きい順に上位k件）"""
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise HTTPException(status_code=400, detail="min_price は max_price 以下にしてください")
+    return http_cache.cached_json_response(
+        request,
+        ("menu_search", tags, type, min_price, max_price, k, match),
+        lambda: crud.search_menus(type, tags, min_price, max_price, k, match == "all")
+    )
+
+@app.get("/api/menus/{type}/{concept}")
+def get_menus(type: str, concept: str, request: Request):
+    return http_cache.cached_json_response(
+        request,
+        ("menus", type, concept),
+        lambda: {"suggestions": crud.get_menu_suggestions(type, concept)}
+    )
+
+@app.get("/api/subsidies/{area}")
+def get_subsidies(area: str, request: Request):
+    return http_cache.cached_json_response(
+        request,
+        ("subsidies", area),
+        lambda: {"subsidies": crud.get_subsidies(area)}
+    )
 
 
 # 認証関連のエンドポイント
 @app.post("/api/auth/register", response_model=schemas.TokenResponse)
-def register(user_data: schemas.UserRegister, db: Session = Depends(get_db)):
+async def register(user_data: schemas.UserRegister, db: Session = Depends(get_db)):
     """ユーザー登録"""
     try:
+        # 登録済みのメールアドレスならハッシュ化の前に弾く
+        if await run_in_threadpool(crud.get_user_by_email, db, user_data.email):
+            raise ValueError("このメールアドレスは既に登録されています")
+        
+        # パスワードのハッシュ化は専用のスレッドプールで行う
+        password_hash = await password_pool.run(hash_password, user_data.password)
+        
         # ユーザーを作成
-        db_user = crud.create_user(db, user_data)
+        db_user = await run_in_threadpool(crud.create_user, db, user_data, password_hash)
         
         # JWTトークンを発行
         access_token = create_access_token(
@@ -191,8 +572,8 @@ def register(user_data: schemas.UserRegister, db: Session = Depends(get_db)):
     except ValueError as e:
         # ValueErrorはバリデーションエラーとして400で返す
         raise HTTPException(status_code=400, detail=str(e))
-    except HTTPException:
-        # HTTPExceptionはそのまま再発生
+    except (HTTPException, PasswordPoolBusy):
+        # HTTPExceptionと混雑時のエラーはそのまま再発生
         raise
     except Exception as e:
         # その他の予期しないエラーは500で返す（ライブラリの生エラーを隠す）
@@ -211,10 +592,12 @@ def register(user_data: schemas.UserRegister, db: Session = Depends(get_db)):
 
 
 @app.post("/api/auth/login", response_model=schemas.TokenResponse)
-def login(user_data: schemas.UserLogin, db: Session = Depends(get_db)):
+async def login(user_data: schemas.UserLogin, db: Session = Depends(get_db)):
     """ユーザーログイン"""
-    # ユーザー認証
-    user = crud.authenticate_user(db, user_data.email, user_data.password)
+    # ユーザー認証（パスワードの検証は専用のスレッドプールで行う）
+    user = await run_in_threadpool(crud.get_user_by_email, db, user_data.email)
+    if user and not await password_pool.run(verify_password, user_data.password, user.password_hash):
+        user = None
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -222,6 +605,15 @@ def login(user_data: schemas.UserLogin, db: Session = Depends(get_db)):
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # ハッシュのコストが現在の設定と異なる場合は、平文パスワードがある今のうちに作り直す
+    if needs_rehash(user.password_hash):
+        try:
+            new_hash = await password_pool.run(hash_password, user_data.password)
+            await run_in_threadpool(crud.update_password_hash, db, user, new_hash)
+        except PasswordPoolBusy:
+            # 混雑時は再ハッシュを見送り、次回のログインで行う
+            pass
+    
     # JWTトークンを発行
     access_token = create_access_token(
         data={"sub": str(user.id), "email": user.email},
@@ -249,18 +641,100 @@ def get_current_user_info(current_user = Depends(get_current_user)):
         created_at=current_user.created_at
     )
 
+# 管理用エンドポイント
+@app.get("/api/admin/cache/stats", dependencies=[Depends(require_admin)])
+def get_cache_stats():
+    """プロセス内キャッシュの統計情報を取得"""
+    return {
+        "plan_calculation": crud.plan_cache.stats(),
+        "auth_token": token_cache.stats(),
+        "auth_user": crud.user_cache.stats()
+    }
+
+@app.get("/api/admin/db/pool", dependencies=[Depends(require_admin)])
+def get_db_pool_status():
+    """DBコネクションプールの状態（払い出し数・オーバーフロー・待ち時間・タイムアウト）を取得"""
+    return {
+        "sync": database.pool_status(database.engine),
+        "async": database.pool_status(database.async_engine.sync_engine) if database.async_engine else None
+    }
 
-@app.get("/api/plans/my", response_model=List[schemas.BusinessPlanOutput])
-def get_my_plans(
-    skip: int = 0,
-    limit: int = 10,
-    current_user = Depends(get_current_user),
+@app.get("/api/admin/db/writer", dependencies=[Depends(require_admin)])
+def get_plan_writer_stats():
+    """プラン保存（グループコミット）の統計情報を取得"""
+    return plan_writer.stats()
+
+@app.get("/api/admin/analytics/plans", dependencies=[Depends(require_admin)])
+def get_plan_analytics(
+    group_by: str = Query("type,area", description="集計の単位（type / area をカンマ区切り、空の場合は全体）"),
+    type: Optional[str] = None,
+    area: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """業態・エリアごとの月商・営業利益・回収期間の平均・標準偏差・パーセンタイル（集計テーブルから取得）"""
+    columns = tuple(name.strip() for name in group_by.split(",") if name.strip())
+    if any(name not in analytics.GROUP_COLUMNS for name in columns) or len(set(columns)) != len(columns):
+        raise HTTPException(status_code=400, detail="group_by には type / area を指定してください")
+    return {
+        "group_by": list(columns),
+        "metrics": list(analytics.METRICS),
+        "relative_accuracy": analytics.RELATIVE_ACCURACY,
+        "groups": analytics.summarize(db, columns, type=type, area=area)
+    }
+
+@app.get("/api/admin/plans/search", dependencies=[Depends(require_admin)])
+def search_plans(
+    q: str = Query(..., min_length=1, max_length=200, description="検索語（空白区切りでAND検索）"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
     db: Session = Depends(get_db)
 ):
-    """ログインユーザーのシミュレーション結果一覧を取得（下準備）"""
-    # 現在は全ユーザーのプランを返すが、将来的にuser_idでフィルタリングする
-    # current_user.id を使ってフィルタリングできるように準備
-    return crud.get_business_plans(db, skip, limit)
+    """業態・コンセプト・アクションの文字列でプランを全文検索（一致度の高い順）"""
+    if not search.parse_terms(q):
+        raise HTTPException(status_code=400, detail="検索語を指定してください")
+    result = search.search(db, q, limit=limit, offset=offset)
+    items = []
+    for db_plan, score in result["items"]:
+        row = serialization.plan_dict(db_plan)
+        row["score"] = score
+        items.append(row)
+    return Response(
+        content=serialization.dumps({
+            "query": q,
+            "total": result["total"],
+            "limit": limit,
+            "offset": offset,
+            "indexed": result["indexed"],
+            "items": items
+        }),
+        media_type="application/json"
+    )
+
+@app.get("/api/admin/profiles", dependencies=[Depends(require_admin)])
+def get_profiles():
+    """保存済みのプロファイル一覧（新しい順、speedscopeで開ける形式）"""
+    return {"profiles": profiling.list_profiles()}
+
+@app.get("/api/admin/profiles/{name}", dependencies=[Depends(require_admin)])
+def download_profile(name: str):
+    """保存済みのプロファイルをダウンロード"""
+    path = profiling.profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/json", filename=name)
+
+@app.get("/api/admin/catalog", dependencies=[Depends(require_admin)])
+def get_catalog_info():
+    """読み込み済みの業態カタログの情報を取得"""
+    return catalog.get_catalog().info()
+
+@app.post("/api/admin/catalog/reload", dependencies=[Depends(require_admin)])
+def reload_catalog():
+    """業態カタログを再読み込み（このワーカーのみ。他のワーカーはファイルの更新日時で自動的に読み直す）"""
+    try:
+        return catalog.reload_catalog().info()
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"カタログの読み込みに失敗しました: {e}")
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,72 @@
+"""
+管理用コマンド
+
+実行方法（backendディレクトリで）:
+    python manage.py migrate    # データベースのスキーマを最新にする（デプロイ時に1回実行）
+    python manage.py version    # 現在のスキーマのバージョンと未適用のマイグレーションを表示
+    python manage.py rebuild-analytics    # プランの集計テーブルを business_plans から作り直す
+    python manage.py rebuild-search    # プランの全文検索の索引を business_plans から作り直す
+    python manage.py fill-extended    # 拡張フィールドが未保存のプランに計算結果を保存する
+"""
+import argparse
+import sys
+
+import analytics
+import crud
+import migrations
+import search
+from database import engine
+
+
+def cmd_migrate(args) -> int:
+    applied = migrations.migrate(engine)
+    if not applied:
+        print(f"schema is up to date (version {migrations.current_version(engine)})")
+    return 0
+
+
+def cmd_version(args) -> int:
+    print(f"current version: {migrations.current_version(engine)} (latest: {migrations.LATEST_VERSION})")
+    for version, name in migrations.pending(engine):
+        print(f"  pending {version}: {name}")
+    return 0
+
+
+def cmd_rebuild_analytics(args) -> int:
+    with engine.begin() as connection:
+        count = analytics.rebuild(connection)
+    print(f"rebuilt plan analytics from {count} plans")
+    return 0
+
+
+def cmd_rebuild_search(args) -> int:
+    with engine.begin() as connection:
+        if not search.has_index(connection):
+            print("full-text search index does not exist (run migrate first)")
+            return 1
+        count = search.rebuild(connection)
+    print(f"rebuilt plan search index from {count} plans")
+    return 0
+
+
+def cmd_fill_extended(args) -> int:
+    with engine.begin() as connection:
+        count = crud.fill_missing_extended(connection)
+    print(f"filled extended fields of {count} plans")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("migrate", help="未適用のマイグレーションを実行").set_defaults(func=cmd_migrate)
+    subparsers.add_parser("version", help="スキーマのバージョンを表示").set_defaults(func=cmd_version)
+    subparsers.add_parser("rebuild-analytics", help="プランの集計テーブルを作り直す").set_defaults(func=cmd_rebuild_analytics)
+    subparsers.add_parser("rebuild-search", help="プランの全文検索の索引を作り直す").set_defaults(func=cmd_rebuild_search)
+    subparsers.add_parser("fill-extended", help="拡張フィールドが未保存のプランに計算結果を保存").set_defaults(func=cmd_fill_extended)
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""
+メニュー提案の検索エンジン
+
+data/menus.json のメニューを起動時に1回だけ読み込み、次の索引を組み立てる。
+- タグ（ヘルシー、SNS映え、低糖質…）→ メニュー番号の配列（転置インデックス）
+- メインカテゴリ（crud.extract_main_category で抽出した業態）→ メニュー番号の配列
+- 価格の昇順に並べたメニュー番号（価格帯の絞り込みは二分探索）
+- suggestions に記載した (業態, タグ) ごとの定番の提案（従来の固定の提案と同じ内容・順序を保つ）
+
+コンセプトの文字列は区切り文字で語に分け、NFKC正規化・小文字化した上で
+タグ名・別名との完全一致 → 部分一致 → 文字bigramの類似度（Dice係数）の順にタグへ対応付ける。
+検索結果は一致したタグの重み（完全一致1.0、部分一致・類似度ではそれ以下）の合計が大きい順、
+同じ場合はカタログの記載順。候補の絞り込みはNumPyの配列演算で行い、上位k件だけを並べ替える。
+"""
+import json
+import re
+import threading
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
+from types import MappingProxyType
+
+import numpy as np
+
+from config import settings
+
+DEFAULT_MENUS_PATH = Path(__file__).parent / "data" / "menus.json"
+
+MENU_FIELDS = ('name', 'price', 'description')
+SUGGESTION_COUNT = 3  # GET /api/menus/{type}/{concept} で返す件数
+PARTIAL_MATCH_WEIGHT = 0.9  # タグ名・別名を含む（含まれる）語の重み
+FUZZY_THRESHOLD = 0.5  # これ未満の類似度の語はタグに対応付けない
+
+_SEPARATORS = re.compile(r"[\s,，、/／|]+")
+_EMPTY = np.empty(0, dtype=np.int64)
+
+
+def normalize(text: str) -> str:
+    """全角・半角と大文字・小文字の違いをそろえ、空白を除く"""
+    return re.sub(r"\s+", "", unicodedata.normalize("NFKC", text).casefold())
+
+
+def _bigrams(text: str) -> frozenset:
+    return frozenset(text[i:i + 2] for i in range(len(text) - 1)) or frozenset([text])
+
+
+class MenuEngine:
+    def __init__(self, data: dict):
+        items = data['items']
+        self.items = tuple(MappingProxyType({name: item[name] for name in MENU_FIELDS}) for item in items)
+        self.default = tuple(MappingProxyType(dict(item)) for item in data.get('default', []))
+        self._prices = np.array([item['price'] for item in items], dtype=np.int64)
+
+        categories, tags = {}, {}
+        for i, item in enumerate(items):
+            categories.setdefault(item['category'], []).append(i)
+            for tag in item.get('tags', []):
+                tags.setdefault(tag, []).append(i)
+        self._categories = {name: np.array(ids, dtype=np.int64) for name, ids in categories.items()}
+        self._tags = {name: np.array(ids, dtype=np.int64) for name, ids in tags.items()}
+        codes = {name: code for code, name in enumerate(categories)}
+        self._category_codes = codes
+        self._category_ids = np.array([codes[item['category']] for item in items], dtype=np.int32)
+        self._price_order = np.argsort(self._prices, kind='stable')
+        self._sorted_prices = self._prices[self._price_order]
+
+        # 正規化したタグ名・別名 → タグ
+        terms = {}
+        for tag in self._tags:
+            terms[normalize(tag)] = tag
+        for tag, aliases in data.get('tags', {}).items():
+            terms.setdefault(normalize(tag), tag)
+            for alias in aliases:
+                terms.setdefault(normalize(alias), tag)
+        self._terms = MappingProxyType(terms)
+        self._term_bigrams = tuple((term, _bigrams(term), tag) for term, tag in terms.items())
+
+        # (業態, タグ) → 提案するメニュー番号（定番の組み合わせは検索の順位ではなく記載の順で提案する）
+        suggestions = {}
+        for category, by_tag in data.get('suggestions', {}).items():
+            names = {items[i]['name']: i for i in categories.get(category, [])}
+            for tag, menu_names in by_tag.items():
+                missing = [name for name in menu_names if name not in names]
+                if missing:
+                    raise ValueError(f"suggestionsの{category}/{tag}にitemsにないメニューがあります: {', '.join(missing)}")
+                suggestions[(category, tag)] = tuple(names[name] for name in menu_names)
+        self._suggestions = MappingProxyType(suggestions)
+        # 入力語ごとの対応付けの結果（同じコンセプトの問い合わせが多いため）
+        self._match_term = lru_cache(maxsize=4096)(self._match_term_uncached)
+
+    @property
+    def tags(self) -> list:
+        return list(self._tags)
+
+    @property
+    def categories(self) -> list:
+        return list(self._categories)
+
+    def info(self) -> dict:
+        return {'items': len(self.items), 'categories': len(self._categories), 'tags': len(self._tags)}
+
+    def _match_term_uncached(self, term: str):
+        """正規化した語に対応する (タグ, 重み)（対応するタグがない場合None）"""
+        tag = self._terms.get(term)
+        if tag is not None:
+            return tag, 1.0
+        # 「ヘルシー志向」のように、タグ名・別名を含む語（または含まれる2文字以上の語）
+        partial = [known for known in self._terms if len(min(known, term, key=len)) >= 2 and (known in term or term in known)]
+        if partial:
+            return self._terms[max(partial, key=len)], PARTIAL_MATCH_WEIGHT
+        grams = _bigrams(term)
+        best, best_score = None, 0.0
+        for known, known_grams, tag in self._term_bigrams:
+            score = 2 * len(grams & known_grams) / (len(grams) + len(known_grams))
+            if score > best_score:
+                best, best_score = tag, score
+        if best_score >= FUZZY_THRESHOLD:
+            return best, min(best_score, PARTIAL_MATCH_WEIGHT)
+        return None
+
+    def resolve_tags(self, text: str) -> list:
+        """コンセプト・タグの文字列を区切り、対応するタグの (タグ, 重み) リストにする（タグごとに最大の重み）"""
+        weights = {}
+        for word in _SEPARATORS.split(text or ''):
+            term = normalize(word)
+            if not term:
+                continue
+            matched = self._match_term(term)
+            if matched is not None:
+                tag, weight = matched
+                weights[tag] = max(weights.get(tag, 0.0), weight)
+        return list(weights.items())
+
+    def _price_range(self, min_price: int = None, max_price: int = None) -> np.ndarray:
+        """価格帯に入るメニュー番号（カタログ順）"""
+        lo = 0 if min_price is None else np.searchsorted(self._sorted_prices, min_price, side='left')
+        hi = len(self.items) if max_price is None else np.searchsorted(self._sorted_prices, max_price, side='right')
+        return np.sort(self._price_order[lo:hi])
+
+    def search(self, category: str = None, tags: list = (), min_price: int = None, max_price: int = None,
+               k: int = 10, match_all: bool = False) -> list:
+        """条件に合うメニューを重みの合計が大きい順に最大k件、(メニュー, スコア) のリストで返す
+
+        tags は resolve_tags の結果（(タグ, 重み) のリスト）。空の場合はカテゴリ・価格帯のみで絞り込み、
+        カタログ順に返す。category がカタログにない場合は結果なし。
+        """
+        if category is not None and category not in self._categories:
+            return []
+        price_filtered = False
+        if tags:
+            postings = [self._tags.get(tag, _EMPTY) for tag, _ in tags]
+            if len(tags) == 1:
+                candidates = postings[0]
+                scores = np.full(len(candidates), tags[0][1])
+                counts = np.ones(len(candidates), dtype=np.int16)
+            else:
+                # タグごとのメニュー番号を連結して併合する（カタログ全体ではなく該当件数の合計に比例する）
+                # 各タグのメニュー番号は重複しないため、同じ番号の出現回数が一致したタグの数になる
+                ids = np.concatenate(postings)
+                weights = np.repeat([weight for _, weight in tags], [len(p) for p in postings])
+                candidates, inverse, counts = np.unique(ids, return_inverse=True, return_counts=True)
+                scores = np.bincount(inverse, weights=weights, minlength=len(candidates))
+            keep = counts == len(tags) if match_all else np.ones(len(candidates), dtype=bool)
+            if category is not None:
+                keep &= self._category_ids[candidates] == self._category_codes[category]
+            candidates, scores = candidates[keep], scores[keep]
+        elif category is not None:
+            candidates = self._categories[category]
+            scores = np.zeros(len(candidates))
+        else:
+            candidates = self._price_range(min_price, max_price)
+            scores = np.zeros(len(candidates))
+            price_filtered = True
+
+        if not price_filtered and (min_price is not None or max_price is not None):
+            prices = self._prices[candidates]
+            keep = np.ones(len(candidates), dtype=bool)
+            if min_price is not None:
+                keep &= prices >= min_price
+            if max_price is not None:
+                keep &= prices <= max_price
+            candidates, scores = candidates[keep], scores[keep]
+
+        if len(candidates) > k:
+            # k番目のスコアより大きいものと、k番目と同点のもののうちカタログ順で先頭の分だけを残す
+            # （候補はカタログ順に並んでいるため、残りの並べ替えはk件だけで済む）
+            kth = -np.partition(-scores, k - 1)[k - 1]
+            greater = np.flatnonzero(scores > kth)
+            ties = np.flatnonzero(scores == kth)[:k - len(greater)]
+            keep = np.sort(np.concatenate([greater, ties]))
+            candidates, scores = candidates[keep], scores[keep]
+        order = np.argsort(-scores, kind='stable')
+        return [(self.items[i], float(scores[j])) for i, j in zip(candidates[order].tolist(), order.tolist())]
+
+    def suggest(self, category: str, concept: str, k: int = SUGGESTION_COUNT) -> list:
+        """業態とコンセプトに合うメニュー（合うものがなければ業態の定番、業態もなければ既定のメニュー）
+
+        コンセプトがタグ1つに完全一致し、その (業態, タグ) が suggestions に記載されている場合は記載のメニューを返す。
+        """
+        tags = self.resolve_tags(concept)
+        if len(tags) == 1 and tags[0][1] == 1.0 and (category, tags[0][0]) in self._suggestions:
+            return [dict(self.items[i]) for i in self._suggestions[(category, tags[0][0])][:k]]
+        results = self.search(category, tags, k=k) if tags else []
+        if not results:
+            results = self.search(category, k=k)
+        if not results:
+            return [dict(item) for item in self.default]
+        return [dict(item) for item, _ in results]
+
+
+def menus_path() -> Path:
+    return Path(settings.menu_catalog_path) if settings.menu_catalog_path else DEFAULT_MENUS_PATH
+
+
+def load_menu_engine(path: Path = None) -> MenuEngine:
+    """メニューのファイルを読み込んで索引を組み立てる"""
+    data = json.loads((path or menus_path()).read_text(encoding='utf-8'))
+    if 'items' not in data:
+        raise ValueError('メニューのファイルにitemsがありません')
+    return MenuEngine(data)
+
+
+_engine = None
+_lock = threading.Lock()
+
+
+def get_menu_engine() -> MenuEngine:
+    """メニューの検索エンジンを取得（最初の呼び出しで1回だけ組み立てる）"""
+    global _engine
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                _engine = load_menu_engine()
+    return _engine
@@ -0,0 +1,180 @@
+"""
+アプリケーションのメトリクス（Prometheusのテキスト形式で /metrics から出力）
+
+- http_requests_total: ルート（/api/plans/{plan_id} のようなテンプレート）・メソッド・ステータスごとのリクエスト数
+- http_request_duration_seconds: ルート・メソッドごとの処理時間のヒストグラム
+- stage_duration_seconds: 内部処理（calculation / db_commit / serialization / bcrypt）ごとの処理時間のヒストグラム
+
+記録はロックを取って配列の1要素を加算するだけで、累積値への変換は出力時に行う。
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from sqlalchemy import event
+
+# ヒストグラムの上限値（秒）
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STAGE_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# どのルートにも一致しなかったリクエスト（存在しないパスでラベルが増え続けないようまとめる）
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def get(self, labels: tuple) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{{{_format_labels(self.labelnames, labels)}}} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple, buckets: tuple):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [バケットごとの件数（非累積、最後は+Inf）, 合計, 件数]
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, labels: tuple) -> int:
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, (list(s[0]), s[1], s[2])) for labels, s in self._series.items())
+        for labels, (counts, total, count) in items:
+            base = _format_labels(self.labelnames, labels)
+            prefix = f"{base}," if base else ""
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{_format_value(bound)}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {_format_value(total)}")
+            lines.append(f"{self.name}_count{{{base}}} {count}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+requests_total = Counter(
+    "http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status")
+)
+request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route"), REQUEST_BUCKETS
+)
+stage_duration = Histogram(
+    "stage_duration_seconds", "Latency of internal processing stages.", ("stage",), STAGE_BUCKETS
+)
+
+
+class stage:
+    """内部処理の時間を記録するコンテキストマネージャ（例: with metrics.stage("calculation"): ...）"""
+    __slots__ = ("labels", "started")
+
+    def __init__(self, name: str):
+        self.labels = (name,)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        stage_duration.observe(self.labels, time.perf_counter() - self.started)
+
+
+class MetricsMiddleware:
+    """リクエスト数・ステータス・処理時間をルートのテンプレートごとに記録するASGIミドルウェア"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # ルーティングで一致したルートはscopeに設定される（パスパラメータを含まないテンプレートを使う）
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or UNMATCHED_ROUTE
+            method = scope["method"]
+            requests_total.inc((method, route_path, str(status_code)))
+            request_duration.observe((method, route_path), time.perf_counter() - started)
+
+
+def instrument_sessions(session_class):
+    """セッションのコミットにかかった時間を db_commit として記録する"""
+    @event.listens_for(session_class, "before_commit")
+    def _before_commit(session):
+        session.info["metrics_commit_started"] = time.perf_counter()
+
+    @event.listens_for(session_class, "after_commit")
+    def _after_commit(session):
+        started = session.info.pop("metrics_commit_started", None)
+        if started is not None:
+            stage_duration.observe(("db_commit",), time.perf_counter() - started)
+
+    @event.listens_for(session_class, "after_rollback")
+    def _after_rollback(session):
+        session.info.pop("metrics_commit_started", None)
+
+
+def render() -> str:
+    """全メトリクスをPrometheusのテキスト形式で出力"""
+    lines = []
+    for metric in (requests_total, request_duration, stage_duration):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
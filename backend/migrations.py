@@ -0,0 +1,182 @@
+"""
+データベースのスキーマ管理（バージョン付きマイグレーション）
+
+適用済みのバージョンは schema_version テーブルに記録し、未適用のものだけを順番に実行する。
+各ステップは既存のテーブル・列・インデックスを確認してから変更するため、
+create_all で作成済みの既存DBに対して実行しても安全。
+
+    python manage.py migrate       # 未適用のマイグレーションを実行
+    python manage.py version       # 現在のバージョンと未適用のマイグレーションを表示
+
+新しいステップは MIGRATIONS の末尾に (バージョン, 説明, 関数) を追加する。
+"""
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.exc import IntegrityError
+
+import analytics
+import crud
+import models
+import search
+from database import Base
+
+_version_metadata = MetaData()
+schema_version = Table(
+    "schema_version",
+    _version_metadata,
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("name", String(200), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def _columns(connection, table: str) -> set:
+    return {c["name"] for c in inspect(connection).get_columns(table)}
+
+
+def _add_column(connection, table: str, column_name: str):
+    """モデルの定義に合わせて列を追加（既にある場合は何もしない）"""
+    if column_name in _columns(connection, table):
+        return
+    column = Base.metadata.tables[table].c[column_name]
+    column_type = column.type.compile(dialect=connection.dialect)
+    ddl = f"ALTER TABLE {table} ADD COLUMN {column_name} {column_type}"
+    if connection.dialect.name == "sqlite":
+        # SQLiteは制約だけを後から追加できないため、列の定義に含める
+        for fk in column.foreign_keys:
+            ddl += f" REFERENCES {fk.column.table.name}({fk.column.name})"
+        connection.execute(text(ddl))
+        return
+    connection.execute(text(ddl))
+    for fk in column.foreign_keys:
+        connection.execute(text(
+            f"ALTER TABLE {table} ADD FOREIGN KEY ({column_name}) "
+            f"REFERENCES {fk.column.table.name}({fk.column.name})"
+        ))
+
+
+def _create_indexes(connection, table: str):
+    """モデルに定義されたインデックスのうち、未作成のものを作成
+
+    列がまだない（後のマイグレーションで追加する）インデックスはその時に作成する。
+    """
+    inspector = inspect(connection)
+    existing = {index["name"] for index in inspector.get_indexes(table)}
+    columns = {column["name"] for column in inspector.get_columns(table)}
+    for index in Base.metadata.tables[table].indexes:
+        if index.name not in existing and {column.name for column in index.columns} <= columns:
+            index.create(connection)
+
+
+def _baseline(connection):
+    # users・business_plans がない新しいDBでは、現在のモデルの定義で作成する
+    Base.metadata.create_all(connection, tables=[models.User.__table__, models.BusinessPlan.__table__])
+
+
+def _plan_extended_column(connection):
+    _add_column(connection, "business_plans", "extended")
+
+
+def _plan_user_and_pagination(connection):
+    _add_column(connection, "business_plans", "user_id")
+    _create_indexes(connection, "business_plans")
+
+
+def _plan_stats(connection):
+    # 集計テーブルを作成し、既存のプランから集計値を作る
+    Base.metadata.create_all(connection, tables=[models.PlanStat.__table__, models.PlanStatBucket.__table__])
+    analytics.rebuild(connection)
+
+
+def _plan_input_hash(connection):
+    # 既存のプランはハッシュを持たないため、再送信の判定はこれから保存するプランだけが対象になる
+    _add_column(connection, "business_plans", "input_hash")
+    _add_column(connection, "business_plans", "idempotency_key")
+    _create_indexes(connection, "business_plans")
+
+
+def _plan_search(connection):
+    # 全文検索のインデックスを作成し、既存のプランを登録する（対応していないDBでは何もしない）
+    search.create_index(connection)
+
+
+def _plan_fill_extended(connection):
+    # extended列の追加前のプランは拡張フィールドを持たないため、ここで計算して保存する（読み込み時には保存しない）
+    crud.fill_missing_extended(connection)
+
+
+def _plan_anonymous_idempotency_key(connection):
+    # 未ログインのIdempotency-Keyを別の列に写してから一意制約を作成する
+    # （一意制約がなかった間に同じキーで保存されたプランは、最初の1件だけに設定する）
+    _add_column(connection, "business_plans", "anonymous_idempotency_key")
+    plans = models.BusinessPlan.__table__
+    seen = set()
+    rows = connection.execute(
+        select(plans.c.id, plans.c.idempotency_key)
+        .where(plans.c.user_id.is_(None), plans.c.idempotency_key.is_not(None),
+               plans.c.anonymous_idempotency_key.is_(None))
+        .order_by(plans.c.id)
+    ).all()
+    for row in rows:
+        if row.idempotency_key in seen:
+            continue
+        seen.add(row.idempotency_key)
+        connection.execute(
+            plans.update().where(plans.c.id == row.id).values(anonymous_idempotency_key=row.idempotency_key)
+        )
+    _create_indexes(connection, "business_plans")
+
+
+MIGRATIONS = [
+    (1, "create users and business_plans", _baseline),
+    (2, "add business_plans.extended", _plan_extended_column),
+    (3, "add business_plans.user_id and pagination indexes", _plan_user_and_pagination),
+    (4, "create plan_stats and plan_stat_buckets", _plan_stats),
+    (5, "add business_plans.input_hash and idempotency_key", _plan_input_hash),
+    (6, "create full-text search index on business_plans", _plan_search),
+    (7, "fill business_plans.extended for existing plans", _plan_fill_extended),
+    (8, "add business_plans.anonymous_idempotency_key", _plan_anonymous_idempotency_key),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def applied_versions(connection) -> set:
+    if not inspect(connection).has_table(schema_version.name):
+        return set()
+    return set(connection.execute(select(schema_version.c.version)).scalars())
+
+
+def current_version(engine) -> int:
+    """適用済みの最新バージョン（未適用の場合は0）"""
+    with engine.connect() as connection:
+        return max(applied_versions(connection), default=0)
+
+
+def pending(engine) -> list:
+    with engine.connect() as connection:
+        applied = applied_versions(connection)
+    return [(version, name) for version, name, _ in MIGRATIONS if version not in applied]
+
+
+def migrate(engine, log=print) -> list:
+    """未適用のマイグレーションを順番に実行し、適用したバージョンのリストを返す"""
+    with engine.begin() as connection:
+        _version_metadata.create_all(connection)
+    applied_now = []
+    for version, name, step in MIGRATIONS:
+        with engine.begin() as connection:
+            if version in applied_versions(connection):
+                continue
+            step(connection)
+            try:
+                connection.execute(schema_version.insert().values(
+                    version=version, name=name, applied_at=datetime.utcnow()
+                ))
+            except IntegrityError:
+                # 別のプロセスが同時に適用した場合（各ステップは再実行しても安全）
+                continue
+        applied_now.append(version)
+        if log:
+            log(f"applied migration {version}: {name}")
+    return applied_now
@@ -1,11 +1,40 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Float, Double, DateTime, Text, JSON, ForeignKey, Index
 from sqlalchemy.sql import func
 from database import Base
 
+# calculate_business_plan の出力のうち、extended列にまとめて保存する項目
+EXTENDED_FIELDS = (
+    'catch_copy',
+    'target_audience',
+    'menu_examples',
+    'sns_strategy',
+    'staff_count',
+    'peak_operation',
+    'initial_investment',
+    'opening_cost',
+    'funding_methods',
+    'seat_occupancy_rate',
+)
+
+def _extended_field(name: str):
+    """extended列の項目を属性として読めるようにする（BusinessPlanOutputへの変換用）"""
+    return property(lambda self: (self.extended or {}).get(name))
+
 class BusinessPlan(Base):
     __tablename__ = "business_plans"
+    __table_args__ = (
+        # 一覧取得のキーセットページネーション用（created_at, idの降順で辿る）
+        Index("ix_business_plans_user_created", "user_id", "created_at", "id"),
+        Index("ix_business_plans_created", "created_at", "id"),
+        # 同じ入力の再送信の検出用
+        Index("ix_business_plans_input_hash", "input_hash", "created_at"),
+        Index("uq_business_plans_user_idempotency_key", "user_id", "idempotency_key", unique=True),
+        Index("uq_business_plans_anonymous_idempotency_key", "anonymous_idempotency_key", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     type = Column(String(50), nullable=False)
     seats = Column(Integer, nullable=False)
     atv = Column(Integer, nullable=False)
@@ -25,8 +54,53 @@ class BusinessPlan(Base):
     
     concept = Column(Text)
     action = Column(Text)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # 拡張フィールド（キャッチコピー、メニュー例、初期投資など）
+    extended = Column(JSON)
+    # 正規化した入力・ユーザー・収支モデルのバージョンのSHA-256（crud.plan_input_hash）
+    input_hash = Column(String(64))
+    # クライアントが指定したIdempotency-Keyヘッダーの値
+    idempotency_key = Column(String(255))
+    # 未ログインの場合のIdempotency-Key（user_idがNULLの行は上の一意制約で区別されないため、この列で一意にする）
+    anonymous_idempotency_key = Column(String(255))
+    # カーソルとの比較で精度がそろうよう、アプリ側でも作成日時を設定する
+    created_at = Column(DateTime(timezone=True), default=datetime.utcnow, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    catch_copy = _extended_field('catch_copy')
+    target_audience = _extended_field('target_audience')
+    menu_examples = _extended_field('menu_examples')
+    sns_strategy = _extended_field('sns_strategy')
+    staff_count = _extended_field('staff_count')
+    peak_operation = _extended_field('peak_operation')
+    initial_investment = _extended_field('initial_investment')
+    opening_cost = _extended_field('opening_cost')
+    funding_methods = _extended_field('funding_methods')
+    seat_occupancy_rate = _extended_field('seat_occupancy_rate')
+
+
+class PlanStat(Base):
+    """業態・エリア・指標ごとの集計値（プランの保存時に加算する。analytics.py を参照）"""
+    __tablename__ = "plan_stats"
+    
+    type = Column(String(50), primary_key=True)
+    area = Column(String(50), primary_key=True)
+    metric = Column(String(50), primary_key=True)
+    value_count = Column(Integer, nullable=False)
+    value_sum = Column(Double, nullable=False)
+    value_sum_sq = Column(Double, nullable=False)
+    value_min = Column(Double, nullable=False)
+    value_max = Column(Double, nullable=False)
+
+
+class PlanStatBucket(Base):
+    """パーセンタイル推定用のヒストグラム（対数スケールのバケットごとの件数）"""
+    __tablename__ = "plan_stat_buckets"
+    
+    type = Column(String(50), primary_key=True)
+    area = Column(String(50), primary_key=True)
+    metric = Column(String(50), primary_key=True)
+    bucket = Column(Integer, primary_key=True, autoincrement=False)
+    value_count = Column(Integer, nullable=False)
 
 
 class User(Base):
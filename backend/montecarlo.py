@@ -0,0 +1,177 @@
+"""
+事業計画のモンテカルロ・リスク分析
+
+回転数・客単価・原価率・人件費率を指定した分布からサンプリングし、
+月間営業利益の分布と投資回収月数の分布を求める。
+
+試行はCHUNK_SIZEごとのチャンクに分け、SeedSequenceから派生させた乱数で
+チャンク単位に計算する。チャンクの分け方はワーカー数に依存しないため、
+同じseedであればプロセスプールの有無にかかわらず同じ結果になる。
+"""
+import math
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import crud
+import simulation
+from config import settings
+
+CHUNK_SIZE = 250000
+PAYBACK_HORIZON_MONTHS = 120  # 回収月数ヒストグラムの上限（これを超えるものは回収不能扱い）
+NORMAL_TAIL_SIGMAS = 10  # 上限（high）のない正規分布は mean + この倍数 × std で打ち切る
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def sample_distribution(rng: np.random.Generator, spec: dict, size: int) -> np.ndarray:
+    """分布指定（dict）に従って乱数を生成"""
+    dist = spec['dist']
+    if dist == 'fixed':
+        values = np.full(size, spec['value'], dtype=np.float64)
+    elif dist == 'uniform':
+        values = rng.uniform(spec['low'], spec['high'], size)
+    elif dist == 'normal':
+        values = rng.normal(spec['mean'], spec['std'], size)
+    elif dist == 'triangular':
+        values = rng.triangular(spec['low'], spec['mode'], spec['high'], size)
+    else:
+        raise ValueError(f"未対応の分布です: {dist}")
+    # 正規分布などの裾を指定範囲に収める
+    if spec.get('low') is not None or spec.get('high') is not None:
+        values = np.clip(values, spec.get('low'), spec.get('high'))
+    return values
+
+
+def upper_bound(spec: dict) -> float:
+    """分布から生成する値の上限（simulate_chunk はこの値で打ち切る）"""
+    if spec.get('high') is not None:
+        return spec['high']
+    if spec['dist'] == 'fixed':
+        return spec['value']
+    return spec['mean'] + NORMAL_TAIL_SIGMAS * spec['std']
+
+
+def exceeds_exact_range(seats: int, specs: dict) -> bool:
+    """回転数・客単価の上限での売上が、整数の配列で正確に計算できる範囲（MAX_EXACT_VALUE）を超えるか"""
+    max_turnover, max_atv = upper_bound(specs['turnover']), upper_bound(specs['atv'])
+    if not (math.isfinite(max_turnover) and math.isfinite(max_atv)):
+        return True
+    return simulation.sweep_exceeds_exact_range(seats, round(max(max_atv, 0)), max(max_turnover, 0.0))
+
+
+def simulate_chunk(seed_seq: np.random.SeedSequence, size: int, seats: int, opening_cost: int, specs: dict) -> tuple:
+    """1チャンク分の試行を計算し、(営業利益の配列, 回収月数ヒストグラム) を返す"""
+    rng = np.random.default_rng(seed_seq)
+    # 上限は exceeds_exact_range で確認済みの値（int64の売上・利益があふれないようにする）
+    turnover = np.clip(sample_distribution(rng, specs['turnover'], size), 0.0, upper_bound(specs['turnover']))
+    atv = np.clip(np.round(sample_distribution(rng, specs['atv'], size)), 0, upper_bound(specs['atv'])).astype(np.int64)
+    cogs_rate = np.clip(sample_distribution(rng, specs['cogs_rate'], size), 0.0, 1.0)
+    labor_rate = np.clip(sample_distribution(rng, specs['labor_rate'], size), 0.0, 1.0)
+
+    daily_guests = np.round(seats * turnover * crud.GUEST_RATE).astype(np.int64)
+    monthly_sales = atv * daily_guests * crud.BUSINESS_DAYS
+    cogs = np.round(monthly_sales * cogs_rate).astype(np.int64)
+    labor_cost = np.round(monthly_sales * labor_rate).astype(np.int64)
+    op_income = monthly_sales - cogs - labor_cost - crud.FIXED_COST
+
+    # 開業費を月間営業利益で割った月数（切り上げ）。赤字や上限超えは最後のビンに入れる
+    payback = np.full(size, PAYBACK_HORIZON_MONTHS + 1, dtype=np.int64)
+    profitable = op_income > 0
+    payback[profitable] = np.minimum(
+        np.ceil(opening_cost / op_income[profitable]).astype(np.int64),
+        PAYBACK_HORIZON_MONTHS + 1
+    )
+    histogram = np.bincount(payback, minlength=PAYBACK_HORIZON_MONTHS + 2)
+    return op_income, histogram
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=settings.montecarlo_workers)
+        return _pool
+
+
+def shutdown_pool():
+    """プロセスプールを停止（アプリ終了時に呼ぶ）"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+
+def run_simulation(
+    type: str,
+    seats: int,
+    draws: int,
+    specs: dict,
+    seed: int,
+    percentiles: list,
+    workers: int = None
+) -> dict:
+    """モンテカルロ試行を実行し、集計結果を返す"""
+    if workers is None:
+        workers = settings.montecarlo_workers
+    opening_cost = crud.calculate_opening_cost(crud.calculate_initial_investment(seats, type))
+
+    sizes = [CHUNK_SIZE] * (draws // CHUNK_SIZE)
+    if draws % CHUNK_SIZE:
+        sizes.append(draws % CHUNK_SIZE)
+    seed_seqs = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    if workers > 1 and len(sizes) > 1:
+        pool = _get_pool()
+        futures = [
+            pool.submit(simulate_chunk, seed_seq, size, seats, opening_cost, specs)
+            for seed_seq, size in zip(seed_seqs, sizes)
+        ]
+        chunks = [future.result() for future in futures]
+    else:
+        chunks = [
+            simulate_chunk(seed_seq, size, seats, opening_cost, specs)
+            for seed_seq, size in zip(seed_seqs, sizes)
+        ]
+
+    op_income = np.concatenate([chunk[0] for chunk in chunks])
+    histogram = np.sum([chunk[1] for chunk in chunks], axis=0)
+
+    return {
+        'draws': draws,
+        'seed': seed,
+        'opening_cost': opening_cost,
+        'op_income': {
+            'mean': float(op_income.mean()),
+            'std': float(op_income.std()),
+            'min': int(op_income.min()),
+            'max': int(op_income.max()),
+            'percentiles': {
+                f'p{p:g}': float(v) for p, v in zip(percentiles, np.percentile(op_income, percentiles))
+            }
+        },
+        'probability_of_loss': float(np.count_nonzero(op_income < 0) / draws),
+        'payback_histogram': {
+            'months': list(range(1, PAYBACK_HORIZON_MONTHS + 1)),
+            'counts': histogram[1:PAYBACK_HORIZON_MONTHS + 1].tolist(),
+            'beyond_horizon': int(histogram[PAYBACK_HORIZON_MONTHS + 1])
+        }
+    }
+
+
+def default_specs(type: str, atv: int) -> dict:
+    """分布が指定されなかった変数の既定値（決定論モデルと同じ固定値）"""
+    return {
+        'turnover': {'dist': 'fixed', 'value': crud.BASE_TURNOVER},
+        'atv': {'dist': 'fixed', 'value': atv},
+        'cogs_rate': {'dist': 'fixed', 'value': crud.get_cogs_rate(type)},
+        'labor_rate': {'dist': 'fixed', 'value': crud.LABOR_RATE}
+    }
+
+
+def new_seed() -> int:
+    """seed未指定時に使う乱数シード（結果の再現用にレスポンスへ含める）"""
+    return int(np.random.SeedSequence().entropy % (2 ** 63))
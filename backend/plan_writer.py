@@ -0,0 +1,152 @@
+"""
+プラン保存のグループコミット
+
+PLAN_WRITE_DURABILITY=group_commit の場合、プランの保存はキューに入れ、
+書き込みスレッドが最大 plan_write_batch_size 件、または最初の1件から
+plan_write_max_delay_ms ミリ秒たった時点でまとめて1トランザクションでコミットする。
+リクエストはコミット後に採番されたIDを受け取るため、応答した時点で保存は完了している。
+
+キューが上限に達した場合は待たずに PlanWriterBusy を送出する（APIは503を返す）。
+stop() は受け付け済みの保存をすべてコミットしてから書き込みスレッドを止める。
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import crud
+from config import settings
+from database import SessionLocal
+
+DURABILITY_MODES = ('sync', 'group_commit')
+
+_STOP = object()
+
+
+class PlanWriterBusy(Exception):
+    """保存待ちのキューが上限に達している"""
+
+
+class PlanWriter:
+    def __init__(self, session_factory, batch_size: int, max_delay: float, queue_limit: int):
+        """max_delay: 1回のコミットにまとめるために待つ最大時間（秒）"""
+        self._session_factory = session_factory
+        self.batch_size = max(1, batch_size)
+        self.max_delay = max_delay
+        self._queue = queue.Queue(maxsize=queue_limit)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.rows = 0
+        self.largest_batch = 0
+        self.rejected = 0
+        self.failed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.plan_write_durability == 'group_commit'
+
+    def submit(self, row: dict) -> Future:
+        """保存するプランの列（dict）をキューに入れ、採番されたIDを返すFutureを返す"""
+        future = Future()
+        with self._lock:
+            if self._thread is None:
+                # 最初の保存時に書き込みスレッドを起動する（停止後も再度起動できる）
+                self._thread = threading.Thread(target=self._run, name="plan-writer", daemon=True)
+                self._thread.start()
+            try:
+                self._queue.put_nowait((row, future))
+            except queue.Full:
+                self.rejected += 1
+                raise PlanWriterBusy()
+        return future
+
+    def stop(self, timeout: float = None):
+        """キューに残っている保存をすべてコミットしてから書き込みスレッドを止める"""
+        with self._lock:
+            if self._thread is None:
+                return
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            stopping = False
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                self._flush(batch)
+            except Exception as e:
+                # DBに接続できない場合なども、待っているリクエストには必ず結果を返す
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            if stopping:
+                return
+
+    def _flush(self, batch: list):
+        # 応答を待たずに取り消されたリクエストの分は保存しない
+        batch = [(row, future) for row, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        db = self._session_factory()
+        try:
+            try:
+                plan_ids = crud.insert_plans(db, [row for row, _ in batch])
+                db.commit()
+            except Exception:
+                db.rollback()
+                # 1件の不正なデータで他のリクエストが失敗しないよう、1件ずつ保存し直す
+                for row, future in batch:
+                    try:
+                        plan_id = crud.insert_plans(db, [row])[0]
+                        db.commit()
+                    except Exception as e:
+                        db.rollback()
+                        self.failed += 1
+                        future.set_exception(e)
+                    else:
+                        future.set_result(plan_id)
+            else:
+                for (_, future), plan_id in zip(batch, plan_ids):
+                    future.set_result(plan_id)
+        finally:
+            db.close()
+        self.batches += 1
+        self.rows += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+
+    def stats(self) -> dict:
+        return {
+            'durability': settings.plan_write_durability,
+            'queued': self._queue.qsize(),
+            'queue_limit': self._queue.maxsize,
+            'batches': self.batches,
+            'rows': self.rows,
+            'largest_batch': self.largest_batch,
+            'average_batch': self.rows / self.batches if self.batches else 0.0,
+            'rejected': self.rejected,
+            'failed': self.failed
+        }
+
+
+plan_writer = PlanWriter(
+    SessionLocal,
+    settings.plan_write_batch_size,
+    settings.plan_write_max_delay_ms / 1000,
+    settings.plan_write_queue_limit
+)
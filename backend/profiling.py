@@ -0,0 +1,210 @@
+"""
+リクエスト単位のサンプリングプロファイラ
+
+X-Profile: 1 ヘッダー（管理用トークンが必要）を付けたリクエスト、または
+profile_sample_rate の確率で選ばれたリクエストについて、処理中のスタックを
+profile_interval_ms ごとに記録し、speedscope形式（https://www.speedscope.app/）のJSONとして保存する。
+
+サンプリングは別スレッドから sys._current_frames() を読むだけなので、対象のリクエストの
+処理にはフックを入れない。同期エンドポイントはワーカースレッドで動くため、
+イベントループを含む全スレッドのうち、待機中ではないスレッドのスタックをスレッドごとに記録する
+（同時に処理中の他のリクエストのスタックが含まれることがある）。
+同時に記録するのは1リクエストだけで、保存するファイル数は profile_max_files 件までに制限する。
+"""
+import json
+import random
+import re
+import secrets
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import anyio
+
+from auth.dependencies import admin_token_valid
+from config import settings
+
+PROFILE_HEADER = b"x-profile"
+ADMIN_HEADER = b"x-admin-token"
+# 記録したリクエストのレスポンスに付けるヘッダー（保存したファイル名に含まれるID）
+PROFILE_ID_HEADER = b"x-profile-id"
+PROFILE_SUFFIX = ".speedscope.json"
+# 保存したプロファイル名（ダウンロード時のパスの検証にも使う）
+PROFILE_NAME = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}-[A-Za-z0-9_.-]+\.speedscope\.json$")
+
+# 待機中のスレッドとみなす最も内側のフレーム（ワーカーの待ち受け、イベントループのselectなど）
+_IDLE_FILES = ("threading.py", "selectors.py", "queue.py")
+
+_capture_lock = threading.Lock()
+
+
+def profile_dir() -> Path:
+    return Path(settings.profile_dir) if settings.profile_dir else Path(tempfile.gettempdir()) / "omise-ai-profiles"
+
+
+def _is_idle(frame) -> bool:
+    return frame.f_code.co_filename.endswith(_IDLE_FILES)
+
+
+class Sampler:
+    """別スレッドから定期的に全スレッドのスタックを記録する"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.frames = []  # speedscopeのフレーム定義
+        self._frame_index = {}
+        self.samples = {}  # スレッドID -> [(経過時間, フレーム番号のリスト（外側から内側）)]
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self) -> float:
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+        return self.duration
+
+    def _frame_id(self, code) -> int:
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        index = self._frame_index.get(key)
+        if index is None:
+            index = self._frame_index[key] = len(self.frames)
+            self.frames.append({"name": code.co_name, "file": code.co_filename, "line": code.co_firstlineno})
+        return index
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            elapsed = time.perf_counter() - self.started
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or _is_idle(frame):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_id(frame.f_code))
+                    frame = frame.f_back
+                stack.reverse()
+                self.samples.setdefault(thread_id, []).append((elapsed, stack))
+
+    def to_speedscope(self, name: str) -> dict:
+        """speedscopeのsampled形式に変換（重みは直前のサンプルからの経過ミリ秒）"""
+        thread_names = {t.ident: t.name for t in threading.enumerate()}
+        profiles = []
+        for thread_id, samples in self.samples.items():
+            weights = []
+            previous = 0.0
+            for elapsed, _ in samples:
+                weights.append(round((elapsed - previous) * 1000, 3))
+                previous = elapsed
+            profiles.append({
+                "type": "sampled",
+                "name": thread_names.get(thread_id, f"thread-{thread_id}"),
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": round(self.duration * 1000, 3),
+                "samples": [stack for _, stack in samples],
+                "weights": weights
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "omise-ai",
+            "shared": {"frames": self.frames},
+            "profiles": profiles
+        }
+
+
+def save_profile(name: str, data: dict):
+    """プロファイルを保存し、上限を超えた古いファイルを削除する"""
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / name).write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    for old in list_profiles()[settings.profile_max_files:]:
+        (directory / old["name"]).unlink(missing_ok=True)
+
+
+def list_profiles() -> list:
+    """保存済みのプロファイル（新しい順）"""
+    directory = profile_dir()
+    if not directory.is_dir():
+        return []
+    profiles = []
+    for path in directory.iterdir():
+        if PROFILE_NAME.match(path.name):
+            stat = path.stat()
+            profiles.append({"name": path.name, "size": stat.st_size, "created_at": stat.st_mtime})
+    profiles.sort(key=lambda p: p["name"], reverse=True)
+    return profiles
+
+
+def profile_path(name: str) -> Path:
+    """保存済みのプロファイルのパス（名前が不正・存在しない場合はNone）"""
+    if not PROFILE_NAME.match(name):
+        return None
+    path = profile_dir() / name
+    return path if path.is_file() else None
+
+
+def _requested_by_admin(headers: list) -> bool:
+    values = dict(headers)
+    if values.get(PROFILE_HEADER) != b"1":
+        return False
+    return admin_token_valid(values.get(ADMIN_HEADER, b"").decode("latin-1"))
+
+
+def _profile_name(scope: dict, started_at: datetime, profile_id: str) -> str:
+    route = scope.get("route")
+    label = getattr(route, "path", None) or scope["path"]
+    label = re.sub(r"[^A-Za-z0-9_.-]+", "_", f"{scope['method']}{label}").strip("_")[:80] or "request"
+    return f"{started_at:%Y%m%dT%H%M%S}-{profile_id}-{label}{PROFILE_SUFFIX}"
+
+
+class ProfilingMiddleware:
+    """対象のリクエストの処理中だけサンプリングプロファイラを動かすASGIミドルウェア"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+        # 他のリクエストを記録中の場合は記録しない
+        if not _capture_lock.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+        try:
+            started_at = datetime.utcnow()
+            profile_id = secrets.token_hex(4)
+
+            async def send_with_profile_id(message):
+                if message["type"] == "http.response.start":
+                    message = dict(message, headers=list(message.get("headers", [])) + [
+                        (PROFILE_ID_HEADER, profile_id.encode("ascii"))
+                    ])
+                await send(message)
+
+            sampler = Sampler(settings.profile_interval_ms / 1000)
+            sampler.start()
+            try:
+                await self.app(scope, receive, send_with_profile_id)
+            finally:
+                duration = sampler.stop()
+            # ルートはルーティング後にscopeへ設定されるため、ファイル名は処理の後に決める
+            name = _profile_name(scope, started_at, profile_id)
+            data = sampler.to_speedscope(f"{scope['method']} {scope['path']} ({duration * 1000:.1f} ms)")
+            await anyio.to_thread.run_sync(save_profile, name, data)
+        finally:
+            _capture_lock.release()
+
+    def _should_profile(self, scope) -> bool:
+        if _requested_by_admin(scope["headers"]):
+            return True
+        rate = settings.profile_sample_rate
+        return rate > 0 and random.random() < rate
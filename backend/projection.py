@@ -0,0 +1,137 @@
+"""
+開業後の月次キャッシュフロー予測（NumPyでベクトル化）
+
+プランごとに HORIZON_MONTHS か月分の売上・営業利益・借入返済・資金残高を
+(プラン数, 月数) の配列でまとめて計算し、投資回収月と最低資金残高を求める。
+
+- 売上: 月商 × 立ち上がり係数（開業月 RAMP_START から RAMP_MONTHS か月で100%）× 季節係数
+- 営業利益: 売上 ×（1 − 原価率 − 人件費率）− 固定費（crud.calculate_business_plan と同じ前提値）
+- 借入: 開業費の loan_ratio を年利 loan_annual_rate・loan_term_months か月の元利均等返済で借りる
+- 資金残高: 運転資金 + 累計（営業利益 − 返済額）
+- 投資回収月: 累計（営業利益 − 支払利息）が開業費に達した最初の月（期間内に達しない場合はNone）
+"""
+import numpy as np
+
+import crud
+
+HORIZON_MONTHS = 60
+RAMP_START = 0.6  # 開業月の売上（計画の月商に対する割合）
+RAMP_MONTHS = 6  # 計画の月商に達するまでの月数
+# 1月〜12月の季節係数（平均1.0、2月・8月の閑散期と12月の繁忙期）
+SEASONALITY = (0.90, 0.85, 1.00, 1.00, 1.05, 0.95, 1.00, 1.05, 0.95, 1.00, 1.05, 1.20)
+START_MONTH = 4  # 開業月（1〜12）
+LOAN_RATIO = 0.5  # 開業費のうち借入でまかなう割合
+LOAN_ANNUAL_RATE = 0.02  # 借入の年利
+LOAN_TERM_MONTHS = 60  # 返済期間（月）
+
+ARRAY_FIELDS = ('sales', 'op_income', 'loan_payment', 'net_cash_flow', 'cash_balance', 'cumulative_cash')
+
+
+def opening_costs_for(seats, types) -> np.ndarray:
+    """席数・業態の配列から開業費（crud.calculate_opening_cost と同じ値）の配列を作成"""
+    multipliers = np.array([crud.get_investment_multiplier(t) for t in types], dtype=np.float64)
+    seats = np.asarray(seats, dtype=np.float64)
+    # int() と同じく小数点以下を切り捨てる（値は常に正）
+    initial = np.floor((crud.INVESTMENT_BASE_COST + seats * crud.INVESTMENT_SEAT_COST) * multipliers)
+    return initial.astype(np.int64) + crud.WORKING_CAPITAL
+
+
+def sales_factors(horizon: int = HORIZON_MONTHS, start_month: int = START_MONTH) -> np.ndarray:
+    """月ごとの売上係数（立ち上がり × 季節）"""
+    months = np.arange(horizon)
+    ramp = RAMP_START + (1 - RAMP_START) * np.minimum(1.0, months / RAMP_MONTHS)
+    season = np.asarray(SEASONALITY)[(start_month - 1 + months) % 12]
+    return ramp * season
+
+
+def loan_schedule(principal, annual_rate: float, term_months: int, horizon: int = HORIZON_MONTHS) -> tuple:
+    """元利均等返済の (毎月の返済額, 支払利息) を (プラン数, 月数) の配列で返す"""
+    principal = np.asarray(principal, dtype=np.float64)[:, None]
+    months = np.arange(horizon)
+    active = months < term_months
+    rate = annual_rate / 12
+    if rate > 0:
+        payment = principal * rate / (1 - (1 + rate) ** -term_months)
+        growth = (1 + rate) ** months
+        # m か月目の返済前の残高
+        balance = principal * growth - payment * (growth - 1) / rate
+    else:
+        payment = principal / term_months
+        balance = principal - payment * months
+    return np.where(active, payment, 0.0), np.where(active, balance * rate, 0.0)
+
+
+def project_cash_flows(monthly_sales, cogs_rate, opening_cost, horizon: int = HORIZON_MONTHS,
+                       start_month: int = START_MONTH, loan_ratio: float = LOAN_RATIO,
+                       loan_annual_rate: float = LOAN_ANNUAL_RATE, loan_term_months: int = LOAN_TERM_MONTHS) -> dict:
+    """月商・原価率・開業費の配列（長さはプラン数）から月次キャッシュフローを一括計算
+
+    ARRAY_FIELDS の各配列は (プラン数, horizon) の形状（円、整数に丸める）。
+    payback_month は回収できない場合 -1、min_cash_month は最低資金残高の月（1始まり）。
+    """
+    monthly_sales = np.asarray(monthly_sales, dtype=np.float64)
+    cogs_rate = np.asarray(cogs_rate, dtype=np.float64)
+    opening_cost = np.asarray(opening_cost, dtype=np.float64)
+
+    sales = monthly_sales[:, None] * sales_factors(horizon, start_month)[None, :]
+    op_income = sales * (1 - cogs_rate[:, None] - crud.LABOR_RATE) - crud.FIXED_COST
+    loan_amount = np.round(opening_cost * loan_ratio)
+    loan_payment, interest = loan_schedule(loan_amount, loan_annual_rate, loan_term_months, horizon)
+    net_cash_flow = op_income - loan_payment
+    cash_balance = crud.WORKING_CAPITAL + np.cumsum(net_cash_flow, axis=1)
+    cumulative_cash = np.cumsum(op_income - interest, axis=1) - opening_cost[:, None]
+
+    recovered = cumulative_cash >= 0
+    payback_month = np.where(recovered.any(axis=1), recovered.argmax(axis=1) + 1, -1)
+    min_index = cash_balance.argmin(axis=1)
+    rows = np.arange(len(monthly_sales))
+
+    result = {name: np.round(values).astype(np.int64) for name, values in (
+        ('sales', sales), ('op_income', op_income), ('loan_payment', loan_payment),
+        ('net_cash_flow', net_cash_flow), ('cash_balance', cash_balance), ('cumulative_cash', cumulative_cash)
+    )}
+    result['loan_amount'] = loan_amount.astype(np.int64)
+    result['payback_month'] = payback_month
+    result['min_cash_balance'] = result['cash_balance'][rows, min_index]
+    result['min_cash_month'] = min_index + 1
+    return result
+
+
+def projection_dicts(arrays: dict) -> list:
+    """project_cash_flows の結果をプランごとのdict（CashFlowProjectionの形）のリストに変換"""
+    columns = {name: arrays[name].tolist() for name in (
+        'loan_amount', 'payback_month', 'min_cash_balance', 'min_cash_month', 'net_cash_flow', 'cash_balance'
+    )}
+    monthly_payment = arrays['loan_payment'][:, 0].tolist()
+    final_cash = arrays['cumulative_cash'][:, -1].tolist()
+    return [
+        {
+            'payback_month': payback if payback > 0 else None,
+            'min_cash_balance': min_cash,
+            'min_cash_month': min_month,
+            'cumulative_cash': final,
+            'loan_amount': loan,
+            'monthly_loan_payment': payment,
+            'net_cash_flow': net,
+            'cash_balance': balance
+        }
+        for payback, min_cash, min_month, final, loan, payment, net, balance in zip(
+            columns['payback_month'], columns['min_cash_balance'], columns['min_cash_month'], final_cash,
+            columns['loan_amount'], monthly_payment, columns['net_cash_flow'], columns['cash_balance']
+        )
+    ]
+
+
+def project_plans(seats, types, monthly_sales, cogs_rate, opening_cost=None, **options) -> list:
+    """プランの列（席数・業態・月商・原価率）からプランごとの予測dictのリストを返す"""
+    if len(monthly_sales) == 0:
+        return []
+    if opening_cost is None:
+        opening_cost = opening_costs_for(seats, types)
+    elif any(cost is None for cost in opening_cost):
+        # 保存済みの開業費がない行（extended列が未保存のプラン）は席数・業態から計算する
+        computed = opening_costs_for(seats, types)
+        opening_cost = np.array(
+            [computed[i] if cost is None else cost for i, cost in enumerate(opening_cost)], dtype=np.int64
+        )
+    return projection_dicts(project_cash_flows(monthly_sales, cogs_rate, opening_cost, **options))
@@ -1,6 +1,7 @@
-from pydantic import BaseModel, EmailStr, field_validator
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field, field_validator, model_validator
+from typing import Optional, List, Any, Literal
 from datetime import datetime
+import math
 
 class BusinessPlanInput(BaseModel):
     type: str
@@ -50,6 +51,224 @@ class BusinessPlanOutput(BaseModel):
         from_attributes = True
 
 
+# 月次キャッシュフロー予測関連のスキーマ（projection.py）
+class ProjectionOptions(BaseModel):
+    start_month: int = Field(4, ge=1, le=12)  # 開業月
+    loan_ratio: float = Field(0.5, ge=0, le=1)  # 開業費のうち借入でまかなう割合
+    loan_annual_rate: float = Field(0.02, ge=0, le=1)  # 借入の年利
+    loan_term_months: int = Field(60, ge=1, le=600)  # 返済期間（月）
+
+class CashFlowProjection(BaseModel):
+    payback_month: Optional[int]  # 投資回収月（予測期間内に回収できない場合はnull）
+    min_cash_balance: int  # 最低資金残高
+    min_cash_month: int  # 最低資金残高になる月
+    cumulative_cash: int  # 予測期間末の累計キャッシュフロー（開業費を差し引いた額）
+    loan_amount: int
+    monthly_loan_payment: int
+    net_cash_flow: List[int]  # 月ごとの営業利益 − 返済額
+    cash_balance: List[int]  # 月末の資金残高
+
+
+# 一括シミュレーション関連のスキーマ
+class BusinessPlanBatchInput(BaseModel):
+    # 1件ごとにエラーを返すため、要素の検証はエンドポイント側で行う
+    plans: List[Any]
+    persist: bool = False
+    projection: bool = False  # Trueで月次キャッシュフロー予測を含める
+    projection_options: ProjectionOptions = ProjectionOptions()
+
+class BusinessPlanBatchResult(BaseModel):
+    id: Optional[int] = None
+    type: str
+    seats: int
+    atv: int
+    hours: str
+    area: str
+    turnover: float
+    daily_guests: int
+    monthly_sales: int
+    cogs_rate: float
+    cogs: int
+    gross_profit: int
+    labor_cost: int
+    fixed_cost: int
+    op_income: int
+    payback_months: int
+    concept: Optional[str]
+    action: Optional[str]
+    projection: Optional[CashFlowProjection] = None
+
+class BusinessPlanBatchItem(BaseModel):
+    index: int
+    ok: bool
+    result: Optional[BusinessPlanBatchResult] = None
+    error: Optional[str] = None
+
+class BusinessPlanBatchOutput(BaseModel):
+    items: List[BusinessPlanBatchItem]
+    succeeded: int
+    failed: int
+
+
+# 感度分析（グリッドスイープ）関連のスキーマ
+MAX_SWEEP_AXIS_SIZE = 10 ** 8  # 1軸の最大の値の数（セル数の上限とは別に、stepが極端に小さい場合を弾く）
+
+def float_range_size(start: float, stop: float, step: float) -> int:
+    """start〜stop（stopを含む）をstep刻みで展開した値の数（simulation.expand_range と同じ数）"""
+    steps = (stop - start) / step
+    if not math.isfinite(steps) or steps > MAX_SWEEP_AXIS_SIZE:
+        raise ValueError('stepが小さすぎます')
+    # 浮動小数点の誤差（0.2 / 0.1 = 1.999...）でstopちょうどの値を落とさないよう、わずかに切り上げる
+    return max(0, math.floor(steps + 1e-9)) + 1
+
+def _validate_sweep_range(r):
+    if r.step <= 0:
+        raise ValueError('stepは0より大きい値を指定してください')
+    if r.stop < r.start:
+        raise ValueError('stopはstart以上の値を指定してください')
+    return r
+
+class SweepIntRange(BaseModel):
+    start: int
+    stop: int
+    step: int = 1
+    
+    @model_validator(mode='after')
+    def validate_range(self):
+        return _validate_sweep_range(self)
+    
+    @property
+    def size(self) -> int:
+        return (self.stop - self.start) // self.step + 1
+
+class SweepFloatRange(BaseModel):
+    start: float
+    stop: float
+    step: float
+    
+    @model_validator(mode='after')
+    def validate_range(self):
+        if not all(math.isfinite(v) for v in (self.start, self.stop, self.step)):
+            raise ValueError('start・stop・stepには有限の値を指定してください')
+        _validate_sweep_range(self)
+        float_range_size(self.start, self.stop, self.step)
+        return self
+    
+    @property
+    def size(self) -> int:
+        return float_range_size(self.start, self.stop, self.step)
+
+class PlanSweepInput(BaseModel):
+    type: str
+    area: str
+    seats: SweepIntRange
+    atv: SweepIntRange
+    # 未指定の場合は標準の回転数・業態ごとの原価率を使う
+    turnover: Optional[SweepFloatRange] = None
+    cogs_rate: Optional[SweepFloatRange] = None
+    fields: List[str] = ['op_income', 'payback_months']
+    format: Literal['json', 'npz'] = 'json'
+
+
+# 損益分岐・目標利益の逆算関連のスキーマ（solver.py）
+class PlanSolveInput(BaseModel):
+    type: str
+    area: str
+    solve_for: Literal['seats', 'atv', 'turnover']
+    # solve_for 以外の値（turnoverの既定は標準の回転数）
+    seats: Optional[int] = Field(None, ge=1, le=10000)
+    atv: Optional[int] = Field(None, ge=1, le=1000000)
+    turnover: Optional[float] = Field(None, gt=0, le=20)
+    target_op_income: List[int] = []  # 目標の月間営業利益（円）
+    target_payback_months: List[int] = []  # 目標の投資回収月数
+    
+    @model_validator(mode='after')
+    def validate_targets(self):
+        if any(abs(t) > 10 ** 12 for t in self.target_op_income):
+            raise ValueError('目標の営業利益が大きすぎます')
+        if any(not 1 <= t <= 1200 for t in self.target_payback_months):
+            raise ValueError('目標の回収月数は1〜1200か月で指定してください')
+        return self
+
+class PlanSolveResult(BaseModel):
+    target_type: Literal['op_income', 'payback_months']
+    target: int
+    feasible: bool  # 探索範囲内で目標を達成できるかどうか
+    seats: Optional[int]
+    atv: Optional[int]
+    turnover: Optional[float]
+    daily_guests: Optional[int]
+    monthly_sales: Optional[int]
+    op_income: Optional[int]
+    opening_cost: Optional[int]
+    payback_months: Optional[int]
+
+class PlanSolveOutput(BaseModel):
+    solve_for: str
+    results: List[PlanSolveResult]
+
+
+# モンテカルロ・リスク分析関連のスキーマ
+class DistributionSpec(BaseModel):
+    dist: Literal['fixed', 'uniform', 'normal', 'triangular']
+    value: Optional[float] = None  # fixed
+    low: Optional[float] = None  # uniform / triangular（normalでは下限クリップ）
+    high: Optional[float] = None  # uniform / triangular（normalでは上限クリップ）
+    mode: Optional[float] = None  # triangular
+    mean: Optional[float] = None  # normal
+    std: Optional[float] = None  # normal
+    
+    @model_validator(mode='after')
+    def validate_params(self):
+        if self.dist == 'fixed' and self.value is None:
+            raise ValueError('fixed分布にはvalueが必要です')
+        if self.dist in ('uniform', 'triangular'):
+            if self.low is None or self.high is None or self.low > self.high:
+                raise ValueError(f'{self.dist}分布には low <= high となるlowとhighが必要です')
+        if self.dist == 'triangular' and (self.mode is None or not self.low <= self.mode <= self.high):
+            raise ValueError('triangular分布には low <= mode <= high となるmodeが必要です')
+        if self.dist == 'normal' and (self.mean is None or self.std is None or self.std < 0):
+            raise ValueError('normal分布にはmeanと0以上のstdが必要です')
+        return self
+
+class MonteCarloDistributions(BaseModel):
+    # 未指定の変数は決定論モデルと同じ固定値を使う
+    turnover: Optional[DistributionSpec] = None
+    atv: Optional[DistributionSpec] = None
+    cogs_rate: Optional[DistributionSpec] = None
+    labor_rate: Optional[DistributionSpec] = None
+
+class MonteCarloInput(BaseModel):
+    type: str
+    area: str
+    seats: int
+    atv: int
+    draws: int = 100000
+    seed: Optional[int] = None
+    percentiles: List[float] = [5, 25, 50, 75, 95]
+    distributions: MonteCarloDistributions = MonteCarloDistributions()
+
+class OpIncomeDistribution(BaseModel):
+    mean: float
+    std: float
+    min: int
+    max: int
+    percentiles: dict
+
+class PaybackHistogram(BaseModel):
+    months: List[int]
+    counts: List[int]
+    beyond_horizon: int
+
+class MonteCarloOutput(BaseModel):
+    draws: int
+    seed: int
+    opening_cost: int
+    op_income: OpIncomeDistribution
+    probability_of_loss: float
+    payback_histogram: PaybackHistogram
+
+
 # 認証関連のスキーマ
 class UserRegister(BaseModel):
     email: EmailStr
@@ -0,0 +1,180 @@
+"""
+プランの全文検索（業態・コンセプト・アクションの部分一致、管理者のサポート用）
+
+- SQLite: FTS5 の trigram トークナイザで外部コンテンツテーブル business_plans_fts を作成し、
+  business_plans のトリガー（追加・更新・削除）で同じトランザクション内に同期する。
+  スコアは bm25 を使う（符号を反転し、大きいほど一致度が高い）
+- MySQL: ngram パーサの FULLTEXT インデックス（InnoDBが自動で更新する）。スコアは MATCH ... AGAINST
+- その他のDB、またはインデックスがない場合: LIKE で検索する（全件走査、スコアは0）
+
+検索語は空白区切りのAND条件。trigram は3文字、ngram は ngram_token_size（既定2）文字未満の語を
+インデックスで検索できないため、短い語は LIKE で絞り込む（長い語と組み合わせればインデックスで候補を絞ってから判定する）。
+
+既存のプランの索引の作り直し:
+    python manage.py rebuild-search
+"""
+from sqlalchemy import inspect, select, text
+from sqlalchemy.exc import OperationalError
+
+import models
+
+SEARCH_COLUMNS = ('type', 'concept', 'action')
+MAX_TERMS = 10
+FTS_TABLE = "business_plans_fts"
+FULLTEXT_INDEX = "ft_business_plans_text"
+# インデックスで検索できる語の最小の文字数
+MIN_TERM_LENGTH = {'sqlite': 3, 'mysql': 2}
+
+_SQLITE_DDL = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        type, concept, action, content='business_plans', content_rowid='id', tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON business_plans BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, type, concept, action) VALUES (new.id, new.type, new.concept, new.action);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON business_plans BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, type, concept, action)
+        VALUES ('delete', old.id, old.type, old.concept, old.action);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF type, concept, action ON business_plans BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, type, concept, action)
+        VALUES ('delete', old.id, old.type, old.concept, old.action);
+        INSERT INTO {FTS_TABLE}(rowid, type, concept, action) VALUES (new.id, new.type, new.concept, new.action);
+    END""",
+)
+
+
+def _dialect(connection) -> str:
+    return connection.dialect.name
+
+
+def has_index(connection) -> bool:
+    """全文検索のインデックスが作成済みか"""
+    if _dialect(connection) == 'sqlite':
+        return connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+        ).first() is not None
+    if _dialect(connection) == 'mysql':
+        return any(index["name"] == FULLTEXT_INDEX for index in inspect(connection).get_indexes("business_plans"))
+    return False
+
+
+def create_index(connection) -> bool:
+    """全文検索のインデックスを作成し、既存のプランを索引に登録する（対応していないDBではFalse）"""
+    dialect = _dialect(connection)
+    if dialect == 'sqlite':
+        try:
+            for ddl in _SQLITE_DDL:
+                connection.execute(text(ddl))
+        except OperationalError as e:
+            # FTS5・trigramトークナイザ（SQLite 3.34以降）がない環境ではLIKEで検索する
+            print(f"full-text search index is not available: {e}")
+            return False
+        rebuild(connection)
+        return True
+    if dialect == 'mysql':
+        if not has_index(connection):
+            # インデックスの作成時に既存の行も登録される
+            connection.execute(text(
+                f"ALTER TABLE business_plans ADD FULLTEXT INDEX {FULLTEXT_INDEX} ({', '.join(SEARCH_COLUMNS)}) WITH PARSER ngram"
+            ))
+        return True
+    return False
+
+
+def rebuild(connection) -> int:
+    """business_plans 全体から索引を作り直し、登録したプラン数を返す"""
+    dialect = _dialect(connection)
+    if not has_index(connection):
+        return 0
+    if dialect == 'sqlite':
+        connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    elif dialect == 'mysql':
+        connection.execute(text(f"ALTER TABLE business_plans DROP INDEX {FULLTEXT_INDEX}"))
+        create_index(connection)
+    return connection.execute(text("SELECT COUNT(*) FROM business_plans")).scalar_one()
+
+
+def parse_terms(query: str) -> list:
+    """検索文字列を空白（全角を含む）で区切った語のリストにする（重複は除く）"""
+    terms = []
+    for term in query.split():
+        if term not in terms:
+            terms.append(term)
+    return terms[:MAX_TERMS]
+
+
+def _like_pattern(term: str) -> str:
+    # バックスラッシュの扱いがDBごとに異なるため、エスケープ文字には ! を使う
+    escaped = term.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+    return f"%{escaped}%"
+
+
+def _conditions(dialect: str, indexed: bool, terms: list) -> tuple:
+    """(FROM句, WHERE句, スコアの式, ID列, パラメータ) を作る"""
+    params = {}
+    conditions = []
+    indexed_terms = []
+    min_length = MIN_TERM_LENGTH.get(dialect, 0) if indexed else None
+    if indexed and dialect == 'sqlite':
+        source, id_column, prefix = FTS_TABLE, f"{FTS_TABLE}.rowid", f"{FTS_TABLE}."
+    else:
+        source, id_column, prefix = "business_plans", "business_plans.id", "business_plans."
+
+    for i, term in enumerate(terms):
+        if min_length is not None and len(term) >= min_length:
+            indexed_terms.append(term)
+            continue
+        params[f"like{i}"] = _like_pattern(term)
+        conditions.append("(" + " OR ".join(
+            f"{prefix}{column} LIKE :like{i} ESCAPE '!'" for column in SEARCH_COLUMNS
+        ) + ")")
+
+    score = "0"
+    if indexed_terms and dialect == 'sqlite':
+        # 語をフレーズとして引用する（"は2つ重ねてエスケープ）
+        params["match"] = " ".join('"' + term.replace('"', '""') + '"' for term in indexed_terms)
+        conditions.insert(0, f"{FTS_TABLE} MATCH :match")
+        score = f"-bm25({FTS_TABLE})"
+    elif indexed_terms and dialect == 'mysql':
+        # BOOLEAN MODEのフレーズには引用符のエスケープがないため取り除く
+        params["match"] = " ".join('+"' + term.replace('"', ' ') + '"' for term in indexed_terms)
+        match = f"MATCH ({', '.join(SEARCH_COLUMNS)}) AGAINST (:match IN BOOLEAN MODE)"
+        conditions.insert(0, match)
+        score = match
+    return source, " AND ".join(conditions) or "1 = 1", score, id_column, params
+
+
+def search(db, query: str, limit: int = 20, offset: int = 0) -> dict:
+    """検索語に一致するプランを一致度の高い順（同じ場合は新しい順）に返す
+
+    戻り値は {"total": 件数, "indexed": インデックスを使ったか, "items": [(プラン, スコア), ...]}。
+    """
+    terms = parse_terms(query)
+    connection = db.connection()
+    dialect = _dialect(connection)
+    indexed = has_index(connection)
+    if not terms:
+        return {"total": 0, "indexed": indexed, "items": []}
+    source, where, score, id_column, params = _conditions(dialect, indexed, terms)
+
+    total = db.execute(text(f"SELECT COUNT(*) FROM {source} WHERE {where}"), params).scalar_one()
+    rows = db.execute(
+        text(
+            f"SELECT {id_column} AS id, {score} AS score FROM {source} WHERE {where} "
+            f"ORDER BY score DESC, {id_column} DESC LIMIT :limit OFFSET :offset"
+        ),
+        dict(params, limit=limit, offset=offset)
+    ).all()
+    plans = {}
+    if rows:
+        ids = [row.id for row in rows]
+        plans = {
+            plan.id: plan
+            for plan in db.execute(select(models.BusinessPlan).where(models.BusinessPlan.id.in_(ids))).scalars()
+        }
+    return {
+        "total": total,
+        "indexed": indexed,
+        "items": [(plans[row.id], float(row.score)) for row in rows if row.id in plans]
+    }
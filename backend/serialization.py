@@ -0,0 +1,65 @@
+"""
+BusinessPlanOutput のレスポンスを高速に作る処理
+
+DBの行や計算結果など、このアプリ自身が作ったデータはスキーマの型とすでに一致しているため、
+pydanticでの検証（response_model による再検証を含む）を省いてdictに詰め替え、
+orjsonで直接バイト列に変換する。出力するJSONは response_model を通した場合と同じになる。
+"""
+import orjson
+from fastapi.responses import Response
+
+import metrics, models, schemas
+
+# レスポンスの項目（スキーマの定義順）
+PLAN_FIELDS = tuple(schemas.BusinessPlanOutput.model_fields)
+_EXTENDED = frozenset(models.EXTENDED_FIELDS)
+# スキーマでfloatの項目（JSONに整数として保存されている場合も 0.75 のように出力する）
+_FLOAT_FIELDS = ('turnover', 'cogs_rate', 'seat_occupancy_rate')
+_MENU_FIELDS = tuple(schemas.MenuExample.model_fields)
+
+
+def plan_dict(db_plan: models.BusinessPlan, extended: dict = None) -> dict:
+    """プランの行をBusinessPlanOutputと同じ形のdictに変換（extendedを省略すると行の値を使う）"""
+    # 読み込み済みの列の値はインスタンスの__dict__にあるため、属性アクセスを経由せずに読む
+    loaded = db_plan.__dict__
+    if extended is None:
+        extended = loaded['extended'] if 'extended' in loaded else db_plan.extended
+        extended = extended or {}
+    row = {}
+    for name in PLAN_FIELDS:
+        if name in _EXTENDED:
+            row[name] = extended.get(name)
+        elif name in loaded:
+            row[name] = loaded[name]
+        else:
+            row[name] = getattr(db_plan, name)
+    for name in _FLOAT_FIELDS:
+        if row[name] is not None:
+            row[name] = float(row[name])
+    if row['menu_examples'] is not None:
+        # スキーマにない項目は出力しない
+        row['menu_examples'] = [{name: m[name] for name in _MENU_FIELDS} for m in row['menu_examples']]
+    return row
+
+
+def dumps(content) -> bytes:
+    """pydanticのJSON出力と同じ形式（UTCの日時は末尾Z）でバイト列に変換"""
+    return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+
+
+def plan_response(db_plan: models.BusinessPlan, extended: dict = None, headers: dict = None) -> Response:
+    """プラン1件のレスポンス"""
+    with metrics.stage("serialization"):
+        body = dumps(plan_dict(db_plan, extended))
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def plans_response(db_plans: list, headers: dict = None, projections: list = None) -> Response:
+    """プラン一覧のレスポンス（projectionsを指定すると各プランにprojectionとして追加）"""
+    with metrics.stage("serialization"):
+        rows = [plan_dict(db_plan) for db_plan in db_plans]
+        if projections is not None:
+            for row, projection in zip(rows, projections):
+                row['projection'] = projection
+        body = dumps(rows)
+    return Response(content=body, media_type="application/json", headers=headers)
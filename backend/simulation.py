@@ -0,0 +1,215 @@
+"""
+事業計画の収支モデルをNumPyでベクトル化した計算モジュール
+
+crud.calculate_business_plan と同じ式・同じ丸め（偶数丸め）で、
+複数プランの数値項目を列単位でまとめて計算する。
+"""
+import numpy as np
+import crud
+import metrics
+import schemas
+
+# float64で整数を正確に表現できる上限（これを超える売上は計算対象外とする）
+MAX_EXACT_VALUE = 2 ** 53
+
+# calculate_plan_arrays が返す項目
+METRIC_FIELDS = (
+    'turnover', 'daily_guests', 'monthly_sales', 'cogs_rate', 'cogs', 'gross_profit',
+    'labor_cost', 'fixed_cost', 'op_income', 'payback_months'
+)
+# グリッドスイープで返せる項目（回転数・原価率は軸として返す）
+SWEEP_FIELDS = tuple(f for f in METRIC_FIELDS if f not in ('turnover', 'cogs_rate'))
+
+
+def cogs_rates_for(types) -> np.ndarray:
+    """業態名の配列から原価率の配列を作成"""
+    return np.array([crud.get_cogs_rate(t) for t in types], dtype=np.float64)
+
+
+def calculate_plan_arrays(seats, atv, cogs_rate, turnover=crud.BASE_TURNOVER) -> dict:
+    """席数・客単価・原価率・回転数の配列から収支項目を一括計算
+
+    引数はブロードキャスト可能な形状であればよく、戻り値の各配列は
+    ブロードキャスト後の形状になる。
+    """
+    seats = np.asarray(seats, dtype=np.float64)
+    atv = np.asarray(atv, dtype=np.int64)
+    cogs_rate = np.asarray(cogs_rate, dtype=np.float64)
+    turnover = np.asarray(turnover, dtype=np.float64)
+
+    shape = np.broadcast_shapes(seats.shape, atv.shape, cogs_rate.shape, turnover.shape)
+
+    daily_guests = np.round(seats * turnover * crud.GUEST_RATE).astype(np.int64)
+    monthly_sales = atv * daily_guests * crud.BUSINESS_DAYS
+    cogs = np.round(monthly_sales * cogs_rate).astype(np.int64)
+    gross_profit = monthly_sales - cogs
+    labor_cost = np.round(monthly_sales * crud.LABOR_RATE).astype(np.int64)
+    op_income = gross_profit - labor_cost - crud.FIXED_COST
+    payback_months = np.where(op_income > 0, crud.PAYBACK_MONTHS_PROFIT, crud.PAYBACK_MONTHS_LOSS)
+
+    # 軸ごとに形状が異なる項目も、全項目同じ形状にそろえて返す
+    return {
+        'turnover': np.broadcast_to(turnover, shape),
+        'daily_guests': np.broadcast_to(daily_guests, shape),
+        'monthly_sales': np.broadcast_to(monthly_sales, shape),
+        'cogs_rate': np.broadcast_to(cogs_rate, shape),
+        'cogs': np.broadcast_to(cogs, shape),
+        'gross_profit': np.broadcast_to(gross_profit, shape),
+        'labor_cost': np.broadcast_to(labor_cost, shape),
+        'fixed_cost': np.full(shape, crud.FIXED_COST, dtype=np.int64),
+        'op_income': np.broadcast_to(op_income, shape),
+        'payback_months': np.broadcast_to(payback_months, shape)
+    }
+
+
+def plan_input_error(plan) -> str:
+    """BusinessPlanInputの業務上の検証を行い、エラーメッセージ（問題なければNone）を返す"""
+    if not plan.type or not plan.area:
+        return "業態と立地は必須です"
+    if plan.seats <= 0 or plan.atv <= 0:
+        return "席数と客単価は1以上である必要があります"
+    if plan.seats >= MAX_EXACT_VALUE or plan.atv >= MAX_EXACT_VALUE:
+        return "席数または客単価が大きすぎます"
+    daily_guests = round(plan.seats * crud.BASE_TURNOVER * crud.GUEST_RATE)
+    if plan.atv * daily_guests * crud.BUSINESS_DAYS >= MAX_EXACT_VALUE:
+        return "席数または客単価が大きすぎます"
+    return None
+
+
+def calculate_business_plans(inputs: list) -> list:
+    """BusinessPlanInputのリストを一括計算し、入力順の結果dictリストを返す"""
+    if not inputs:
+        return []
+
+    with metrics.stage("calculation"):
+        return _calculate_business_plans(inputs)
+
+
+def initial_investments_for(seats, types) -> np.ndarray:
+    """席数・業態の配列から初期投資（crud.calculate_initial_investment と同じ値）の配列を作成"""
+    multipliers = {}
+    for t in types:
+        if t not in multipliers:
+            multipliers[t] = crud.get_investment_multiplier(t)
+    # int同士の和をfloatに変換してから係数を掛ける（crudと同じ順序で丸める）
+    base = np.asarray(seats, dtype=np.int64) * crud.INVESTMENT_SEAT_COST + crud.INVESTMENT_BASE_COST
+    # int() と同じく小数点以下を切り捨てる（値は常に正）
+    return np.floor(base.astype(np.float64) * np.array([multipliers[t] for t in types])).astype(np.int64)
+
+
+def calculate_extended_fields(inputs: list) -> list:
+    """BusinessPlanInputのリストから、extended列に保存する拡張フィールドのdictリストを入力順に返す
+
+    crud.calculate_business_plan と同じ値になる。文章項目は業態・立地・営業時間の組み合わせごとに1回だけ生成し、
+    計算結果のキャッシュ（crud.plan_cache）は使わない（一括保存で単発のプランのキャッシュを追い出さないため）。
+    """
+    if not inputs:
+        return []
+    seats = np.array([p.seats for p in inputs], dtype=np.int64)
+    staff_count = np.where(seats <= 20, 2, np.where(seats <= 40, 3, 4)).tolist()
+    initial_investment = initial_investments_for(seats, [p.type for p in inputs])
+    opening_cost = (initial_investment + crud.WORKING_CAPITAL).tolist()
+    initial_investment = initial_investment.tolist()
+
+    texts, menus, peaks, funding = {}, {}, {}, {}
+    results = []
+    for i, p in enumerate(inputs):
+        key = (p.type, p.area)
+        if key not in texts:
+            texts[key] = (
+                crud.generate_catch_copy(p.type, p.area),
+                crud.generate_target_audience(p.type, p.area),
+                crud.generate_sns_strategy(p.type, p.area)
+            )
+        if p.type not in menus:
+            menus[p.type] = crud.generate_menu_examples(p.type)
+        if p.hours not in peaks:
+            peaks[p.hours] = crud.generate_peak_operation(p.type, p.hours)
+        if p.area not in funding:
+            funding[p.area] = crud.get_funding_methods(p.area)
+        catch_copy, target_audience, sns_strategy = texts[key]
+        results.append({
+            'catch_copy': catch_copy,
+            'target_audience': target_audience,
+            'menu_examples': menus[p.type],
+            'sns_strategy': sns_strategy,
+            'staff_count': staff_count[i],
+            'peak_operation': peaks[p.hours],
+            'initial_investment': initial_investment[i],
+            'opening_cost': opening_cost[i],
+            'funding_methods': funding[p.area],
+            'seat_occupancy_rate': 0.75
+        })
+    return results
+
+
+def _calculate_business_plans(inputs: list) -> list:
+    seats = np.array([p.seats for p in inputs], dtype=np.int64)
+    atv = np.array([p.atv for p in inputs], dtype=np.int64)
+    values = calculate_plan_arrays(seats, atv, cogs_rates_for([p.type for p in inputs]))
+
+    # 文章項目は(業態, 立地)の組み合わせごとに1回だけ生成する
+    texts = {}
+    columns = {name: column.tolist() for name, column in values.items()}
+    results = []
+    for i, p in enumerate(inputs):
+        key = (p.type, p.area)
+        if key not in texts:
+            texts[key] = (crud.generate_concept(p.type, p.area), crud.generate_action(p.type))
+        concept, action = texts[key]
+        row = {
+            'type': p.type,
+            'seats': p.seats,
+            'atv': p.atv,
+            'hours': p.hours,
+            'area': p.area,
+            'concept': concept,
+            'action': action
+        }
+        for name, values in columns.items():
+            row[name] = values[i]
+        results.append(row)
+    return results
+
+
+def expand_range(start, stop, step, dtype) -> np.ndarray:
+    """start〜stop（stopを含む）をstep刻みで展開した1次元配列を返す"""
+    if dtype == np.int64:
+        return np.arange(int(start), int(stop) + 1, int(step), dtype=np.int64)
+    # 値の数はスキーマのセル数の確認と同じ式で求める
+    values = start + np.arange(schemas.float_range_size(start, stop, step), dtype=np.float64) * step
+    # 浮動小数点の刻み誤差で軸の値が揺れないように丸めておく
+    return np.round(values, 10)
+
+
+def sweep_grid(type: str, seats, atv, turnover=None, cogs_rate=None) -> tuple:
+    """席数×客単価×回転数×原価率の全組み合わせを一括計算
+
+    各軸の1次元配列を受け取り、(axes, metrics) を返す。
+    metricsの各配列は (len(seats), len(atv), len(turnover), len(cogs_rate)) の形状。
+    """
+    if turnover is None:
+        turnover = np.array([crud.BASE_TURNOVER])
+    if cogs_rate is None:
+        cogs_rate = cogs_rates_for([type])
+    axes = {
+        'seats': np.asarray(seats, dtype=np.int64),
+        'atv': np.asarray(atv, dtype=np.int64),
+        'turnover': np.asarray(turnover, dtype=np.float64),
+        'cogs_rate': np.asarray(cogs_rate, dtype=np.float64)
+    }
+    metrics = calculate_plan_arrays(
+        axes['seats'][:, None, None, None],
+        axes['atv'][None, :, None, None],
+        axes['cogs_rate'][None, None, None, :],
+        turnover=axes['turnover'][None, None, :, None]
+    )
+    return axes, metrics
+
+
+def sweep_exceeds_exact_range(max_seats: int, max_atv: int, max_turnover: float) -> bool:
+    """グリッド内の最大売上がfloat64で正確に扱えない範囲になるかどうか"""
+    if max_seats >= MAX_EXACT_VALUE or max_atv >= MAX_EXACT_VALUE:
+        return True
+    max_guests = round(max_seats * max_turnover * crud.GUEST_RATE)
+    return max_atv * max_guests * crud.BUSINESS_DAYS >= MAX_EXACT_VALUE
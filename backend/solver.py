@@ -0,0 +1,176 @@
+"""
+損益分岐・目標利益の逆算（必要な席数・客単価・回転数を求める）
+
+crud.calculate_business_plan の収支モデルを逆に解き、目標の月間営業利益、
+または目標の投資回収月数（開業費 ÷ 月間営業利益の切り上げ、montecarlo.py と同じ定義）を
+満たす最小の値を求める。daily_guests・原価・人件費の丸めを含めて判定するため、
+求めた値で計算し直すと必ず目標を満たし、1つ小さい値では満たさない。
+
+- 目標の営業利益から必要な売上を式で求め、丸めの分を前後の値で確認して補正する
+- 席数で回収月数を目標にする場合は開業費も席数で増え、回収月数が席数に対して単調でないため、
+  探索範囲のすべての席数の回収月数を一度に計算し、その累積最小値から求める
+- 回転数は0.001刻みで求める
+"""
+import numpy as np
+
+import crud
+import projection
+import simulation
+
+SOLVE_FOR = ('seats', 'atv', 'turnover')
+TARGET_KINDS = ('op_income', 'payback_months')
+TURNOVER_UNIT = 1000  # 回転数は 1/1000 単位の整数として探索する
+# 探索範囲（これを超える値が必要な目標は達成不能として返す）
+LOWER = {'seats': 1, 'atv': 1, 'turnover': 0}
+UPPER = {'seats': 10000, 'atv': 1000000, 'turnover': 20 * TURNOVER_UNIT}
+
+
+def _parameters(solve_for: str, x: np.ndarray, seats: int, atv: int, turnover: float) -> tuple:
+    """探索する値の配列から (席数, 客単価, 回転数) の配列を作る"""
+    if solve_for == 'seats':
+        return x, atv, turnover
+    if solve_for == 'atv':
+        return seats, x, turnover
+    return seats, atv, x / TURNOVER_UNIT
+
+
+def _evaluate(solve_for: str, x: np.ndarray, type: str, seats: int, atv: int, turnover: float) -> dict:
+    plan_seats, plan_atv, plan_turnover = _parameters(solve_for, x, seats, atv, turnover)
+    values = simulation.calculate_plan_arrays(plan_seats, plan_atv, crud.get_cogs_rate(type), turnover=plan_turnover)
+    plan_seats = np.broadcast_to(plan_seats, x.shape)
+    values['opening_cost'] = projection.opening_costs_for(plan_seats, [type] * x.size).reshape(x.shape)
+    return values
+
+
+def _meets(values: dict, kinds: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """目標を満たしているかどうか（回収月数は 営業利益 × 目標月数 >= 開業費 と同値）"""
+    op_income = values['op_income']
+    by_payback = (op_income > 0) & (op_income * targets >= values['opening_cost'])
+    return np.where(kinds == 'payback_months', by_payback, op_income >= targets)
+
+
+def _bisect(meets, lower: np.ndarray, upper: np.ndarray) -> np.ndarray:
+    """meets(x) を満たす最小の整数 x を [lower, upper] から探す（満たす値がない場合 -1）"""
+    feasible = meets(upper)
+    lo, hi = lower.copy(), upper.copy()
+    while True:
+        active = feasible & (lo < hi)
+        if not active.any():
+            break
+        mid = (lo + hi) // 2
+        ok = meets(mid)
+        hi = np.where(active & ok, mid, hi)
+        lo = np.where(active & ~ok, mid + 1, lo)
+    return np.where(feasible, hi, -1)
+
+
+def _min_seats_for_payback(type: str, atv: int, turnover: float, targets: np.ndarray) -> np.ndarray:
+    """回収月数の目標ごとに、それを満たす最小の席数を求める（満たす席数がない場合 -1）
+
+    席数が増えても daily_guests の丸めが変わらない間は開業費だけが増えるため、二分探索は使えない。
+    席数 s までの回収月数の最小値（累積最小値）は s について単調に減るので、目標以下になる最初の席数を二分探索する。
+    """
+    seats = np.arange(LOWER['seats'], UPPER['seats'] + 1, dtype=np.int64)
+    values = _evaluate('seats', seats, type, None, atv, turnover)
+    op_income = values['op_income']
+    # 営業利益 × 目標月数 >= 開業費 は 目標月数 >= ceil(開業費 ÷ 営業利益) と同値（赤字の席数は満たさない）
+    payback = np.where(op_income > 0, -(-values['opening_cost'] // np.maximum(op_income, 1)), np.iinfo(np.int64).max)
+    best = np.minimum.accumulate(payback)
+    index = np.searchsorted(-best, -targets, side='left')
+    return np.where(index < seats.size, seats[np.minimum(index, seats.size - 1)], -1)
+
+
+def _closed_form(solve_for: str, required: np.ndarray, type: str, seats: int, atv: int, turnover: float) -> np.ndarray:
+    """必要な営業利益 required を満たす値の近似（丸めを無視した式による解）"""
+    margin = 1 - crud.get_cogs_rate(type) - crud.LABOR_RATE
+    if margin <= 0:
+        # 売上が増えるほど赤字になる業態では、固定費を下回る目標以外は達成できない
+        return np.where(required <= -crud.FIXED_COST, LOWER[solve_for], UPPER[solve_for] + 1)
+    required_sales = np.maximum(required + crud.FIXED_COST, 0) / margin
+    if solve_for == 'atv':
+        guests = round(seats * turnover * crud.GUEST_RATE)
+        if guests == 0:
+            return np.where(required <= -crud.FIXED_COST, LOWER['atv'], UPPER['atv'] + 1)
+        return np.ceil(required_sales / (guests * crud.BUSINESS_DAYS))
+    guests = np.ceil(required_sales / (atv * crud.BUSINESS_DAYS))
+    # round(x) >= guests となる最小の x は guests - 0.5 付近（偶数丸めの差は後で補正する）
+    if solve_for == 'seats':
+        return np.ceil((guests - 0.5) / (turnover * crud.GUEST_RATE))
+    return np.ceil((guests - 0.5) / (seats * crud.GUEST_RATE) * TURNOVER_UNIT)
+
+
+def solve(type: str, solve_for: str, seats: int = None, atv: int = None, turnover: float = crud.BASE_TURNOVER,
+          target_op_income: list = (), target_payback_months: list = ()) -> list:
+    """目標ごとに必要な値を求め、入力順（営業利益の目標、回収月数の目標の順）の結果dictリストを返す"""
+    kinds = np.array(['op_income'] * len(target_op_income) + ['payback_months'] * len(target_payback_months))
+    targets = np.array(list(target_op_income) + list(target_payback_months), dtype=np.int64)
+    if targets.size == 0:
+        return []
+    lower = np.full(targets.shape, LOWER[solve_for], dtype=np.int64)
+    upper = np.full(targets.shape, UPPER[solve_for], dtype=np.int64)
+
+    def meets(x):
+        return _meets(_evaluate(solve_for, x, type, seats, atv, turnover), kinds, targets)
+
+    if solve_for == 'seats':
+        # 回収月数の目標は開業費も席数に比例して増えるため、式では解かずに _min_seats_for_payback で求める
+        closed = kinds == 'op_income'
+        required = targets
+    else:
+        closed = np.ones(targets.shape, dtype=bool)
+        opening_cost = projection.opening_costs_for([seats], [type])[0]
+        required = np.where(kinds == 'payback_months', -(-opening_cost // np.maximum(targets, 1)), targets)
+
+    guess = _closed_form(solve_for, required.astype(np.float64), type, seats, atv, turnover)
+    x = np.clip(np.nan_to_num(guess, nan=UPPER[solve_for] + 1, posinf=UPPER[solve_for] + 1), lower, upper + 1).astype(np.int64)
+    # 丸めの影響は数単位なので、式の解の前後を確認して最小の値にそろえる
+    within = closed & (x <= upper)
+    for _ in range(3):
+        short = within & ~meets(np.minimum(x, upper))
+        x = np.where(short, x + 1, x)
+        within &= x <= upper
+    for _ in range(3):
+        smaller = np.maximum(x - 1, lower)
+        shrink = within & (x > lower) & meets(smaller)
+        x = np.where(shrink, smaller, x)
+    # 式で解けなかったもの（補正しきれなかったもの、上限付近）は二分探索する
+    unsolved = ~(within & meets(np.minimum(x, upper)))
+    if solve_for == 'seats' and (~closed).any():
+        x = x.copy()
+        x[~closed] = _min_seats_for_payback(type, atv, turnover, targets[~closed])
+        unsolved &= closed
+    if unsolved.any():
+        x = np.where(unsolved, _bisect(meets, lower, upper), x)
+    feasible = (x >= lower) & (x <= upper)
+    x = np.where(feasible, x, lower)
+
+    values = _evaluate(solve_for, x, type, seats, atv, turnover)
+    plan_seats, plan_atv, plan_turnover = (
+        np.broadcast_to(v, x.shape) for v in _parameters(solve_for, x, seats, atv, turnover)
+    )
+    op_income = values['op_income']
+    payback = np.where(op_income > 0, -(-values['opening_cost'] // np.maximum(op_income, 1)), -1)
+    columns = {
+        'target_type': kinds.tolist(),
+        'target': targets.tolist(),
+        'feasible': feasible.tolist(),
+        'seats': plan_seats.tolist(),
+        'atv': plan_atv.tolist(),
+        'turnover': np.round(plan_turnover, 3).tolist(),
+        'daily_guests': values['daily_guests'].tolist(),
+        'monthly_sales': values['monthly_sales'].tolist(),
+        'op_income': op_income.tolist(),
+        'opening_cost': values['opening_cost'].tolist(),
+        'payback_months': payback.tolist(),
+    }
+    results = []
+    for i in range(targets.size):
+        row = {name: column[i] for name, column in columns.items()}
+        if not row['feasible']:
+            # 達成できない目標は値を返さない
+            for name in (solve_for, 'daily_guests', 'monthly_sales', 'op_income', 'opening_cost', 'payback_months'):
+                row[name] = None
+        elif row['payback_months'] < 0:
+            row['payback_months'] = None
+        results.append(row)
+    return results
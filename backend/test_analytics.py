@@ -0,0 +1,156 @@
+"""
+プランの集計（集計テーブル・集計API）のテストコード
+
+実行方法:
+    python -m pytest test_analytics.py
+"""
+
+import math
+import random
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+import analytics, crud, manage, models, schemas
+from config import settings
+from database import SessionLocal, engine
+from main import app
+
+client = TestClient(app)
+
+ADMIN = {"X-Admin-Token": "analytics-secret"}
+
+
+@pytest.fixture(autouse=True)
+def admin_token(monkeypatch):
+    monkeypatch.setattr(settings, "admin_token", "analytics-secret")
+
+
+def unique_area() -> str:
+    # テスト間でグループが重ならないよう、エリア名を毎回変える
+    return f"テスト{uuid.uuid4().hex[:8]}"
+
+
+def plan(area: str, seats: int = 20, atv: int = 1200, type: str = "カフェ") -> dict:
+    return {"type": type, "seats": seats, "atv": atv, "hours": "10:00-20:00", "area": area}
+
+
+def get_groups(**params) -> list:
+    response = client.get("/api/admin/analytics/plans", params=params, headers=ADMIN)
+    assert response.status_code == 200, response.text
+    return response.json()["groups"]
+
+
+def stored_values(area: str, metric: str) -> list:
+    with SessionLocal() as db:
+        column = getattr(models.BusinessPlan, metric)
+        return sorted(db.execute(select(column).where(models.BusinessPlan.area == area)).scalars())
+
+
+def test_bucket_value_is_within_relative_accuracy():
+    for value in [1, 2, 17, 18, 24, 999, 123456, 5_400_000, -1, -540000, 0.5, 0]:
+        estimate = analytics.bucket_value(analytics.bucket_index(value))
+        if abs(value) < 1:
+            assert estimate == 0
+        else:
+            assert abs(estimate - value) <= analytics.RELATIVE_ACCURACY * abs(value) + 1e-9
+    # バケット番号の順序は値の順序と一致する
+    values = [-1e6, -10, -1, 0, 1, 10, 1e6]
+    assert [analytics.bucket_index(v) for v in values] == sorted(analytics.bucket_index(v) for v in values)
+
+
+def test_sketch_percentiles_match_exact_percentiles():
+    rng = random.Random(0)
+    values = [rng.lognormvariate(14, 0.5) for _ in range(5000)] + [-rng.uniform(1, 1e5) for _ in range(500)]
+    delta = analytics.StatsDelta()
+    for value in values:
+        delta.add("x", "y", {"monthly_sales": value, "op_income": None, "payback_months": None})
+    buckets = sorted((key[3], count) for key, count in delta.buckets.items())
+    ordered = sorted(values)
+    for q in (0.05, 0.5, 0.9, 0.99):
+        exact = ordered[max(1, math.ceil(q * len(ordered))) - 1]
+        estimate = analytics._quantile(buckets, len(values), q)
+        assert abs(estimate - exact) <= analytics.RELATIVE_ACCURACY * abs(exact) + 1e-9
+
+
+def test_plan_inserts_update_summary_incrementally():
+    area = unique_area()
+    for seats in (10, 20, 30, 40):
+        assert client.post("/api/plans", json=plan(area, seats=seats)).status_code == 200
+    response = client.post("/api/plans/batch", json={
+        "persist": True, "plans": [plan(area, seats=seats, atv=2000) for seats in range(5, 65, 5)]
+    })
+    assert response.status_code == 200
+
+    [group] = get_groups(area=area)
+    assert group["type"] == "カフェ" and group["area"] == area
+    assert group["count"] == 16
+    for metric in analytics.METRICS:
+        values = stored_values(area, metric)
+        summary = group["metrics"][metric]
+        mean = sum(values) / len(values)
+        assert summary["mean"] == pytest.approx(mean, abs=0.01)
+        assert summary["stddev"] == pytest.approx(math.sqrt(sum((v - mean) ** 2 for v in values) / len(values)), rel=1e-6, abs=0.01)
+        assert summary["min"] == values[0] and summary["max"] == values[-1]
+        exact_p50 = values[math.ceil(0.5 * len(values)) - 1]
+        assert abs(summary["p50"] - exact_p50) <= analytics.RELATIVE_ACCURACY * abs(exact_p50) + 0.01
+
+
+def test_group_by_merges_groups():
+    area = unique_area()
+    for type in ("カフェ", "焼鳥"):
+        client.post("/api/plans/batch", json={"persist": True, "plans": [plan(area, type=type, seats=s) for s in (10, 20)]})
+
+    by_type = get_groups(area=area)
+    assert [(g["type"], g["count"]) for g in by_type] == [("カフェ", 2), ("焼鳥", 2)]
+    [by_area] = get_groups(area=area, group_by="area")
+    assert by_area == {**by_area, "area": area, "count": 4}
+    assert "type" not in by_area
+    assert by_area["metrics"]["monthly_sales"]["max"] == max(g["metrics"]["monthly_sales"]["max"] for g in by_type)
+    [overall] = get_groups(area=area, group_by="")
+    assert overall["count"] == 4
+
+
+def test_group_commit_writes_are_counted(monkeypatch):
+    from plan_writer import plan_writer
+    monkeypatch.setattr(settings, "plan_write_durability", "group_commit")
+    area = unique_area()
+    try:
+        for seats in (10, 20, 30):
+            assert client.post("/api/plans", json=plan(area, seats=seats)).status_code == 200
+    finally:
+        plan_writer.stop()
+    [group] = get_groups(area=area)
+    assert group["count"] == 3
+
+
+def test_rebuild_matches_incremental_summary():
+    area = unique_area()
+    client.post("/api/plans/batch", json={"persist": True, "plans": [plan(area, seats=s, atv=a) for s in (8, 16, 32) for a in (800, 3000)]})
+    before = get_groups(group_by="type,area")
+
+    assert manage.main(["rebuild-analytics"]) == 0
+    after = get_groups(group_by="type,area")
+    assert len(after) == len(before)
+    for old, new in zip(before, after):
+        assert (old["type"], old["area"], old["count"]) == (new["type"], new["area"], new["count"])
+        for metric, summary in old["metrics"].items():
+            for name, value in summary.items():
+                assert new["metrics"][metric][name] == pytest.approx(value, rel=1e-9, abs=0.01)
+
+
+def test_rolled_back_inserts_are_not_counted():
+    area = unique_area()
+    input_data = schemas.BusinessPlanInput(**plan(area))
+    with SessionLocal() as db:
+        crud.insert_plans(db, [crud.plan_row(input_data, crud.calculate_business_plan_cached(input_data))])
+        db.rollback()
+    assert get_groups(area=area) == []
+
+
+def test_analytics_requires_admin_and_valid_group_by():
+    assert client.get("/api/admin/analytics/plans").status_code == 403
+    assert client.get("/api/admin/analytics/plans", params={"group_by": "seats"}, headers=ADMIN).status_code == 400
+    assert client.get("/api/admin/analytics/plans", params={"group_by": "type,type"}, headers=ADMIN).status_code == 400
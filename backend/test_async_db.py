@@ -0,0 +1,80 @@
+"""
+非同期DB（DATABASE_ASYNC=true）のテストコード
+
+実行方法:
+    python -m pytest test_async_db.py
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+import crud_async
+import database
+from config import settings
+from main import app
+
+client = TestClient(app)
+
+
+def test_async_database_url():
+    """同期ドライバのURLが非同期ドライバのURLに変換される"""
+    assert database.async_database_url("sqlite:///./omise_ai.db") == "sqlite+aiosqlite:///./omise_ai.db"
+    assert database.async_database_url("mysql+pymysql://u:p@h:3306/db?charset=utf8mb4") == \
+        "mysql+aiomysql://u:p@h:3306/db?charset=utf8mb4"
+
+
+def test_async_crud_reads_same_rows_as_sync():
+    """非同期版のCRUDが同期版と同じプランを返す"""
+    plan = {"type": "カフェ", "seats": 16, "atv": 900, "hours": "8:00-18:00", "area": "駅近"}
+    created = [client.post("/api/plans", json=plan).json()["id"] for _ in range(3)]
+    
+    async def read():
+        async_engine, session_factory = database.create_async_session_factory(settings.database_url)
+        try:
+            async with session_factory() as db:
+                detail = await crud_async.get_business_plan(db, created[0])
+                page, next_cursor = await crud_async.get_business_plans(db, limit=2)
+                return detail, [p.id for p in page], next_cursor
+        finally:
+            await async_engine.dispose()
+    
+    detail, page_ids, next_cursor = asyncio.run(read())
+    assert detail.catch_copy is not None
+    assert page_ids == sorted(created, reverse=True)[:2]
+    assert next_cursor is not None
+
+
+def test_endpoints_with_async_database_enabled(tmp_path):
+    """DATABASE_ASYNC=true で起動したアプリで取得系エンドポイントが動作する"""
+    script = textwrap.dedent("""
+        from fastapi.testclient import TestClient
+        from main import app
+        
+        with TestClient(app) as client:
+            plan = {"type": "焼鳥", "seats": 20, "atv": 3000, "hours": "17:00-24:00", "area": "駅近"}
+            token = client.post("/api/auth/register", json={"email": "async@example.com", "password": "password123"}).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            ids = [client.post("/api/plans", json=plan, headers=headers).json()["id"] for _ in range(3)]
+            
+            assert client.get(f"/api/plans/{ids[0]}", headers=headers).json()["catch_copy"]
+            assert client.get(f"/api/plans/{ids[0]}").status_code == 404
+            page = client.get("/api/plans/my", params={"limit": 2}, headers=headers)
+            assert [p["id"] for p in page.json()] == ids[::-1][:2]
+            rest = client.get("/api/plans/my", params={"cursor": page.headers["X-Next-Cursor"]}, headers=headers)
+            assert [p["id"] for p in rest.json()] == [ids[0]]
+            assert client.get("/api/plans/999999").status_code == 404
+        print("ok")
+    """)
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp_path / 'async.db'}", "DATABASE_ASYNC": "true", "AUTO_MIGRATE": "true"}
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=Path(__file__).parent, env=env, capture_output=True, text=True, timeout=60
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    assert result.stdout.strip().endswith("ok")
@@ -0,0 +1,114 @@
+"""
+認証トークン・ユーザーキャッシュのテストコード
+
+実行方法:
+    python -m pytest test_auth_cache.py
+"""
+
+import time
+import uuid
+from datetime import timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import crud
+from auth.jwt import create_access_token, token_cache, verify_token
+from config import settings
+from database import SessionLocal
+from main import app
+
+client = TestClient(app)
+
+
+def register():
+    email = f"cache-{uuid.uuid4().hex[:8]}@example.com"
+    response = client.post("/api/auth/register", json={"email": email, "password": "password123"})
+    assert response.status_code == 200
+    data = response.json()
+    return data["access_token"], data["user"]["id"]
+
+
+def me(token: str):
+    return client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+
+
+def test_repeated_requests_hit_caches():
+    """同じトークンでの2回目以降はトークン・ユーザーともキャッシュから取得する"""
+    token, user_id = register()
+    assert me(token).status_code == 200
+    
+    token_hits = token_cache.hits
+    user_hits = crud.user_cache.hits
+    response = me(token)
+    assert response.status_code == 200
+    assert response.json()["id"] == user_id
+    assert token_cache.hits == token_hits + 1
+    assert crud.user_cache.hits == user_hits + 1
+
+
+def test_token_cache_respects_expiry():
+    """キャッシュ済みのトークンもexpを過ぎると無効になる"""
+    token = create_access_token({"sub": "1"}, expires_delta=timedelta(seconds=2))
+    assert verify_token(token) is not None
+    assert verify_token(token) is not None
+    time.sleep(3.1)
+    assert verify_token(token) is None
+
+
+def test_token_cache_is_invalidated_by_secret_change(monkeypatch):
+    """署名鍵を変更すると、キャッシュ済みのトークンも新しい鍵で検証し直す"""
+    token = create_access_token({"sub": "1"})
+    assert verify_token(token) is not None
+    assert verify_token(token) is not None
+    
+    monkeypatch.setattr(settings, "jwt_secret", "rotated-secret")
+    assert verify_token(token) is None
+    assert verify_token(create_access_token({"sub": "1"})) is not None
+
+
+def test_invalid_token_is_rejected():
+    """不正なトークンはキャッシュされず401になる"""
+    assert me("invalid-token").status_code == 401
+    assert me("invalid-token").status_code == 401
+
+
+@pytest.mark.parametrize("claims", [{}, {"sub": "abc"}, {"sub": None}, {"sub": ["1"]}])
+def test_token_without_valid_sub_is_rejected(claims):
+    """署名が正しくても、subがない・整数でないトークンは401になる"""
+    assert me(create_access_token(claims)).status_code == 401
+
+
+def test_user_update_invalidates_cache():
+    """ORM経由でユーザーを更新するとキャッシュが破棄される"""
+    token, user_id = register()
+    me(token)
+    assert crud.user_cache.get(user_id) is not None
+    
+    db = SessionLocal()
+    try:
+        user = crud.get_user_by_id(db, user_id)
+        crud.update_password_hash(db, user, user.password_hash)
+        user.email = f"updated-{uuid.uuid4().hex[:8]}@example.com"
+        db.commit()
+        new_email = user.email
+    finally:
+        db.close()
+    
+    assert crud.user_cache.get(user_id) is None
+    assert me(token).json()["email"] == new_email
+
+
+def test_user_delete_invalidates_cache():
+    """ユーザーを削除すると、キャッシュ済みでも以降のリクエストは401になる"""
+    token, user_id = register()
+    assert me(token).status_code == 200
+    
+    db = SessionLocal()
+    try:
+        db.delete(crud.get_user_by_id(db, user_id))
+        db.commit()
+    finally:
+        db.close()
+    
+    assert me(token).status_code == 401
@@ -0,0 +1,76 @@
+"""
+一括シミュレーション（POST /api/plans/batch）のテストコード
+
+実行方法:
+    python -m pytest test_batch_simulation.py
+"""
+
+from fastapi.testclient import TestClient
+
+import crud
+import schemas
+import simulation
+from main import app
+
+client = TestClient(app)
+
+
+def test_vectorized_matches_scalar():
+    """ベクトル計算の結果が1件ずつの計算と一致する"""
+    inputs = [
+        schemas.BusinessPlanInput(type=t, seats=seats, atv=atv, hours="11:00-22:00", area=area)
+        for t in ["カフェ", "焼鳥 - 串焼き", "ラーメン", "イタリアン"]
+        for area in ["駅近", "住宅街"]
+        for seats in [1, 7, 25, 63]
+        for atv in [450, 1234, 3800]
+    ]
+    results = simulation.calculate_business_plans(inputs)
+    
+    assert len(results) == len(inputs)
+    for plan, result in zip(inputs, results):
+        expected = crud.calculate_business_plan(plan)
+        for key in simulation.METRIC_FIELDS:
+            assert result[key] == expected[key], key
+        assert result["concept"] == expected["concept"]
+        assert result["action"] == expected["action"]
+
+
+def test_batch_keeps_order_and_reports_item_errors():
+    """結果は入力順で返り、不正な要素だけがエラーになる"""
+    plans = [
+        {"type": "カフェ", "seats": 20, "atv": 800, "hours": "8:00-18:00", "area": "駅近"},
+        {"type": "カフェ", "seats": 0, "atv": 800, "hours": "8:00-18:00", "area": "駅近"},
+        {"type": "焼鳥", "seats": "many", "atv": 3000, "hours": "17:00-24:00", "area": "住宅街"},
+        "not a plan",
+        {"type": "ラーメン", "seats": 15, "atv": 900, "hours": "11:00-22:00", "area": "オフィス街"},
+    ]
+    response = client.post("/api/plans/batch", json={"plans": plans})
+    assert response.status_code == 200
+    body = response.json()
+    
+    assert [item["index"] for item in body["items"]] == [0, 1, 2, 3, 4]
+    assert [item["ok"] for item in body["items"]] == [True, False, False, False, True]
+    assert body["succeeded"] == 2
+    assert body["failed"] == 3
+    assert body["items"][1]["error"] == "席数と客単価は1以上である必要があります"
+    assert "seats" in body["items"][2]["error"]
+    assert body["items"][0]["result"]["id"] is None
+    assert body["items"][4]["result"]["type"] == "ラーメン"
+
+
+def test_batch_persist_bulk_inserts():
+    """persist指定時はまとめて保存され、IDが入力順に採番される"""
+    plans = [
+        {"type": "和食", "seats": seats, "atv": 1500, "hours": "11:00-22:00", "area": "観光地"}
+        for seats in (10, 20, 30)
+    ]
+    response = client.post("/api/plans/batch", json={"plans": plans, "persist": True})
+    assert response.status_code == 200
+    items = response.json()["items"]
+    
+    ids = [item["result"]["id"] for item in items]
+    assert ids == sorted(ids)
+    for item in items:
+        saved = client.get(f"/api/plans/{item['result']['id']}").json()
+        assert saved["seats"] == item["result"]["seats"]
+        assert saved["op_income"] == item["result"]["op_income"]
@@ -0,0 +1,75 @@
+"""
+ベンチマーク・負荷テストのテストコード
+
+実行方法:
+    python -m pytest test_benchmarks.py
+"""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from benchmarks import report
+
+BACKEND_DIR = Path(__file__).parent
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert report.percentile(values, 50) == 50
+    assert report.percentile(values, 95) == 95
+    assert report.percentile(values, 99) == 99
+    assert report.percentile([7], 99) == 7
+    assert report.percentile([], 50) == 0.0
+
+
+def test_compare_detects_regressions():
+    """レイテンシの増加・スループットの低下がしきい値を超えた項目だけを返す"""
+    baseline = {"GET /a": {"p95_ms": 10.0, "throughput_rps": 100.0}, "GET /b": {"p95_ms": 10.0}}
+    current = {
+        "GET /a": {"p95_ms": 11.0, "throughput_rps": 70.0},
+        "GET /b": {"p95_ms": 13.0},
+        "GET /new": {"p95_ms": 99.0}
+    }
+    regressions = report.compare_results(baseline, current, threshold=0.2)
+    assert ("GET /a", "throughput_rps", 100.0, 70.0) in regressions
+    assert ("GET /b", "p95_ms", 10.0, 13.0) in regressions
+    assert len(regressions) == 2
+
+
+def test_load_suite_covers_every_route(tmp_path):
+    """負荷テストは全ルートを計測し、ベースラインとの比較で悪化がなければ終了コード0を返す"""
+    output = tmp_path / "baseline.json"
+    command = [sys.executable, "-m", "benchmarks.load", "--requests", "4", "--concurrency", "2", "--seed-plans", "10"]
+    result = subprocess.run(
+        command + ["--output", str(output)],
+        cwd=BACKEND_DIR, capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stderr
+    
+    from main import app
+    from fastapi.routing import APIRoute
+    routes = {f"{m} {r.path}" for r in app.routes if isinstance(r, APIRoute) for m in r.methods}
+    results = json.loads(output.read_text(encoding="utf-8"))["results"]
+    assert set(results) == routes
+    assert all(r["errors"] == 0 and r["p95_ms"] > 0 for r in results.values())
+    
+    def compare(scale: float) -> subprocess.CompletedProcess:
+        # ベースラインのレイテンシをscale倍、スループットを1/scale倍に書き換えて比較する
+        data = json.loads(output.read_text(encoding="utf-8"))
+        for r in data["results"].values():
+            for metric in ("p50_ms", "p95_ms", "p99_ms"):
+                r[metric] *= scale
+            r["throughput_rps"] /= scale
+        baseline = tmp_path / f"baseline-{scale}.json"
+        baseline.write_text(json.dumps(data), encoding="utf-8")
+        return subprocess.run(
+            command + ["--only", "GET /health", "--compare", str(baseline)],
+            cwd=BACKEND_DIR, capture_output=True, text=True, timeout=120
+        )
+    
+    assert compare(1000).returncode == 0
+    regressed = compare(0.001)
+    assert regressed.returncode == 1
+    assert "GET /health p95_ms" in regressed.stdout
@@ -0,0 +1,87 @@
+"""
+業態カタログのテストコード
+
+実行方法:
+    python -m pytest test_catalog.py
+"""
+
+import json
+
+import pytest
+
+import catalog
+import crud
+import schemas
+from config import settings
+
+
+@pytest.fixture
+def catalog_file(tmp_path, monkeypatch):
+    """既定のカタログをコピーした一時ファイルを使う"""
+    path = tmp_path / "catalog.json"
+    path.write_text(catalog.DEFAULT_CATALOG_PATH.read_text(encoding="utf-8"), encoding="utf-8")
+    monkeypatch.setattr(settings, "catalog_path", str(path))
+    monkeypatch.setattr(settings, "catalog_reload_interval", 0)
+    catalog.reload_catalog()
+    yield path
+    monkeypatch.undo()
+    catalog.reload_catalog()
+
+
+def test_lookup_known_and_fallback_entries():
+    """カタログにある組み合わせは登録済みの文章、ない組み合わせは既定テンプレートを返す"""
+    assert crud.generate_catch_copy("カフェ - 喫茶", "駅近") == "朝の一杯で、今日もいい1日を"
+    assert crud.generate_concept("イタリアン", "郊外") == \
+        "郊外のイタリアンとして、地域に愛される、こだわりの味と心地よい空間を提供するお店"
+    assert crud.generate_sns_strategy("焼鳥", "{area}").startswith("{area}での焼鳥店では")
+    # 埋め込んだ立地の中のプレースホルダーは置き換えない
+    assert crud.generate_concept("カフェ", "{main_type}").startswith("{main_type}のカフェとして")
+    assert crud.generate_concept("イタリアン", "{area}{main_type}").startswith("{area}{main_type}のイタリアンとして")
+    assert crud.get_cogs_rate("焼鳥") == 0.32
+    assert crud.get_cogs_rate("イタリアン") == 0.30
+
+
+def test_catalog_entries_are_read_only():
+    """インデックスのエントリは変更できず、呼び出し側にはコピーが渡る"""
+    entry = catalog.get_catalog().lookup("ラーメン", "駅近")
+    with pytest.raises(Exception):
+        entry.concept = "変更"
+    with pytest.raises(TypeError):
+        entry.menu_examples[0]["price"] = 0
+    menus = crud.generate_menu_examples("ラーメン")
+    menus[0]["price"] = 0
+    assert crud.generate_menu_examples("ラーメン")[0]["price"] == 780
+
+
+def test_new_business_type_and_reload(catalog_file):
+    """カタログに業態を追加して再読み込みすると、コード変更なしで反映される"""
+    data = json.loads(catalog_file.read_text(encoding="utf-8"))
+    data["categories"]["イタリアン"] = {
+        "action": "パスタを1品試作する",
+        "cogs_rate": 0.33,
+        "investment_multiplier": 1.25,
+        "areas": {"駅近": {"concept": "駅前のトラットリア"}}
+    }
+    old_version = catalog.get_catalog().version
+    plan = schemas.BusinessPlanInput(type="イタリアン", seats=20, atv=2500, hours="", area="駅近")
+    old_key = crud.plan_cache_key(plan)
+    
+    catalog_file.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    catalog.reload_catalog()
+    
+    assert catalog.get_catalog().version != old_version
+    assert crud.plan_cache_key(plan) != old_key
+    calc = crud.calculate_business_plan(plan)
+    assert calc["concept"] == "駅前のトラットリア"
+    assert calc["action"] == "パスタを1品試作する"
+    assert calc["cogs_rate"] == 0.33
+    assert calc["catch_copy"] == "駅近で、イタリアンの新しいスタイルを"
+
+
+def test_broken_catalog_keeps_current_one(catalog_file):
+    """読み込みに失敗した場合は現在のカタログを使い続ける"""
+    current = catalog.get_catalog()
+    catalog_file.write_text("{", encoding="utf-8")
+    with pytest.raises(ValueError):
+        catalog.reload_catalog()
+    assert catalog.get_catalog() is current
@@ -0,0 +1,103 @@
+"""
+HTTPキャッシュ（ETag・条件付きGET・圧縮）のテストコード
+
+実行方法:
+    python -m pytest test_http_cache.py
+"""
+
+import gzip
+
+from fastapi.testclient import TestClient
+
+import http_cache
+from config import settings
+from main import app
+
+client = TestClient(app)
+
+PLAN = {"type": "カフェ", "seats": 20, "atv": 1200, "hours": "10:00-20:00", "area": "駅近"}
+
+
+def test_reference_endpoint_returns_etag_and_304():
+    """補助金一覧はETag付きで返り、If-None-Matchが一致すれば304になる"""
+    response = client.get("/api/subsidies/駅近", headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert response.json()["subsidies"][-1]["name"] == "駅前活性化・創業支援補助金"
+    etag = response.headers["ETag"]
+    assert etag.startswith('"')
+    assert "max-age" in response.headers["Cache-Control"]
+    
+    cached = client.get("/api/subsidies/駅近", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["ETag"] == etag
+    
+    other = client.get("/api/subsidies/観光地", headers={"If-None-Match": etag})
+    assert other.status_code == 200
+
+
+def test_body_is_serialized_once_per_key():
+    """同じキーの2回目以降は事前シリアライズ済みの本文を使う"""
+    client.get("/api/menus/カフェ/ヘルシー")
+    hits = http_cache.body_cache.hits
+    response = client.get("/api/menus/カフェ/ヘルシー")
+    assert response.json()["suggestions"][0]["name"] == "アサイーボウル"
+    assert http_cache.body_cache.hits == hits + 1
+
+
+def test_large_body_is_gzip_compressed(monkeypatch):
+    """閾値以上の本文はgzipで圧縮して返し、圧縮版のETagでも304になる"""
+    monkeypatch.setattr(settings, "http_compress_min_size", 1)
+    http_cache.body_cache.clear()
+    try:
+        response = client.get(
+            "/api/menus/ラーメン/ヘルシー",
+            headers={"Accept-Encoding": "gzip"}
+        )
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.headers["ETag"].endswith('-gzip"')
+        assert response.json()["suggestions"][0]["price"] == 850
+        
+        identity = client.get("/api/menus/ラーメン/ヘルシー", headers={"Accept-Encoding": "identity"})
+        assert "Content-Encoding" not in identity.headers
+        assert identity.json() == response.json()
+        assert gzip.decompress(http_cache.body_cache.get(("menus", "ラーメン", "ヘルシー")).gzip) == identity.content
+        
+        cached = client.get(
+            "/api/menus/ラーメン/ヘルシー",
+            headers={"If-None-Match": response.headers["ETag"]}
+        )
+        assert cached.status_code == 304
+    finally:
+        http_cache.body_cache.clear()
+
+
+def test_plan_conditional_get():
+    """プラン取得は更新日時を検証子にして304を返す"""
+    plan_id = client.post("/api/plans", json=PLAN).json()["id"]
+    
+    response = client.get(f"/api/plans/{plan_id}")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert "Last-Modified" in response.headers
+    
+    assert client.get(f"/api/plans/{plan_id}", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(f"/api/plans/{plan_id}", headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+    assert client.get(f"/api/plans/{plan_id}", headers={"If-None-Match": '"other"'}).status_code == 200
+    
+    last_modified = response.headers["Last-Modified"]
+    assert client.get(f"/api/plans/{plan_id}", headers={"If-Modified-Since": last_modified}).status_code == 304
+    # 数値のタイムゾーン（-0000）の日時もUTCとして比較する
+    numeric_zone = last_modified.replace("GMT", "-0000")
+    assert client.get(f"/api/plans/{plan_id}", headers={"If-Modified-Since": numeric_zone}).status_code == 304
+    assert client.get(f"/api/plans/{plan_id}", headers={"If-Modified-Since": "Wed, 21 Oct 2015 07:28:00 -0000"}).status_code == 200
+    assert client.get(f"/api/plans/{plan_id}", headers={"If-Modified-Since": "invalid"}).status_code == 200
+
+
+def test_etag_matches():
+    etags = {'"abc"', '"abc-gzip"'}
+    assert http_cache.etag_matches('"xyz", "abc"', etags)
+    assert http_cache.etag_matches('W/"abc-gzip"', etags)
+    assert http_cache.etag_matches('*', etags)
+    assert not http_cache.etag_matches('"xyz"', etags)
+    assert not http_cache.etag_matches(None, etags)
@@ -0,0 +1,152 @@
+"""
+メニュー提案の検索エンジンのテストコード
+
+実行方法:
+    python -m pytest test_menu_engine.py
+"""
+
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+import crud, menu_engine
+from main import app
+
+client = TestClient(app)
+
+
+def synthetic_engine(count: int, seed: int = 0) -> tuple:
+    rng = random.Random(seed)
+    tags = [f"タグ{i}" for i in range(40)]
+    categories = [f"業態{i}" for i in range(30)]
+    items = [
+        {"category": rng.choice(categories), "name": f"メニュー{i}", "price": rng.randrange(100, 5000),
+         "description": "", "tags": rng.sample(tags, rng.randint(1, 4))}
+        for i in range(count)
+    ]
+    return menu_engine.MenuEngine({"items": items}), items, tags, categories
+
+
+def reference_search(items: list, category=None, tags=(), min_price=None, max_price=None, k=10, match_all=False) -> list:
+    """全件を走査する参照実装（重みの合計の降順、同点はカタログ順）"""
+    weights = dict(tags)
+    results = []
+    for i, item in enumerate(items):
+        matched = [tag for tag in item["tags"] if tag in weights]
+        if tags and (not matched or (match_all and len(matched) != len(weights))):
+            continue
+        if category is not None and item["category"] != category:
+            continue
+        if min_price is not None and item["price"] < min_price:
+            continue
+        if max_price is not None and item["price"] > max_price:
+            continue
+        results.append((-sum(weights[tag] for tag in matched), i))
+    return [(i, -score) for score, i in sorted(results)[:k]]
+
+
+def test_existing_suggestions_are_kept():
+    response = client.get("/api/menus/カフェ/ヘルシー")
+    assert response.status_code == 200
+    assert [m["name"] for m in response.json()["suggestions"]] == ["アサイーボウル", "グリーンスムージー", "キヌアサラダボウル"]
+    assert [m["name"] for m in crud.get_menu_suggestions("カフェ", "SNS映え")] == ["レインボーラテ", "フルーツタワーパンケーキ", "ユニコーンフラペチーノ"]
+    # 業態がカタログにない場合は既定のメニュー
+    assert crud.get_menu_suggestions("寿司", "ヘルシー") == [{"name": "おすすめメニュー1", "price": 800, "description": "お店の特色を活かした一品"}]
+
+
+# 検索エンジン導入前の固定の提案（業態・コンセプトの組み合わせごとの内容と順序を変えない）
+BASELINE_SUGGESTIONS = {
+    ("カフェ", "ヘルシー"): [
+        {"name": "アサイーボウル", "price": 880, "description": "スーパーフード満載、SNS映え抜群"},
+        {"name": "グリーンスムージー", "price": 680, "description": "野菜と果物のバランス◎"},
+        {"name": "キヌアサラダボウル", "price": 950, "description": "低GI、高タンパク質"},
+    ],
+    ("カフェ", "SNS映え"): [
+        {"name": "レインボーラテ", "price": 750, "description": "7色のグラデーションラテアート"},
+        {"name": "フルーツタワーパンケーキ", "price": 1380, "description": "フォトジェニックな盛り付け"},
+        {"name": "ユニコーンフラペチーノ", "price": 820, "description": "カラフルで可愛い限定ドリンク"},
+    ],
+    ("焼鳥", "ヘルシー"): [
+        {"name": "野菜巻き串盛り合わせ", "price": 980, "description": "アスパラ・トマト・なすの野菜串"},
+        {"name": "むね肉の塩焼き", "price": 380, "description": "低脂質・高タンパク"},
+    ],
+    ("ラーメン", "ヘルシー"): [
+        {"name": "鶏白湯ラーメン（麺半分）", "price": 850, "description": "コラーゲンたっぷり、低糖質"},
+        {"name": "野菜たっぷりタンメン", "price": 880, "description": "シャキシャキ野菜山盛り"},
+    ],
+}
+
+
+@pytest.mark.parametrize("key", list(BASELINE_SUGGESTIONS))
+def test_baseline_suggestions_are_pinned(key):
+    assert crud.get_menu_suggestions(*key) == BASELINE_SUGGESTIONS[key]
+    assert client.get(f"/api/menus/{key[0]}/{key[1]}").json()["suggestions"] == BASELINE_SUGGESTIONS[key]
+
+
+def test_suggestions_must_reference_items():
+    data = {"items": [{"category": "カフェ", "name": "ラテ", "price": 500, "description": "", "tags": ["定番"]}],
+            "suggestions": {"カフェ": {"定番": ["ラテ", "モカ"]}}}
+    with pytest.raises(ValueError):
+        menu_engine.MenuEngine(data)
+
+
+def test_type_and_concept_variants():
+    healthy = crud.get_menu_suggestions("カフェ", "ヘルシー")
+    assert crud.get_menu_suggestions("カフェ - 喫茶", "ヘルシーメニュー") == healthy
+    assert crud.get_menu_suggestions("カフェ", "ｈｅａｌｔｈｙ") == healthy
+    assert [m["name"] for m in crud.get_menu_suggestions("焼鳥", "インスタ映え")] == ["野菜巻き串盛り合わせ"]
+    # 対応するタグがないコンセプトは業態のメニューを返す
+    assert len(crud.get_menu_suggestions("ラーメン", "ステーキ")) == menu_engine.SUGGESTION_COUNT
+
+
+def test_resolve_tags():
+    engine = menu_engine.get_menu_engine()
+    assert engine.resolve_tags("ＳＮＳ映え、ヘルシーメニュー") == [("SNS映え", 1.0), ("ヘルシー", menu_engine.PARTIAL_MATCH_WEIGHT)]
+    assert engine.resolve_tags("ロカボ") == [("低糖質", 1.0)]
+    weight = dict(engine.resolve_tags("低糖値"))["低糖質"]
+    assert menu_engine.FUZZY_THRESHOLD <= weight < 1
+    assert engine.resolve_tags("ステーキ") == []
+    assert engine.resolve_tags("") == []
+
+
+def test_search_matches_reference():
+    engine, items, tags, categories = synthetic_engine(3000)
+    rng = random.Random(1)
+    for _ in range(200):
+        query = {
+            "category": rng.choice(categories + [None]),
+            "tags": [(tag, rng.choice([1.0, 0.9, 0.6])) for tag in rng.sample(tags, rng.randint(0, 3))],
+            "min_price": rng.choice([None, 500, 2000]),
+            "max_price": rng.choice([None, 1500, 4000]),
+            "k": rng.choice([1, 5, 20]),
+            "match_all": rng.random() < 0.3,
+        }
+        results = engine.search(**query)
+        expected = reference_search(items, **query)
+        assert [item["name"] for item, _ in results] == [items[i]["name"] for i, _ in expected]
+        assert [score for _, score in results] == pytest.approx([score for _, score in expected])
+
+
+def test_search_endpoint():
+    response = client.get("/api/menus/search", params={"tags": "ヘルシー,低糖質", "max_price": 900, "k": 3})
+    assert response.status_code == 200
+    body = response.json()
+    assert [t["tag"] for t in body["tags"]] == ["ヘルシー", "低糖質"]
+    assert len(body["items"]) == 3
+    assert all(item["price"] <= 900 and item["score"] == 2.0 for item in body["items"])
+
+    body = client.get("/api/menus/search", params={"tags": "ヘルシー 高タンパク", "type": "焼鳥 - 串焼き", "match": "all"}).json()
+    assert [item["name"] for item in body["items"]] == ["むね肉の塩焼き", "ささみ梅しそ"]
+
+    # 価格帯のみの検索はカタログ順
+    body = client.get("/api/menus/search", params={"min_price": 1500, "k": 100}).json()
+    assert body["items"] and all(item["price"] >= 1500 for item in body["items"])
+    # 対応するタグがない場合は結果なし
+    assert client.get("/api/menus/search", params={"tags": "ステーキ"}).json()["items"] == []
+
+
+def test_search_endpoint_validation():
+    assert client.get("/api/menus/search", params={"min_price": 1000, "max_price": 500}).status_code == 400
+    assert client.get("/api/menus/search", params={"match": "some"}).status_code == 422
+    assert client.get("/api/menus/search", params={"k": 0}).status_code == 422
@@ -0,0 +1,63 @@
+"""
+メトリクス（/metrics）のテストコード
+
+実行方法:
+    python -m pytest test_metrics.py
+"""
+
+import uuid
+
+from fastapi.testclient import TestClient
+
+import metrics
+from main import app
+
+client = TestClient(app)
+
+PLAN = {"type": "カフェ", "seats": 20, "atv": 1200, "hours": "10:00-20:00", "area": "駅近"}
+
+
+def test_requests_are_recorded_by_route_template():
+    """パスパラメータを含むパスはルートのテンプレートごとに集計される"""
+    before = metrics.requests_total.get(("GET", "/api/plans/{plan_id}", "404"))
+    client.get("/api/plans/999999991")
+    client.get("/api/plans/999999992")
+    assert metrics.requests_total.get(("GET", "/api/plans/{plan_id}", "404")) == before + 2
+    
+    body = client.get("/metrics").text
+    assert 'route="/api/plans/{plan_id}"' in body
+    assert "/api/plans/999999991" not in body
+
+
+def test_unmatched_paths_share_one_label():
+    before = metrics.requests_total.get(("GET", metrics.UNMATCHED_ROUTE, "404"))
+    client.get(f"/no-such-path/{uuid.uuid4().hex}")
+    assert metrics.requests_total.get(("GET", metrics.UNMATCHED_ROUTE, "404")) == before + 1
+
+
+def test_stages_are_timed():
+    """計算・コミット・シリアライズ・bcryptの処理時間が記録される"""
+    before = {name: metrics.stage_duration.count((name,)) for name in ("calculation", "db_commit", "serialization", "bcrypt")}
+    plan = dict(PLAN, seats=20 + uuid.uuid4().int % 1000)
+    assert client.post("/api/plans", json=plan).status_code == 200
+    client.post("/api/auth/register", json={"email": f"m-{uuid.uuid4().hex[:8]}@example.com", "password": "password123"})
+    for name, count in before.items():
+        assert metrics.stage_duration.count((name,)) > count, name
+
+
+def test_prometheus_text_format():
+    """ヒストグラムは累積バケット・_sum・_count を出力する"""
+    client.get("/health")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = response.text.splitlines()
+    assert "# TYPE http_request_duration_seconds histogram" in lines
+    assert "# TYPE stage_duration_seconds histogram" in lines
+    
+    buckets = [line for line in lines if line.startswith('http_request_duration_seconds_bucket{method="GET",route="/health"')]
+    counts = [int(line.rsplit(" ", 1)[1]) for line in buckets]
+    assert counts == sorted(counts)
+    assert buckets[-1].startswith('http_request_duration_seconds_bucket{method="GET",route="/health",le="+Inf"}')
+    total = next(line for line in lines if line.startswith('http_request_duration_seconds_count{method="GET",route="/health"}'))
+    assert int(total.rsplit(" ", 1)[1]) == counts[-1]
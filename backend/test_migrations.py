@@ -0,0 +1,96 @@
+"""
+スキーマのマイグレーションのテストコード
+
+実行方法:
+    python -m pytest test_migrations.py
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from sqlalchemy import create_engine, inspect, text
+
+import migrations
+
+BACKEND_DIR = Path(__file__).parent
+
+
+def make_engine(tmp_path, name="migrate.db"):
+    return create_engine(f"sqlite:///{tmp_path / name}")
+
+
+def test_migrate_creates_schema_and_is_idempotent(tmp_path):
+    engine = make_engine(tmp_path)
+    assert migrations.current_version(engine) == 0
+
+    applied = migrations.migrate(engine, log=None)
+    assert applied == [version for version, _, _ in migrations.MIGRATIONS]
+    assert migrations.current_version(engine) == migrations.LATEST_VERSION
+    assert migrations.pending(engine) == []
+    assert {"users", "business_plans", "schema_version"} <= set(inspect(engine).get_table_names())
+
+    # 2回目は何も実行しない
+    assert migrations.migrate(engine, log=None) == []
+
+
+def test_migrate_upgrades_database_created_before_versioning(tmp_path):
+    """create_allで作成された古いスキーマ（extended・user_id列なし）に列とインデックスを追加する"""
+    engine = make_engine(tmp_path)
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, email VARCHAR(255), password_hash VARCHAR(255))"))
+        connection.execute(text(
+            "CREATE TABLE business_plans (id INTEGER PRIMARY KEY, type VARCHAR(50), seats INTEGER, atv INTEGER,"
+            " hours VARCHAR(50), area VARCHAR(50), turnover FLOAT, daily_guests INTEGER, monthly_sales INTEGER,"
+            " cogs_rate FLOAT, cogs INTEGER, gross_profit INTEGER, labor_cost INTEGER, fixed_cost INTEGER,"
+            " op_income INTEGER, payback_months INTEGER, concept TEXT, action TEXT, created_at DATETIME, updated_at DATETIME)"
+        ))
+        connection.execute(text(
+            "INSERT INTO business_plans (id, type, area, monthly_sales, op_income, payback_months)"
+            " VALUES (1, 'カフェ', '駅近', 1000000, 100000, 18)"
+        ))
+        connection.execute(text(
+            "INSERT INTO business_plans (id, type, seats, atv, hours, area, monthly_sales, op_income, payback_months)"
+            " VALUES (2, 'カフェ', 20, 1200, '10:00-20:00', '駅近', 1000000, 100000, 18)"
+        ))
+
+    migrations.migrate(engine, log=None)
+
+    inspector = inspect(engine)
+    columns = {c["name"] for c in inspector.get_columns("business_plans")}
+    assert {"extended", "user_id"} <= columns
+    index_names = {index["name"] for index in inspector.get_indexes("business_plans")}
+    expected = {index.name for index in migrations.Base.metadata.tables["business_plans"].indexes}
+    assert expected <= index_names
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT type FROM business_plans WHERE id = 1")).scalar() == "カフェ"
+        # 既存のプランは集計テーブルにも反映される
+        assert connection.execute(text("SELECT SUM(value_count) FROM plan_stats")).scalar() == 6
+        # 拡張フィールドを計算できる既存のプランには保存し、入力項目が欠けているプランは未保存のまま
+        extended = dict(connection.execute(text("SELECT id, extended FROM business_plans")).all())
+        assert extended[1] is None
+        assert '"catch_copy"' in extended[2]
+
+
+def test_manage_command_migrates_and_reports_version(tmp_path):
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp_path / 'manage.db'}"}
+
+    def manage(*args):
+        return subprocess.run(
+            [sys.executable, "manage.py", *args],
+            cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=60
+        )
+
+    before = manage("version")
+    assert before.returncode == 0, before.stderr
+    assert "current version: 0" in before.stdout
+    assert "pending 1:" in before.stdout
+
+    result = manage("migrate")
+    assert result.returncode == 0, result.stderr
+    assert f"applied migration {migrations.LATEST_VERSION}" in result.stdout
+
+    after = manage("version")
+    assert f"current version: {migrations.LATEST_VERSION}" in after.stdout
+    assert "pending" not in after.stdout
@@ -0,0 +1,84 @@
+"""
+モンテカルロ・リスク分析（POST /api/plans/montecarlo）のテストコード
+
+実行方法:
+    python -m pytest test_montecarlo.py
+"""
+
+from fastapi.testclient import TestClient
+
+import crud
+import montecarlo
+import schemas
+from main import app
+
+client = TestClient(app)
+
+SPECS = {
+    "turnover": {"dist": "triangular", "low": 1.2, "mode": 2.0, "high": 2.6},
+    "atv": {"dist": "normal", "mean": 1100, "std": 150, "low": 500},
+    "cogs_rate": {"dist": "uniform", "low": 0.26, "high": 0.34},
+    "labor_rate": {"dist": "uniform", "low": 0.25, "high": 0.32},
+}
+
+
+def test_fixed_distributions_match_deterministic_model():
+    """分布を指定しない場合は決定論モデルと同じ営業利益になる"""
+    response = client.post("/api/plans/montecarlo", json={
+        "type": "ラーメン", "area": "駅近", "seats": 20, "atv": 900, "draws": 1000, "seed": 1
+    })
+    assert response.status_code == 200
+    body = response.json()
+    
+    expected = crud.calculate_business_plan(
+        schemas.BusinessPlanInput(type="ラーメン", seats=20, atv=900, hours="", area="駅近")
+    )
+    assert body["op_income"]["min"] == body["op_income"]["max"] == expected["op_income"]
+    assert body["probability_of_loss"] == (1.0 if expected["op_income"] < 0 else 0.0)
+    assert sum(body["payback_histogram"]["counts"]) + body["payback_histogram"]["beyond_horizon"] == 1000
+
+
+def test_same_seed_is_reproducible_across_worker_counts(monkeypatch):
+    """同じseedならチャンク数・ワーカー数にかかわらず同じ結果になる"""
+    monkeypatch.setattr(montecarlo, "CHUNK_SIZE", 5000)
+    specs = montecarlo.default_specs("カフェ", 1100)
+    specs.update(SPECS)
+    
+    inline = montecarlo.run_simulation("カフェ", 30, 20000, specs, 42, [5, 50, 95], workers=1)
+    pooled = montecarlo.run_simulation("カフェ", 30, 20000, specs, 42, [5, 50, 95], workers=2)
+    other_seed = montecarlo.run_simulation("カフェ", 30, 20000, specs, 43, [5, 50, 95], workers=1)
+    montecarlo.shutdown_pool()
+    
+    assert inline == pooled
+    assert inline["op_income"] != other_seed["op_income"]
+    assert 0.0 < inline["probability_of_loss"] < 1.0
+
+
+def test_distribution_upper_tail_is_bounded():
+    """売上が整数で正確に計算できる範囲を超える分布は、計算する前に400を返す"""
+    base = {"type": "カフェ", "area": "駅近", "seats": 20, "atv": 900, "draws": 1000, "seed": 1}
+    for distributions in (
+        {"atv": {"dist": "normal", "mean": 1e15, "std": 1.0}},
+        {"atv": {"dist": "normal", "mean": 900, "std": 1e14}},
+        {"atv": {"dist": "uniform", "low": 0, "high": 1e300}},
+        {"turnover": {"dist": "fixed", "value": 1e12}},
+        {"turnover": {"dist": "normal", "mean": 2.0, "std": 1e308}},
+    ):
+        response = client.post("/api/plans/montecarlo", json=dict(base, distributions=distributions))
+        assert response.status_code == 400, distributions
+    
+    # 上限が範囲内なら計算でき、結果も上限の売上を超えない
+    response = client.post("/api/plans/montecarlo", json=dict(base, distributions={"atv": {"dist": "normal", "mean": 900, "std": 300}}))
+    assert response.status_code == 200
+    body = response.json()
+    max_sales = (900 + montecarlo.NORMAL_TAIL_SIGMAS * 300) * round(20 * crud.BASE_TURNOVER * crud.GUEST_RATE) * crud.BUSINESS_DAYS
+    assert body["op_income"]["min"] <= body["op_income"]["percentiles"]["p50"] <= body["op_income"]["max"] < max_sales
+
+
+def test_invalid_distribution_is_rejected():
+    """分布パラメータが不足している場合は422を返す"""
+    response = client.post("/api/plans/montecarlo", json={
+        "type": "カフェ", "area": "駅近", "seats": 20, "atv": 900,
+        "distributions": {"turnover": {"dist": "triangular", "low": 1.0, "high": 2.0}}
+    })
+    assert response.status_code == 422
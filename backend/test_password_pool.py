@@ -0,0 +1,112 @@
+"""
+パスワード処理のスレッドプールと再ハッシュのテストコード
+
+実行方法:
+    python -m pytest test_password_pool.py
+"""
+
+import threading
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+import crud
+from auth import password
+from auth.password import PasswordHasherPool, PasswordPoolBusy
+from config import settings
+from database import SessionLocal
+from main import app
+
+client = TestClient(app)
+
+
+def test_pool_rejects_when_queue_is_full():
+    """実行中＋待機中が上限に達すると待たずにPasswordPoolBusyになる"""
+    pool = PasswordHasherPool(workers=1, queue_limit=1)
+    release = threading.Event()
+    running = [pool.submit(release.wait), pool.submit(release.wait)]
+    
+    with pytest.raises(PasswordPoolBusy):
+        pool.submit(release.wait)
+    assert pool.stats()["rejected"] == 1
+    
+    release.set()
+    for future in running:
+        future.result(timeout=5)
+    pool.submit(lambda: None).result(timeout=5)
+
+
+def test_login_returns_503_when_pool_is_busy(monkeypatch):
+    """パスワード処理が混雑している場合、ログインは503を返す"""
+    email = f"busy-{uuid.uuid4().hex[:8]}@example.com"
+    client.post("/api/auth/register", json={"email": email, "password": "password123"})
+    
+    def busy(*args):
+        raise PasswordPoolBusy()
+    monkeypatch.setattr(password.password_pool, "submit", busy)
+    
+    response = client.post("/api/auth/login", json={"email": email, "password": "password123"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_login_rehashes_when_cost_changes():
+    """コストの設定が変わると、ログイン成功時にハッシュが作り直される"""
+    email = f"rehash-{uuid.uuid4().hex[:8]}@example.com"
+    client.post("/api/auth/register", json={"email": email, "password": "password123"})
+    original_rounds = password.current_rounds()
+    
+    password.configure_rounds(original_rounds + 1)
+    try:
+        response = client.post("/api/auth/login", json={"email": email, "password": "password123"})
+        assert response.status_code == 200
+    finally:
+        password.configure_rounds(original_rounds)
+    
+    db = SessionLocal()
+    try:
+        user = crud.get_user_by_email(db, email)
+        assert password.hash_rounds(user.password_hash) == original_rounds + 1
+        assert password.verify_password("password123", user.password_hash)
+    finally:
+        db.close()
+    
+    wrong = client.post("/api/auth/login", json={"email": email, "password": "wrong-password"})
+    assert wrong.status_code == 401
+
+
+def test_calibrate_rounds_respects_bounds():
+    """計測したコストは指定した範囲に収まる"""
+    assert password.calibrate_rounds(0, min_rounds=4, max_rounds=6) == 4
+    assert password.calibrate_rounds(10 ** 9, min_rounds=4, max_rounds=6) == 6
+
+
+def test_calibration_never_goes_below_configured_rounds(monkeypatch):
+    """計測の結果が速くても、設定の bcrypt_rounds より弱いコストにはしない"""
+    monkeypatch.setattr(settings, "bcrypt_rounds", 5)
+    assert password.calibrate_rounds(0) == 5
+    assert password.calibrate_rounds(0, max_rounds=4) == 5
+
+
+def test_login_does_not_downgrade_stronger_hash():
+    """設定より強いコストで作られたハッシュは、ログインしても弱いコストで作り直されない"""
+    email = f"strong-{uuid.uuid4().hex[:8]}@example.com"
+    original_rounds = password.current_rounds()
+    
+    password.configure_rounds(original_rounds + 1)
+    try:
+        client.post("/api/auth/register", json={"email": email, "password": "password123"})
+    finally:
+        password.configure_rounds(original_rounds)
+    
+    assert not password.needs_rehash(password.hash_password("password123"))
+    response = client.post("/api/auth/login", json={"email": email, "password": "password123"})
+    assert response.status_code == 200
+    
+    db = SessionLocal()
+    try:
+        user = crud.get_user_by_email(db, email)
+        assert password.hash_rounds(user.password_hash) == original_rounds + 1
+    finally:
+        db.close()
@@ -0,0 +1,87 @@
+"""
+計算結果キャッシュのテストコード
+
+実行方法:
+    python -m pytest test_plan_cache.py
+"""
+
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+import crud
+from cache import TTLCache
+from config import settings
+from main import app
+
+client = TestClient(app)
+
+
+def test_ttl_cache_lru_eviction_and_expiry():
+    """件数上限でLRU順に追い出され、期限切れはミス扱いになる"""
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # aを最近使ったものにする
+    cache.set("c", 3)  # bが追い出される
+    assert cache.get("b") is None
+    cache.set("d", 4, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("d") is None
+    
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["evictions"] == 2
+    assert stats["expirations"] == 1
+
+
+def test_create_plan_calculates_once_and_reuses_cache(monkeypatch):
+    """プラン作成は1回だけ計算し、同じ入力の2回目以降はキャッシュを使う"""
+    calls = []
+    original = crud.calculate_business_plan
+    monkeypatch.setattr(crud, "calculate_business_plan", lambda p: calls.append(p) or original(p))
+    crud.plan_cache.clear()
+    
+    plan = {"type": "中華", "seats": 28, "atv": 1300, "hours": "11:00-22:00", "area": "オフィス街"}
+    first = client.post("/api/plans", json=plan)
+    second = client.post("/api/plans", json={**plan, "area": " オフィス街 "})
+    
+    assert first.status_code == second.status_code == 200
+    assert len(calls) == 1
+    assert second.json()["area"] == "オフィス街"
+    assert first.json()["catch_copy"] == second.json()["catch_copy"]
+    assert first.json()["id"] != second.json()["id"]
+
+
+def test_create_plan_calculates_outside_event_loop(monkeypatch):
+    """キャッシュにない入力の計算はイベントループではなくスレッドで実行される"""
+    loops = []
+    original = crud.calculate_business_plan
+    
+    def calculate(p):
+        try:
+            loops.append(asyncio.get_running_loop())
+        except RuntimeError:
+            loops.append(None)
+        return original(p)
+    
+    monkeypatch.setattr(crud, "calculate_business_plan", calculate)
+    crud.plan_cache.clear()
+    
+    plan = {"type": "和食", "seats": 19, "atv": 3100, "hours": "17:00-23:00", "area": "住宅街"}
+    response = client.post("/api/plans", json=plan)
+    
+    assert response.status_code == 200
+    assert loops == [None]
+
+
+def test_cache_stats_requires_admin_token(monkeypatch):
+    """キャッシュ統計は管理用トークンが必要"""
+    monkeypatch.setattr(settings, "admin_token", "secret")
+    assert client.get("/api/admin/cache/stats").status_code == 403
+    
+    response = client.get("/api/admin/cache/stats", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert {"hits", "misses", "evictions"} <= response.json()["plan_calculation"].keys()
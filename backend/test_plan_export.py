@@ -0,0 +1,140 @@
+"""
+プランのエクスポート（CSV / NDJSON）のテストコード
+
+実行方法:
+    python -m pytest test_plan_export.py
+"""
+
+import csv
+import io
+import json
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import export, models
+from config import settings
+from main import app
+
+client = TestClient(app)
+
+PLAN = {"type": "カフェ", "seats": 20, "atv": 1200, "hours": "10:00-20:00", "area": "駅近"}
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    # 複数回に分けて読み込む場合を確認するため、1回の読み込み件数を小さくする
+    monkeypatch.setattr(settings, "plan_export_chunk_size", 3)
+
+
+@pytest.fixture
+def user_headers():
+    response = client.post("/api/auth/register", json={"email": f"export-{uuid.uuid4().hex[:8]}@example.com", "password": "password123"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def create_plans(headers: dict, plans: list) -> list:
+    response = client.post("/api/plans/batch", json={"persist": True, "plans": plans}, headers=headers)
+    assert response.status_code == 200
+    return [item["result"]["id"] for item in response.json()["items"]]
+
+
+def export_ndjson(headers: dict, **params) -> list:
+    response = client.get("/api/plans/my/export", params={"format": "ndjson", **params}, headers=headers)
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"] == "application/x-ndjson"
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_export_streams_all_plans_as_csv(user_headers):
+    ids = create_plans(user_headers, [dict(PLAN, seats=10 + i) for i in range(10)])
+    ids.append(client.post("/api/plans", json=PLAN, headers=user_headers).json()["id"])
+    # 他のユーザーのプランは出力しない
+    client.post("/api/plans", json=PLAN)
+
+    response = client.get("/api/plans/my/export", headers=user_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert "plans.csv" in response.headers["content-disposition"]
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert tuple(rows[0].keys()) == export.COLUMNS
+    assert [int(row["id"]) for row in rows] == ids
+    assert [int(row["seats"]) for row in rows[:10]] == list(range(10, 20))
+    assert rows[0]["type"] == "カフェ"
+
+
+def test_export_ndjson_with_extended_fields(user_headers):
+    create_plans(user_headers, [PLAN, dict(PLAN, seats=40)])
+    [plain, _] = export_ndjson(user_headers)
+    assert "catch_copy" not in plain
+
+    records = export_ndjson(user_headers, extended="true")
+    assert len(records) == 2
+    for record in records:
+        assert set(record) == set(export.COLUMNS) | set(models.EXTENDED_FIELDS)
+        assert record["catch_copy"]
+        assert isinstance(record["menu_examples"], list)
+    detail = client.get(f"/api/plans/{records[0]['id']}", headers=user_headers).json()
+    assert records[0]["monthly_sales"] == detail["monthly_sales"]
+    assert records[0]["catch_copy"] == detail["catch_copy"]
+
+    # CSVではリストなどの値はJSON文字列として出力する
+    response = client.get("/api/plans/my/export", params={"extended": "true"}, headers=user_headers)
+    row = next(csv.DictReader(io.StringIO(response.text)))
+    assert isinstance(json.loads(row["menu_examples"]), list)
+
+
+def test_export_filters(user_headers):
+    create_plans(user_headers, [
+        dict(PLAN, type="カフェ", area="駅近"),
+        dict(PLAN, type="焼鳥", area="駅近"),
+        dict(PLAN, type="焼鳥", area="住宅街"),
+    ])
+    assert [r["type"] for r in export_ndjson(user_headers, type="焼鳥")] == ["焼鳥", "焼鳥"]
+    assert [(r["type"], r["area"]) for r in export_ndjson(user_headers, type="焼鳥", area="住宅街")] == [("焼鳥", "住宅街")]
+
+    now = datetime.utcnow()
+    assert len(export_ndjson(user_headers, created_from=(now - timedelta(hours=1)).isoformat())) == 3
+    assert export_ndjson(user_headers, created_from=(now + timedelta(hours=1)).isoformat()) == []
+    assert export_ndjson(user_headers, created_to=(now - timedelta(hours=1)).isoformat()) == []
+    # タイムゾーン付きの日時も指定できる
+    assert len(export_ndjson(user_headers, created_from=(now - timedelta(hours=1)).isoformat() + "+00:00")) == 3
+
+
+def test_export_without_plans_returns_header_only(user_headers):
+    response = client.get("/api/plans/my/export", headers=user_headers)
+    assert response.text == ",".join(export.COLUMNS) + "\n"
+    assert export_ndjson(user_headers) == []
+
+
+def test_export_requires_login_and_valid_format(user_headers):
+    assert client.get("/api/plans/my/export").status_code == 403
+    assert client.get("/api/plans/my/export", params={"format": "xml"}, headers=user_headers).status_code == 422
+
+
+def test_export_reads_in_chunks():
+    """DBからは chunk_size 件ずつ読み込み、読み込んだ分ごとに出力する"""
+    chunks = []
+
+    class Session:
+        def __init__(self):
+            from database import SessionLocal
+            self.db = SessionLocal()
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            self.db.close()
+
+        def execute(self, stmt):
+            chunks.append(stmt.get_execution_options().get("yield_per"))
+            return self.db.execute(stmt)
+
+    client.post("/api/plans/batch", json={"persist": True, "plans": [PLAN] * 7})
+    stmt = export.crud.plans_export_query().limit(7)
+    parts = list(export.iter_export(Session, stmt, "ndjson", chunk_size=3))
+    assert chunks == [3]
+    assert [part.count(b"\n") for part in parts] == [3, 3, 1]
@@ -0,0 +1,105 @@
+"""
+拡張フィールドの保存・取得のテストコード
+
+実行方法:
+    python -m pytest test_plan_extended.py
+"""
+
+from fastapi.testclient import TestClient
+from sqlalchemy import null, update
+
+import crud
+import manage
+import models
+import schemas
+import simulation
+from database import SessionLocal
+from main import app
+
+client = TestClient(app)
+
+PLAN = {"type": "洋食", "seats": 32, "atv": 1800, "hours": "11:00-22:00", "area": "住宅街"}
+
+
+def test_get_plan_returns_extended_fields():
+    """作成時の拡張フィールドが詳細・一覧でもそのまま返る"""
+    created = client.post("/api/plans", json=PLAN).json()
+    
+    detail = client.get(f"/api/plans/{created['id']}").json()
+    for key in ("catch_copy", "menu_examples", "staff_count", "initial_investment", "funding_methods"):
+        assert detail[key] is not None
+        assert detail[key] == created[key]
+    
+    listed = next(p for p in client.get("/api/plans", params={"limit": 100}).json() if p["id"] == created["id"])
+    assert listed["sns_strategy"] == created["sns_strategy"]
+
+
+def test_bulk_saved_plans_store_extended_fields(monkeypatch):
+    """一括保存したプランも作成時に拡張フィールドを保存し、読み込み時には計算・保存しない"""
+    response = client.post("/api/plans/batch", json={"plans": [PLAN], "persist": True})
+    plan_id = response.json()["items"][0]["result"]["id"]
+    created = client.post("/api/plans", json=PLAN).json()
+    
+    db = SessionLocal()
+    try:
+        db_plan = db.get(models.BusinessPlan, plan_id)
+        assert db_plan.extended["catch_copy"] == created["catch_copy"]
+        updated_at = db_plan.updated_at
+    finally:
+        db.close()
+    
+    monkeypatch.setattr(crud, "calculate_business_plan_cached", None)
+    detail = client.get(f"/api/plans/{plan_id}").json()
+    assert detail["menu_examples"] == created["menu_examples"]
+    db = SessionLocal()
+    try:
+        assert db.get(models.BusinessPlan, plan_id).updated_at == updated_at
+    finally:
+        db.close()
+
+
+def test_batch_extended_fields_match_scalar():
+    """一括計算の拡張フィールドは1件ずつの計算と同じ値"""
+    inputs = [
+        schemas.BusinessPlanInput(type=t, seats=seats, atv=1500, hours=hours, area=area)
+        for t, seats, hours, area in [
+            ("カフェ - 喫茶", 20, "8:00-18:00", "駅近"), ("焼鳥", 21, "17:00-24:00", "観光地"),
+            ("ラーメン", 40, "11:00-15:00", "オフィス街"), ("イタリアン", 41, "ランチのみ", "郊外"),
+            ("洋食", 1, "17:00-23:00", "住宅街"), ("カフェ", 123456789, "10:00-20:00", "駅近"),
+        ]
+    ]
+    expected = [crud.extended_fields(crud.calculate_business_plan(p)) for p in inputs]
+    assert simulation.calculate_extended_fields(inputs) == expected
+
+
+def test_batch_persist_does_not_use_plan_cache(monkeypatch):
+    """一括保存は計算結果のキャッシュを使わない（単発のプランのキャッシュを追い出さない）"""
+    monkeypatch.setattr(crud, "calculate_business_plan_cached", None)
+    monkeypatch.setattr(crud, "calculate_business_plan", None)
+    size = len(crud.plan_cache)
+    plans = [dict(PLAN, seats=100 + i) for i in range(5)]
+    response = client.post("/api/plans/batch", json={"plans": plans, "persist": True})
+    assert response.json()["succeeded"] == 5
+    assert len(crud.plan_cache) == size
+
+
+def test_fill_missing_extended_for_existing_plans():
+    """extended列の追加前のプランは manage.py fill-extended（マイグレーション）で保存する"""
+    plan_id = client.post("/api/plans", json=PLAN).json()["id"]
+    db = SessionLocal()
+    try:
+        expected = db.get(models.BusinessPlan, plan_id).extended
+        db.execute(update(models.BusinessPlan).where(models.BusinessPlan.id == plan_id).values(extended=null()))
+        db.commit()
+    finally:
+        db.close()
+    # 読み込みでは保存しない
+    assert client.get(f"/api/plans/{plan_id}").json()["catch_copy"] is None
+    
+    assert manage.main(["fill-extended"]) == 0
+    assert client.get(f"/api/plans/{plan_id}").json()["catch_copy"] == expected["catch_copy"]
+    db = SessionLocal()
+    try:
+        assert db.get(models.BusinessPlan, plan_id).extended == expected
+    finally:
+        db.close()
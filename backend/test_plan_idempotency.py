@@ -0,0 +1,161 @@
+"""
+プラン作成の再送信（Idempotency-Key・同じ入力）のテストコード
+
+実行方法:
+    python -m pytest test_plan_idempotency.py
+"""
+
+import time
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.exc import IntegrityError
+
+import crud, models, schemas
+from config import settings
+from database import SessionLocal
+from main import app
+from plan_writer import plan_writer
+
+client = TestClient(app)
+
+PLAN = {"type": "カフェ", "seats": 20, "atv": 1200, "hours": "10:00-20:00", "area": "駅近"}
+
+
+def plan_count() -> int:
+    with SessionLocal() as db:
+        return db.execute(select(func.count()).select_from(models.BusinessPlan)).scalar_one()
+
+
+@pytest.fixture
+def user_headers():
+    response = client.post("/api/auth/register", json={"email": f"idem-{uuid.uuid4().hex[:8]}@example.com", "password": "password123"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_idempotency_key_returns_existing_plan(user_headers):
+    headers = dict(user_headers, **{"Idempotency-Key": uuid.uuid4().hex})
+    first = client.post("/api/plans", json=PLAN, headers=headers)
+    assert first.status_code == 200
+    assert "idempotent-replayed" not in first.headers
+    count = plan_count()
+
+    retry = client.post("/api/plans", json=PLAN, headers=headers)
+    assert retry.status_code == 200
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert retry.json() == first.json()
+    assert plan_count() == count
+
+
+def test_idempotency_key_is_scoped_to_user(user_headers):
+    key = {"Idempotency-Key": uuid.uuid4().hex}
+    first = client.post("/api/plans", json=PLAN, headers=dict(user_headers, **key)).json()
+    anonymous = client.post("/api/plans", json=PLAN, headers=key).json()
+    assert anonymous["id"] != first["id"]
+    assert client.post("/api/plans", json=PLAN, headers=key).json()["id"] == anonymous["id"]
+
+
+def test_idempotency_key_reused_with_different_input(user_headers):
+    headers = dict(user_headers, **{"Idempotency-Key": uuid.uuid4().hex})
+    client.post("/api/plans", json=PLAN, headers=headers)
+    response = client.post("/api/plans", json=dict(PLAN, seats=21), headers=headers)
+    assert response.status_code == 422
+    # 正規化後に同じ入力なら同じプランを返す
+    response = client.post("/api/plans", json=dict(PLAN, type=" カフェ "), headers=headers)
+    assert response.status_code == 200
+
+
+def test_same_input_within_window(monkeypatch, user_headers):
+    # 既定では無効（同じ入力でも毎回保存する）
+    assert client.post("/api/plans", json=PLAN, headers=user_headers).json()["id"] != \
+        client.post("/api/plans", json=PLAN, headers=user_headers).json()["id"]
+
+    monkeypatch.setattr(settings, "plan_dedup_window", 60)
+    first = client.post("/api/plans", json=dict(PLAN, seats=33), headers=user_headers).json()
+    retry = client.post("/api/plans", json=dict(PLAN, seats=33), headers=user_headers)
+    assert retry.json()["id"] == first["id"]
+    assert retry.headers["idempotent-replayed"] == "true"
+    # 入力やユーザーが異なれば新しく保存する
+    assert client.post("/api/plans", json=dict(PLAN, seats=34), headers=user_headers).json()["id"] != first["id"]
+    assert client.post("/api/plans", json=dict(PLAN, seats=33)).json()["id"] != first["id"]
+
+
+def test_input_hash_and_window():
+    plan = schemas.BusinessPlanInput(**PLAN)
+    input_hash = crud.plan_input_hash(plan, None)
+    assert input_hash != crud.plan_input_hash(plan, 1)
+    assert input_hash != crud.plan_input_hash(schemas.BusinessPlanInput(**dict(PLAN, hours="11:00-20:00")), None)
+    with SessionLocal() as db:
+        db_plan = crud.create_business_plan(db, plan, input_hash=input_hash)
+        assert crud.find_existing_plan(db, None, input_hash, window=60).id == db_plan.id
+        assert crud.find_existing_plan(db, None, input_hash, window=0) is None
+        # 期間より前に保存したプランは対象外
+        time.sleep(0.05)
+        assert crud.find_existing_plan(db, None, input_hash, window=0.01) is None
+
+
+def test_window_matches_rows_with_server_default_created_at():
+    """DB側の既定値（NOW()）で created_at を入れたプランも、同じ基準の時刻で期間内と判定される"""
+    plan = schemas.BusinessPlanInput(**dict(PLAN, seats=21))
+    input_hash = crud.plan_input_hash(plan, None)
+    row = dict(crud.plan_row(plan, crud.calculate_business_plan(plan), None, input_hash), created_at=func.now())
+    with SessionLocal() as db:
+        plan_id = db.execute(insert(models.BusinessPlan).values(**row)).inserted_primary_key[0]
+        db.commit()
+        try:
+            assert crud.find_existing_plan(db, None, input_hash, window=60).id == plan_id
+        finally:
+            # SQLiteの CURRENT_TIMESTAMP は秒単位で、一覧の並び順のテストに影響するため削除する
+            db.execute(delete(models.BusinessPlan).where(models.BusinessPlan.id == plan_id))
+            db.commit()
+
+
+def test_idempotency_key_with_group_commit(monkeypatch, user_headers):
+    monkeypatch.setattr(settings, "plan_write_durability", "group_commit")
+    headers = dict(user_headers, **{"Idempotency-Key": uuid.uuid4().hex})
+    try:
+        first = client.post("/api/plans", json=PLAN, headers=headers).json()
+        retry = client.post("/api/plans", json=PLAN, headers=headers)
+    finally:
+        plan_writer.stop()
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert retry.json()["id"] == first["id"]
+
+
+@pytest.mark.parametrize("logged_in", [True, False])
+def test_concurrent_duplicate_key_returns_existing_plan(monkeypatch, user_headers, logged_in):
+    """確認後・保存前に同じキーのプランが保存された場合は、一意制約の違反後にそのプランを返す（未ログインでも同じ）"""
+    headers = dict(user_headers if logged_in else {}, **{"Idempotency-Key": uuid.uuid4().hex})
+    existing = client.post("/api/plans", json=PLAN, headers=headers).json()
+    find_existing_plan = crud.find_existing_plan
+    calls = []
+
+    def find_after_race(*args, **kwargs):
+        calls.append(args)
+        # 1回目の確認では、まだ保存されていなかったことにする
+        return None if len(calls) == 1 else find_existing_plan(*args, **kwargs)
+
+    monkeypatch.setattr(crud, "find_existing_plan", find_after_race)
+    count = plan_count()
+    response = client.post("/api/plans", json=PLAN, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["id"] == existing["id"]
+    assert len(calls) == 2
+    assert plan_count() == count
+
+
+def test_anonymous_idempotency_key_is_unique(user_headers):
+    """user_idがNULLの行でも、同じIdempotency-Keyは一意制約で1件に限られる"""
+    plan = schemas.BusinessPlanInput(**PLAN)
+    key = uuid.uuid4().hex
+    input_hash = crud.plan_input_hash(plan, None)
+    with SessionLocal() as db:
+        anonymous_id = crud.create_business_plan(db, plan, input_hash=input_hash, idempotency_key=key).id
+        with pytest.raises(IntegrityError):
+            crud.create_business_plan(db, plan, input_hash=input_hash, idempotency_key=key)
+    # ログインユーザーの同じキーとは重ならない
+    response = client.post("/api/plans", json=PLAN, headers=dict(user_headers, **{"Idempotency-Key": key}))
+    assert response.status_code == 200
+    assert response.json()["id"] != anonymous_id
@@ -0,0 +1,98 @@
+"""
+プラン一覧のキーセットページネーションのテストコード
+
+実行方法:
+    python -m pytest test_plan_pagination.py
+"""
+
+import uuid
+
+from fastapi.testclient import TestClient
+
+from main import app
+
+client = TestClient(app)
+
+
+def _register() -> dict:
+    response = client.post("/api/auth/register", json={
+        "email": f"pager-{uuid.uuid4().hex[:8]}@example.com",
+        "password": "password123"
+    })
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def _collect(path: str, headers: dict = None, limit: int = 10) -> list:
+    ids = []
+    cursor = None
+    while True:
+        params = {"limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get(path, params=params, headers=headers)
+        assert response.status_code == 200
+        ids.extend(plan["id"] for plan in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return ids
+
+
+def test_my_plans_are_scoped_to_user_and_paginated():
+    """/api/plans/my はログインユーザーのプランだけをカーソルで重複なく辿れる"""
+    headers = _register()
+    other_headers = _register()
+    plan = {"type": "カフェ", "seats": 12, "atv": 700, "hours": "8:00-18:00", "area": "住宅街"}
+    
+    mine = [client.post("/api/plans", json={**plan, "seats": 10 + i}, headers=headers).json()["id"] for i in range(23)]
+    client.post("/api/plans", json=plan, headers=other_headers)
+    client.post("/api/plans", json=plan)
+    
+    ids = _collect("/api/plans/my", headers)
+    assert ids == sorted(mine, reverse=True)
+
+
+def test_global_list_cursor_covers_all_plans():
+    """/api/plans のカーソルでも全件を新しい順に重複なく辿れる"""
+    plan = {"type": "和食", "seats": 18, "atv": 1500, "hours": "11:00-22:00", "area": "駅近"}
+    for _ in range(5):
+        client.post("/api/plans", json=plan)
+    
+    ids = _collect("/api/plans", limit=7)
+    assert len(ids) == len(set(ids))
+    assert ids == sorted(ids, reverse=True)
+    assert ids[:5] == _collect("/api/plans", limit=100)[:5]
+
+
+def test_global_list_excludes_user_plans():
+    """/api/plans は未ログインで作成したプランだけを返し、ログインユーザーのプランは含めない"""
+    headers = _register()
+    plan = {"type": "洋食", "seats": 22, "atv": 1800, "hours": "11:00-22:00", "area": "繁華街"}
+    mine = client.post("/api/plans", json=plan, headers=headers).json()["id"]
+    anonymous = client.post("/api/plans", json=plan).json()["id"]
+    
+    ids = _collect("/api/plans", limit=100)
+    assert anonymous in ids
+    assert mine not in ids
+
+
+def test_invalid_cursor_is_rejected():
+    """不正なカーソルは400を返す"""
+    response = client.get("/api/plans", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+def test_plan_detail_is_scoped_to_owner():
+    """/api/plans/{plan_id} は未ログインのプランと自分のプランだけを返し、他のユーザーのプランは404"""
+    headers = _register()
+    other_headers = _register()
+    plan = {"type": "洋食", "seats": 22, "atv": 1800, "hours": "11:00-22:00", "area": "繁華街"}
+    mine = client.post("/api/plans", json=plan, headers=headers).json()["id"]
+    anonymous = client.post("/api/plans", json=plan).json()["id"]
+    
+    assert client.get(f"/api/plans/{mine}", headers=headers).status_code == 200
+    assert client.get(f"/api/plans/{mine}", headers=other_headers).status_code == 404
+    assert client.get(f"/api/plans/{mine}").status_code == 404
+    assert client.get(f"/api/plans/{anonymous}").status_code == 200
+    assert client.get(f"/api/plans/{anonymous}", headers=headers).status_code == 200
+    assert client.get(f"/api/plans/{mine}", headers={"Authorization": "Bearer invalid"}).status_code == 401
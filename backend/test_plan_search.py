@@ -0,0 +1,144 @@
+"""
+プランの全文検索のテストコード
+
+実行方法:
+    python -m pytest test_plan_search.py
+"""
+
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+import manage, models, search
+from config import settings
+from database import SessionLocal, engine
+from main import app
+
+client = TestClient(app)
+
+ADMIN = {"X-Admin-Token": "search-secret"}
+
+
+@pytest.fixture(autouse=True)
+def admin_token(monkeypatch):
+    monkeypatch.setattr(settings, "admin_token", "search-secret")
+
+
+def marker() -> str:
+    # テスト間で検索結果が重ならないよう、検索語に毎回異なる文字列を含める
+    return f"検索{uuid.uuid4().hex[:8]}"
+
+
+def create_plan(**overrides) -> int:
+    plan = dict({"type": "カフェ", "seats": 20, "atv": 1200, "hours": "10:00-20:00", "area": "駅近"}, **overrides)
+    response = client.post("/api/plans", json=plan)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def set_text(plan_id: int, **values):
+    with SessionLocal() as db:
+        db_plan = db.get(models.BusinessPlan, plan_id)
+        for name, value in values.items():
+            setattr(db_plan, name, value)
+        db.commit()
+
+
+def search_plans(q: str, **params) -> dict:
+    response = client.get("/api/admin/plans/search", params=dict(params, q=q), headers=ADMIN)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_index_is_created_by_migration():
+    with engine.connect() as connection:
+        assert search.has_index(connection)
+
+
+def test_new_and_updated_plans_are_searchable():
+    word = marker()
+    plan_id = create_plan(type=f"{word}食堂")
+    result = search_plans(word)
+    assert result["indexed"] is True
+    assert [item["id"] for item in result["items"]] == [plan_id]
+    assert result["items"][0]["type"] == f"{word}食堂"
+
+    # 更新したコンセプトは新しい文字列で検索でき、古い文字列では見つからない
+    other = marker()
+    set_text(plan_id, concept=f"{other}をテーマにした店")
+    assert [item["id"] for item in search_plans(other)["items"]] == [plan_id]
+    assert search_plans(f"{other} {word}")["total"] == 1
+    set_text(plan_id, concept="通常のコンセプト")
+    assert search_plans(other)["total"] == 0
+
+    # 削除したプランは見つからない
+    with SessionLocal() as db:
+        db.delete(db.get(models.BusinessPlan, plan_id))
+        db.commit()
+    assert search_plans(word)["total"] == 0
+
+
+def test_results_are_ranked_and_paginated():
+    word = marker()
+    ids = [create_plan() for _ in range(5)]
+    for plan_id in ids:
+        set_text(plan_id, action=f"{word}を準備する")
+    # 複数の列に含まれるプランを上位にする
+    set_text(ids[2], concept=f"{word}の店", type=f"{word}カフェ")
+
+    first = search_plans(word, limit=2)
+    assert first["total"] == 5
+    assert [item["id"] for item in first["items"]][0] == ids[2]
+    scores = [item["score"] for item in first["items"]]
+    assert scores == sorted(scores, reverse=True)
+
+    rest = search_plans(word, limit=2, offset=2)["items"] + search_plans(word, limit=2, offset=4)["items"]
+    found = [item["id"] for item in first["items"] + rest]
+    assert sorted(found) == sorted(ids)
+    # スコアが同じ場合は新しい順
+    assert found[1:] == sorted(ids[:2] + ids[3:], reverse=True)
+
+
+def test_short_terms_and_special_characters():
+    word = marker()
+    plan_id = create_plan()
+    set_text(plan_id, concept=f"{word}の朝食と100%果汁")
+    # trigramで検索できない2文字の語は、ほかの語の結果をLIKEで絞り込む
+    assert [item["id"] for item in search_plans(f"{word} 朝食")["items"]] == [plan_id]
+    assert search_plans(f"{word} 夕食")["total"] == 0
+    assert search_plans(f"{word}　100%")["total"] == 1
+    assert search_plans(f"{word} 0%果")["total"] == 1
+    assert search_plans(f"{word} _")["total"] == 0
+    # 引用符を含む語でもエラーにならない
+    assert search_plans(f'"{word}')["total"] == 0
+
+
+def test_rebuild_restores_index():
+    word = marker()
+    plan_id = create_plan(type=f"{word}食堂")
+    with engine.begin() as connection:
+        connection.execute(text(f"INSERT INTO {search.FTS_TABLE}({search.FTS_TABLE}) VALUES ('delete-all')"))
+    assert search_plans(word)["total"] == 0
+
+    assert manage.main(["rebuild-search"]) == 0
+    assert [item["id"] for item in search_plans(word)["items"]] == [plan_id]
+
+
+def test_search_validation_and_auth():
+    assert client.get("/api/admin/plans/search", params={"q": "カフェ"}).status_code in (401, 403)
+    assert client.get("/api/admin/plans/search", params={"q": "   "}, headers=ADMIN).status_code == 400
+    assert client.get("/api/admin/plans/search", params={"q": "カフェ", "limit": 0}, headers=ADMIN).status_code == 422
+    assert client.get("/api/admin/plans/search", headers=ADMIN).status_code == 422
+
+
+def test_like_fallback_without_index():
+    word = marker()
+    plan_id = create_plan()
+    set_text(plan_id, concept=f"{word}の店")
+    source, where, score, _, params = search._conditions("postgresql", False, [word])
+    assert source == "business_plans" and score == "0" and "match" not in params
+    with SessionLocal() as db:
+        ids = db.execute(text(f"SELECT id FROM {source} WHERE {where}"), params).scalars().all()
+    assert ids == [plan_id]
@@ -0,0 +1,117 @@
+"""
+損益分岐・目標利益の逆算のテストコード
+
+実行方法:
+    python -m pytest test_plan_solver.py
+"""
+
+import math
+
+import pytest
+from fastapi.testclient import TestClient
+
+import crud, schemas, solver
+from main import app
+
+client = TestClient(app)
+
+
+def plan(type: str, seats: int, atv: int, turnover: float = crud.BASE_TURNOVER) -> dict:
+    """calculate_business_plan と同じ式で、回転数も指定して計算する"""
+    daily_guests = round(seats * turnover * crud.GUEST_RATE)
+    monthly_sales = atv * daily_guests * crud.BUSINESS_DAYS
+    op_income = (monthly_sales - round(monthly_sales * crud.get_cogs_rate(type))
+                 - round(monthly_sales * crud.LABOR_RATE) - crud.FIXED_COST)
+    opening_cost = crud.calculate_opening_cost(crud.calculate_initial_investment(seats, type))
+    return {"op_income": op_income, "opening_cost": opening_cost}
+
+
+def meets(result: dict, values: dict) -> bool:
+    if result["target_type"] == "op_income":
+        return values["op_income"] >= result["target"]
+    return values["op_income"] > 0 and math.ceil(values["opening_cost"] / values["op_income"]) <= result["target"]
+
+
+def test_scalar_model_matches_crud():
+    calc = crud.calculate_business_plan(schemas.BusinessPlanInput(type="焼鳥", seats=33, atv=2800, hours="17:00-24:00", area="駅近"))
+    assert plan("焼鳥", 33, 2800) == {"op_income": calc["op_income"], "opening_cost": calc["opening_cost"]}
+
+
+@pytest.mark.parametrize("type", ["カフェ", "焼鳥", "ラーメン"])
+def test_seats_are_minimal(type):
+    targets = [-600000, -540000, 0, 1, 123457, 300000, 999999]
+    paybacks = [6, 12, 24, 60]
+    results = solver.solve(type, "seats", atv=1500, target_op_income=targets, target_payback_months=paybacks)
+    assert [r["target"] for r in results] == targets + paybacks
+    for result in results:
+        assert result["feasible"], result
+        seats = result["seats"]
+        assert meets(result, plan(type, seats, 1500))
+        if seats > 1:
+            assert not meets(result, plan(type, seats - 1, 1500))
+        assert result["op_income"] == plan(type, seats, 1500)["op_income"]
+
+
+@pytest.mark.parametrize("type,atv,turnover,target", [
+    ("カフェ", 373, 0.622, 43),
+    ("カフェ", 1500, 2.0, 18),
+    ("焼鳥", 800, 1.3, 30),
+    ("ラーメン", 950, 0.75, 60),
+])
+def test_seats_for_payback_match_brute_force(type, atv, turnover, target):
+    """回収月数は席数に対して単調でない（開業費も席数で増える）ため、全探索の最小値と比べる"""
+    [result] = solver.solve(type, "seats", atv=atv, turnover=turnover, target_payback_months=[target])
+    expected = next(
+        (seats for seats in range(1, solver.UPPER["seats"] + 1) if meets(result, plan(type, seats, atv, turnover))),
+        None
+    )
+    assert result["seats"] == expected
+    assert result["feasible"] is (expected is not None)
+
+
+def test_atv_is_minimal():
+    results = solver.solve("カフェ", "atv", seats=25, target_op_income=[0, 250000, 777777], target_payback_months=[10, 30])
+    for result in results:
+        atv = result["atv"]
+        assert meets(result, plan("カフェ", 25, atv))
+        assert not meets(result, plan("カフェ", 25, atv - 1))
+
+
+def test_turnover_is_minimal_in_thousandths():
+    results = solver.solve("イタリアン", "turnover", seats=30, atv=2500, target_op_income=[0, 500000], target_payback_months=[18])
+    for result in results:
+        turnover = result["turnover"]
+        assert meets(result, plan("イタリアン", 30, 2500, turnover))
+        assert not meets(result, plan("イタリアン", 30, 2500, round(turnover - 0.001, 3)))
+
+
+def test_unreachable_targets_are_reported():
+    results = solver.solve("カフェ", "seats", atv=500, target_op_income=[10 ** 11], target_payback_months=[1])
+    for result in results:
+        assert result["feasible"] is False
+        assert result["seats"] is None and result["op_income"] is None
+
+
+def test_solve_endpoint():
+    response = client.post("/api/plans/solve", json={
+        "type": "カフェ", "area": "駅近", "solve_for": "seats", "atv": 1200,
+        "target_op_income": [0, 300000], "target_payback_months": [24]
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert body["solve_for"] == "seats"
+    assert [r["target_type"] for r in body["results"]] == ["op_income", "op_income", "payback_months"]
+
+    # 求めた席数でプランを作成すると目標を満たす
+    seats = body["results"][1]["seats"]
+    created = client.post("/api/plans", json={"type": "カフェ", "seats": seats, "atv": 1200, "hours": "10:00-20:00", "area": "駅近"}).json()
+    assert created["op_income"] >= 300000
+    assert created["op_income"] == body["results"][1]["op_income"]
+
+
+def test_solve_endpoint_validation():
+    base = {"type": "カフェ", "area": "駅近", "solve_for": "atv", "target_op_income": [0]}
+    assert client.post("/api/plans/solve", json=base).status_code == 400  # seatsがない
+    assert client.post("/api/plans/solve", json=dict(base, seats=20, target_op_income=[])).status_code == 400
+    assert client.post("/api/plans/solve", json=dict(base, seats=20, target_payback_months=[0])).status_code == 422
+    assert client.post("/api/plans/solve", json=dict(base, seats=20, solve_for="hours")).status_code == 422
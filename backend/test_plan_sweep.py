@@ -0,0 +1,103 @@
+"""
+感度分析グリッド（POST /api/plans/sweep）のテストコード
+
+実行方法:
+    python -m pytest test_plan_sweep.py
+"""
+
+import io
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+import crud
+import schemas
+import simulation
+from main import app
+
+client = TestClient(app)
+
+
+def test_sweep_grid_matches_scalar_model():
+    """グリッドの各セルが1件ずつの計算結果と一致する"""
+    response = client.post("/api/plans/sweep", json={
+        "type": "焼鳥",
+        "area": "駅近",
+        "seats": {"start": 10, "stop": 30, "step": 10},
+        "atv": {"start": 2000, "stop": 4000, "step": 1000},
+        "fields": ["monthly_sales", "op_income", "payback_months"]
+    })
+    assert response.status_code == 200
+    body = response.json()
+    
+    assert body["dims"] == ["seats", "atv", "turnover", "cogs_rate"]
+    assert body["shape"] == [3, 3, 1, 1]
+    assert body["axes"]["cogs_rate"] == [0.32]
+    
+    op_income = np.array(body["columns"]["op_income"]).reshape(body["shape"])
+    for i, seats in enumerate(body["axes"]["seats"]):
+        for j, atv in enumerate(body["axes"]["atv"]):
+            expected = crud.calculate_business_plan(
+                schemas.BusinessPlanInput(type="焼鳥", seats=seats, atv=atv, hours="", area="駅近")
+            )
+            assert op_income[i, j, 0, 0] == expected["op_income"]
+
+
+def test_sweep_npz_format():
+    """npz形式では軸と列データがNumPy配列で返る"""
+    response = client.post("/api/plans/sweep", json={
+        "type": "カフェ",
+        "area": "住宅街",
+        "seats": {"start": 10, "stop": 109},
+        "atv": {"start": 500, "stop": 1490, "step": 10},
+        "turnover": {"start": 1.0, "stop": 3.0, "step": 0.25},
+        "cogs_rate": {"start": 0.25, "stop": 0.35, "step": 0.05},
+        "format": "npz"
+    })
+    assert response.status_code == 200
+    data = np.load(io.BytesIO(response.content))
+    
+    assert data["op_income"].shape == (100, 100, 9, 3)
+    assert data["axis_turnover"].tolist() == [1.0, 1.25, 1.5, 1.75, 2.0, 2.25, 2.5, 2.75, 3.0]
+    assert set(np.unique(data["payback_months"])) <= {18, 24}
+
+
+def test_float_range_size_matches_expanded_axis():
+    for start, stop, step in [(1.0, 2.0, 0.4), (0.0, 1.0, 0.4), (1.0, 3.0, 0.25), (0.1, 0.3, 0.1), (2.0, 2.0, 0.5)]:
+        axis = schemas.SweepFloatRange(start=start, stop=stop, step=step)
+        assert axis.size == len(simulation.expand_range(start, stop, step, np.float64))
+    
+    # セル数の確認に使う値の数と、実際に返す軸の長さが一致する
+    response = client.post("/api/plans/sweep", json={
+        "type": "カフェ",
+        "area": "駅近",
+        "seats": {"start": 10, "stop": 20, "step": 10},
+        "atv": {"start": 1000, "stop": 1000},
+        "turnover": {"start": 1.0, "stop": 2.0, "step": 0.4}
+    })
+    assert response.status_code == 200
+    assert response.json()["axes"]["turnover"] == [1.0, 1.4, 1.8]
+
+
+def test_sweep_rejects_tiny_or_non_finite_step():
+    base = {"type": "カフェ", "area": "駅近", "seats": {"start": 10, "stop": 20}, "atv": {"start": 1000, "stop": 1000}}
+    for turnover in ({"start": 1.0, "stop": 2.0, "step": 1e-320}, {"start": 1.0, "stop": 2.0, "step": 1e-12}):
+        assert client.post("/api/plans/sweep", json=dict(base, turnover=turnover)).status_code == 422
+    # JSONにはinf・nanを書けないため、スキーマで直接確認する
+    for values in ({"start": 0.0, "stop": float("inf"), "step": 0.1}, {"start": 0.0, "stop": 1.0, "step": float("nan")}):
+        try:
+            schemas.SweepFloatRange(**values)
+        except ValueError:
+            continue
+        raise AssertionError(values)
+
+
+def test_sweep_rejects_oversized_grid():
+    """上限を超えるグリッドは配列を確保する前に400を返す"""
+    response = client.post("/api/plans/sweep", json={
+        "type": "カフェ",
+        "area": "駅近",
+        "seats": {"start": 1, "stop": 100000},
+        "atv": {"start": 1, "stop": 100000}
+    })
+    assert response.status_code == 400
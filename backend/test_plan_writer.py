@@ -0,0 +1,115 @@
+"""
+プラン保存のグループコミットのテストコード
+
+実行方法:
+    python -m pytest test_plan_writer.py
+"""
+
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import crud, models, schemas
+from config import settings
+from database import SessionLocal
+from main import app
+from plan_writer import PlanWriter, PlanWriterBusy, plan_writer
+
+client = TestClient(app)
+
+PLAN = {"type": "カフェ", "seats": 20, "atv": 1200, "hours": "10:00-20:00", "area": "駅近"}
+
+
+def make_row(**overrides) -> dict:
+    plan = schemas.BusinessPlanInput(**PLAN)
+    row = crud.plan_row(plan, crud.calculate_business_plan_cached(plan))
+    row.update(overrides)
+    return row
+
+
+def test_concurrent_inserts_are_grouped():
+    """同時に届いた保存はまとめてコミットされ、それぞれに採番されたIDが返る"""
+    writer = PlanWriter(SessionLocal, batch_size=50, max_delay=0.05, queue_limit=100)
+    futures = []
+    
+    def submit():
+        futures.append(writer.submit(make_row()))
+    threads = [threading.Thread(target=submit) for _ in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    
+    plan_ids = [future.result(timeout=5) for future in futures]
+    writer.stop()
+    assert len(set(plan_ids)) == 20
+    assert writer.stats()["batches"] < 20
+    
+    db = SessionLocal()
+    try:
+        saved = db.query(models.BusinessPlan).filter(models.BusinessPlan.id.in_(plan_ids)).count()
+    finally:
+        db.close()
+    assert saved == 20
+
+
+def test_full_queue_is_rejected():
+    """保存待ちが上限に達すると待たずにPlanWriterBusyになる"""
+    release = threading.Event()
+    
+    def blocked_session():
+        release.wait(5)
+        return SessionLocal()
+    writer = PlanWriter(blocked_session, batch_size=1, max_delay=0, queue_limit=1)
+    first = writer.submit(make_row())
+    # 1件目が書き込みスレッドに取り出されるまで待つ
+    while writer.stats()["queued"]:
+        time.sleep(0.01)
+    second = writer.submit(make_row())
+    with pytest.raises(PlanWriterBusy):
+        writer.submit(make_row())
+    assert writer.stats()["rejected"] == 1
+    
+    release.set()
+    assert first.result(timeout=5) != second.result(timeout=5)
+    writer.stop()
+
+
+def test_stop_drains_queue():
+    """停止時は受け付け済みの保存をすべてコミットする"""
+    writer = PlanWriter(SessionLocal, batch_size=100, max_delay=10, queue_limit=100)
+    futures = [writer.submit(make_row()) for _ in range(5)]
+    started = time.monotonic()
+    writer.stop()
+    assert time.monotonic() - started < 5
+    assert all(future.done() and future.result() for future in futures)
+
+
+def test_invalid_row_does_not_fail_batch():
+    """同じバッチ内の不正なデータは、そのリクエストだけがエラーになる"""
+    writer = PlanWriter(SessionLocal, batch_size=10, max_delay=0.2, queue_limit=10)
+    good = writer.submit(make_row())
+    bad = writer.submit(make_row(type=None))
+    assert good.result(timeout=5) > 0
+    with pytest.raises(Exception):
+        bad.result(timeout=5)
+    writer.stop()
+    assert writer.stats()["failed"] == 1
+
+
+def test_create_plan_with_group_commit(monkeypatch):
+    """group_commitでもAPIは保存済みのIDを返す"""
+    monkeypatch.setattr(settings, "plan_write_durability", "group_commit")
+    try:
+        response = client.post("/api/plans", json=PLAN)
+        assert response.status_code == 200
+        created = response.json()
+        assert created["initial_investment"] > 0
+    finally:
+        plan_writer.stop()
+    
+    fetched = client.get(f"/api/plans/{created['id']}").json()
+    assert fetched["monthly_sales"] == created["monthly_sales"]
+    assert fetched["created_at"].startswith(created["created_at"][:19])
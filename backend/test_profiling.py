@@ -0,0 +1,74 @@
+"""
+リクエスト単位のプロファイル記録のテストコード
+
+実行方法:
+    python -m pytest test_profiling.py
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from config import settings
+from main import app
+
+client = TestClient(app)
+
+ADMIN_TOKEN = "test-admin-token"
+ADMIN = {"X-Admin-Token": ADMIN_TOKEN}
+PLAN = {"type": "カフェ", "seats": 20, "atv": 1200, "hours": "10:00-20:00", "area": "駅近"}
+
+
+@pytest.fixture(autouse=True)
+def profile_settings(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "admin_token", ADMIN_TOKEN)
+    monkeypatch.setattr(settings, "profile_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "profile_sample_rate", 0.0)
+
+
+def list_profiles() -> list:
+    return client.get("/api/admin/profiles", headers=ADMIN).json()["profiles"]
+
+
+def test_profile_header_requires_admin_token():
+    """X-Profileヘッダーだけでは記録せず、管理用トークンが必要"""
+    response = client.post("/api/plans", json=PLAN, headers={"X-Profile": "1"})
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+    response = client.post("/api/plans", json=PLAN, headers={"X-Profile": "1", "X-Admin-Token": "wrong"})
+    assert "X-Profile-Id" not in response.headers
+    assert list_profiles() == []
+
+
+def test_profiled_request_is_saved_as_speedscope():
+    """記録したプロファイルは一覧に表示され、speedscope形式でダウンロードできる"""
+    response = client.post("/api/plans", json=PLAN, headers={"X-Profile": "1", **ADMIN})
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+    
+    profiles = list_profiles()
+    assert len(profiles) == 1
+    name = profiles[0]["name"]
+    assert profile_id in name and "POST_api_plans" in name
+    
+    data = client.get(f"/api/admin/profiles/{name}", headers=ADMIN).json()
+    assert data["$schema"] == "https://www.speedscope.app/file-format-schema.json"
+    frame_count = len(data["shared"]["frames"])
+    for profile in data["profiles"]:
+        assert profile["type"] == "sampled"
+        assert len(profile["samples"]) == len(profile["weights"])
+        assert all(0 <= index < frame_count for stack in profile["samples"] for index in stack)
+
+
+def test_sample_rate_and_file_limit(monkeypatch):
+    """サンプリング率で選ばれたリクエストも記録し、保存数は上限までに制限する"""
+    monkeypatch.setattr(settings, "profile_sample_rate", 1.0)
+    monkeypatch.setattr(settings, "profile_max_files", 2)
+    for _ in range(3):
+        assert "X-Profile-Id" in client.get("/health").headers
+    assert len(list_profiles()) == 2
+
+
+def test_download_rejects_invalid_names():
+    assert client.get("/api/admin/profiles/..%2F..%2Fetc%2Fpasswd", headers=ADMIN).status_code == 404
+    assert client.get("/api/admin/profiles/unknown.speedscope.json", headers=ADMIN).status_code == 404
+    assert client.get("/api/admin/profiles").status_code == 403
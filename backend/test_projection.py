@@ -0,0 +1,143 @@
+"""
+月次キャッシュフロー予測のテストコード
+
+実行方法:
+    python -m pytest test_projection.py
+"""
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import null, update
+
+import crud, models, projection, schemas
+from database import SessionLocal
+from main import app
+
+client = TestClient(app)
+
+PLAN = {"type": "カフェ", "seats": 20, "atv": 1200, "hours": "10:00-20:00", "area": "駅近"}
+
+
+def reference_projection(monthly_sales, cogs_rate, opening_cost, start_month=4, loan_ratio=0.5,
+                         loan_annual_rate=0.02, loan_term_months=60, horizon=60):
+    """1プラン・1か月ずつ計算する参照実装"""
+    loan = round(opening_cost * loan_ratio)
+    rate = loan_annual_rate / 12
+    payment = loan * rate / (1 - (1 + rate) ** -loan_term_months) if rate else loan / loan_term_months
+    balance = loan
+    cash = crud.WORKING_CAPITAL
+    cumulative = -opening_cost
+    payback = None
+    cash_balances = []
+    for month in range(horizon):
+        ramp = projection.RAMP_START + (1 - projection.RAMP_START) * min(1.0, month / projection.RAMP_MONTHS)
+        sales = monthly_sales * ramp * projection.SEASONALITY[(start_month - 1 + month) % 12]
+        op_income = sales * (1 - cogs_rate - crud.LABOR_RATE) - crud.FIXED_COST
+        paid = interest = 0.0
+        if month < loan_term_months:
+            interest = balance * rate
+            paid = payment
+            balance -= payment - interest
+        cash += op_income - paid
+        cumulative += op_income - interest
+        cash_balances.append(cash)
+        if payback is None and cumulative >= 0:
+            payback = month + 1
+    return payback, cash_balances, cumulative
+
+
+def calc(**overrides) -> dict:
+    return crud.calculate_business_plan(schemas.BusinessPlanInput(**dict(PLAN, **overrides)))
+
+
+def test_opening_costs_match_scalar_calculation():
+    seats = [1, 20, 35, 120]
+    types = ["カフェ", "焼鳥", "ラーメン", "未知の業態"]
+    expected = [crud.calculate_opening_cost(crud.calculate_initial_investment(s, t)) for s, t in zip(seats, types)]
+    assert projection.opening_costs_for(seats, types).tolist() == expected
+
+
+def test_loan_schedule_repays_principal():
+    for rate in (0.0, 0.02, 0.15):
+        payment, interest = projection.loan_schedule([1_000_000, 5_000_000], rate, 36, horizon=60)
+        principal_paid = (payment - interest).sum(axis=1)
+        assert principal_paid == pytest.approx([1_000_000, 5_000_000])
+        assert (payment[:, 36:] == 0).all() and (interest[:, 36:] == 0).all()
+
+
+def test_vectorized_projection_matches_reference():
+    plans = [calc(seats=s, atv=a, type=t) for s, a, t in [(20, 1200, "カフェ"), (40, 3000, "焼鳥"), (12, 900, "ラーメン"), (80, 5000, "イタリアン")]]
+    options = {"start_month": 11, "loan_ratio": 0.7, "loan_annual_rate": 0.03, "loan_term_months": 48}
+    arrays = projection.project_cash_flows(
+        [p['monthly_sales'] for p in plans], [p['cogs_rate'] for p in plans], [p['opening_cost'] for p in plans], **options
+    )
+    assert arrays['cash_balance'].shape == (4, projection.HORIZON_MONTHS)
+    for i, p in enumerate(plans):
+        payback, cash_balances, cumulative = reference_projection(p['monthly_sales'], p['cogs_rate'], p['opening_cost'], **options)
+        assert arrays['cash_balance'][i] == pytest.approx(cash_balances, abs=1)
+        assert arrays['cumulative_cash'][i, -1] == pytest.approx(cumulative, abs=1)
+        assert (arrays['payback_month'][i] if arrays['payback_month'][i] > 0 else None) == payback
+        assert arrays['min_cash_balance'][i] == arrays['cash_balance'][i].min()
+        assert arrays['min_cash_month'][i] == np.argmin(arrays['cash_balance'][i]) + 1
+
+
+def test_payback_month_is_first_recovery_month():
+    profitable, loss = calc(seats=60, atv=3000), calc(seats=5, atv=500)
+    [p, l] = projection.project_plans(
+        [60, 5], ["カフェ", "カフェ"], [profitable['monthly_sales'], loss['monthly_sales']], [profitable['cogs_rate'], loss['cogs_rate']]
+    )
+    assert p['payback_month'] is not None and 1 <= p['payback_month'] <= projection.HORIZON_MONTHS
+    assert l['payback_month'] is None
+    assert l['min_cash_balance'] < 0
+    assert len(p['net_cash_flow']) == len(p['cash_balance']) == projection.HORIZON_MONTHS
+
+
+def test_batch_includes_projection_when_requested():
+    plans = [PLAN, dict(PLAN, seats=60, atv=3000), {"type": "カフェ"}]
+    response = client.post("/api/plans/batch", json={"plans": plans, "projection": True, "projection_options": {"start_month": 1}})
+    assert response.status_code == 200
+    items = response.json()["items"]
+    assert items[2]["ok"] is False
+    expected = projection.project_plans(
+        [20, 60], ["カフェ", "カフェ"],
+        [items[0]["result"]["monthly_sales"], items[1]["result"]["monthly_sales"]],
+        [items[0]["result"]["cogs_rate"], items[1]["result"]["cogs_rate"]],
+        start_month=1
+    )
+    assert [item["result"]["projection"] for item in items[:2]] == expected
+
+    plain = client.post("/api/plans/batch", json={"plans": [PLAN]}).json()
+    assert plain["items"][0]["result"]["projection"] is None
+
+    invalid = client.post("/api/plans/batch", json={"plans": [PLAN], "projection": True, "projection_options": {"start_month": 13}})
+    assert invalid.status_code == 422
+
+
+def test_plan_list_includes_projection_when_requested():
+    created = client.post("/api/plans", json=dict(PLAN, seats=60, atv=3000)).json()
+    [row] = client.get("/api/plans", params={"limit": 1}).json()
+    assert "projection" not in row
+
+    [row] = client.get("/api/plans", params={"limit": 1, "projection": "true"}).json()
+    assert row["id"] == created["id"]
+    [expected] = projection.project_plans(
+        [60], ["カフェ"], [created["monthly_sales"]], [created["cogs_rate"]], opening_cost=[created["opening_cost"]]
+    )
+    assert row["projection"] == expected
+
+
+def test_plan_list_projection_without_extended():
+    """extended列が未保存のプランは、開業費を席数・業態から計算して予測する"""
+    created = client.post("/api/plans", json=dict(PLAN, seats=45, atv=2200)).json()
+    with SessionLocal() as db:
+        db.execute(update(models.BusinessPlan).where(models.BusinessPlan.id == created["id"]).values(extended=null()))
+        db.commit()
+
+    [row] = client.get("/api/plans", params={"limit": 1, "projection": "true"}).json()
+    assert row["id"] == created["id"]
+    assert row["opening_cost"] is None
+    [expected] = projection.project_plans(
+        [45], ["カフェ"], [created["monthly_sales"]], [created["cogs_rate"]], opening_cost=[created["opening_cost"]]
+    )
+    assert row["projection"] == expected
@@ -0,0 +1,66 @@
+"""
+レスポンスの高速シリアライズ処理のテストコード
+
+実行方法:
+    python -m pytest test_serialization.py
+"""
+
+import json
+from datetime import datetime, timezone
+
+from fastapi.testclient import TestClient
+
+import crud, models, schemas, serialization
+from main import app
+
+client = TestClient(app)
+
+PLAN = {"type": "カフェ", "seats": 20, "atv": 1200, "hours": "10:00-20:00", "area": "駅近"}
+
+
+def build_plan(**overrides) -> models.BusinessPlan:
+    plan = schemas.BusinessPlanInput(**PLAN)
+    calc = crud.calculate_business_plan(plan)
+    columns = {c.name for c in models.BusinessPlan.__table__.columns}
+    fields = {k: v for k, v in calc.items() if k in columns and k not in plan.model_fields}
+    fields.update(id=1, created_at=datetime(2024, 1, 1, 12, 30, 0, 123456), extended=crud.extended_fields(calc))
+    fields.update(overrides)
+    return models.BusinessPlan(**plan.model_dump(), **fields)
+
+
+def pydantic_json(db_plan) -> bytes:
+    return schemas.BusinessPlanOutput.model_validate(db_plan).model_dump_json().encode("utf-8")
+
+
+def test_fast_path_matches_pydantic_output():
+    """高速パスの出力はresponse_modelを通した場合とバイト列まで一致する"""
+    db_plan = build_plan()
+    assert serialization.dumps(serialization.plan_dict(db_plan)) == pydantic_json(db_plan)
+
+
+def test_fast_path_matches_pydantic_edge_cases():
+    """拡張フィールドなし・タイムゾーン付き日時・整数で保存された率も同じ出力になる"""
+    db_plan = build_plan(created_at=datetime(2024, 1, 1, tzinfo=timezone.utc))
+    assert serialization.dumps(serialization.plan_dict(db_plan)) == pydantic_json(db_plan)
+    
+    db_plan.extended = {"seat_occupancy_rate": 1, "menu_examples": []}
+    assert serialization.dumps(serialization.plan_dict(db_plan)) == pydantic_json(db_plan)
+    
+    db_plan.extended = None
+    assert serialization.dumps(serialization.plan_dict(db_plan)) == pydantic_json(db_plan)
+
+
+def test_endpoints_return_schema_compatible_json():
+    """作成・取得・一覧のレスポンスはBusinessPlanOutputとして検証できる"""
+    created = client.post("/api/plans", json=PLAN)
+    assert created.status_code == 200
+    assert created.headers["content-type"] == "application/json"
+    output = schemas.BusinessPlanOutput.model_validate(created.json())
+    assert output.menu_examples and output.initial_investment > 0
+    
+    fetched = client.get(f"/api/plans/{output.id}")
+    assert json.loads(fetched.content) == created.json()
+    
+    listed = client.get("/api/plans", params={"limit": 5})
+    for item in listed.json():
+        schemas.BusinessPlanOutput.model_validate(item)
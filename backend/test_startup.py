@@ -0,0 +1,65 @@
+"""
+起動時間のテストコード
+
+main のimportでDBに接続しないこと、importと最初のリクエストが時間内に終わることを確認する。
+
+実行方法:
+    python -m pytest test_startup.py
+"""
+
+import json
+import os
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent
+
+# 遅いCI環境でも通る上限（FastAPI本体のimportだけで1〜2秒かかる）
+IMPORT_BUDGET_SECONDS = 5.0
+FIRST_REQUEST_BUDGET_SECONDS = 2.0
+
+
+def run_script(script: str, env: dict) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", textwrap.dedent(script)],
+        cwd=BACKEND_DIR, env={**os.environ, **env}, capture_output=True, text=True, timeout=60
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_import_does_not_touch_database(tmp_path):
+    db_path = tmp_path / "startup.db"
+    measured = run_script("""
+        import json, time
+        started = time.perf_counter()
+        import main
+        elapsed = time.perf_counter() - started
+        print(json.dumps({"import_seconds": elapsed, "checked_out": main.engine.pool.checkedout()}))
+    """, {"DATABASE_URL": f"sqlite:///{db_path}"})
+
+    # SQLiteは最初の接続でファイルを作成するため、ファイルがなければ接続していない
+    assert not db_path.exists()
+    assert measured["checked_out"] == 0
+    assert measured["import_seconds"] < IMPORT_BUDGET_SECONDS
+
+
+def test_first_request_after_startup_is_fast(tmp_path):
+    measured = run_script("""
+        import json, time
+        from fastapi.testclient import TestClient
+        from main import app
+
+        with TestClient(app) as client:
+            started = time.perf_counter()
+            response = client.post("/api/plans", json={
+                "type": "カフェ", "seats": 20, "atv": 1200, "hours": "10:00-20:00", "area": "駅近"
+            })
+            elapsed = time.perf_counter() - started
+        print(json.dumps({"status": response.status_code, "first_request_seconds": elapsed}))
+    """, {"DATABASE_URL": f"sqlite:///{tmp_path / 'first.db'}", "AUTO_MIGRATE": "true"})
+
+    assert measured["status"] == 200
+    assert measured["first_request_seconds"] < FIRST_REQUEST_BUDGET_SECONDS
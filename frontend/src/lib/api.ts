@@ -63,12 +63,20 @@ export interface TokenResponse {
 
 export const api = {
   async createPlan(data: BusinessPlanInput): Promise<BusinessPlanOutput> {
-    const response = await axios.post(`${API_URL}/api/plans`, data);
+    // ログイン中はトークンを付けて、プランをユーザーに紐づける
+    const token = localStorage.getItem('access_token');
+    const response = await axios.post(`${API_URL}/api/plans`, data, {
+      headers: token ? { Authorization: `Bearer ${token}` } : {}
+    });
     return response.data;
   },
 
   async getPlan(id: number): Promise<BusinessPlanOutput> {
-    const response = await axios.get(`${API_URL}/api/plans/${id}`);
+    // ログイン中のユーザーのプランはトークンがないと取得できない
+    const token = localStorage.getItem('access_token');
+    const response = await axios.get(`${API_URL}/api/plans/${id}`, {
+      headers: token ? { Authorization: `Bearer ${token}` } : {}
+    });
     return response.data;
   },
 